@@ -18,6 +18,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # Импортируем конфигурацию базы данных и модели
 from app.core.database import Base, DATABASE_URL
+from app.core.migrations import MigrationTimer, include_object
 from app.models import Author, Book, Genre, Publisher  # noqa: F401
 
 # this is the Alembic Config object
@@ -47,6 +48,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
+        transaction_per_migration=True,
     )
 
     with context.begin_transaction():
@@ -58,6 +61,11 @@ def run_migrations_online() -> None:
     Run migrations in 'online' mode.
 
     Подключается к базе данных и применяет миграции.
+
+    Каждая ревизия выполняется в своей транзакции: миграции больших
+    таблиц фиксируют её раньше (autocommit_block) для порционного
+    заполнения и CREATE INDEX CONCURRENTLY, не затрагивая остальные.
+    Время каждой ревизии пишется в лог.
     """
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
@@ -65,6 +73,7 @@ def run_migrations_online() -> None:
         poolclass=pool.NullPool,
     )
 
+    timer = MigrationTimer()
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
@@ -73,9 +82,13 @@ def run_migrations_online() -> None:
             compare_type=True,
             # Включаем сравнение server defaults
             compare_server_default=True,
+            include_object=include_object,
+            transaction_per_migration=True,
+            on_version_apply=timer,
         )
 
         with context.begin_transaction():
+            timer.reset()
             context.run_migrations()
 
 
@@ -0,0 +1,42 @@
+"""Partition books by publication_date
+
+Декларативное секционирование books по диапазонам publication_date
+(только PostgreSQL; на других СУБД миграция ничего не делает).
+Секционирование необязательно: миграция применяет его только при
+BOOKS_PARTITIONING=1 (позже его можно включить командой
+python -m app.core.partitioning partition). Интервал секций задаётся
+BOOKS_PARTITION_INTERVAL (year или decade), подробности и ограничения —
+в app/core/partitioning.py.
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19 08:30:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.core.partitioning import (
+    partition_books_table,
+    partitioning_enabled,
+    unpartition_books_table,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    if partitioning_enabled():
+        partition_books_table(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    unpartition_books_table(op.get_bind())
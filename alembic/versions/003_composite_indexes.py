@@ -0,0 +1,51 @@
+"""Composite indexes for hot query shapes
+
+Составные индексы под формы основных запросов:
+- books (author_id, title) — get_by_author с сортировкой по названию
+  (заменяет одиночный ix_books_author_id);
+- books (language, price) — advanced_search по языку и диапазону цены;
+- books (price), books (publication_date) — get_books_sorted;
+- books (created_at DESC) INCLUDE (title) — последние книги дашборда;
+- book_genres (genre_id, book_id) — переход жанр -> книги.
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 09:40:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.create_index('ix_book_genres_genre_id_book_id', 'book_genres', ['genre_id', 'book_id'], unique=False)
+    op.drop_index('ix_books_author_id', table_name='books')
+    op.create_index('ix_books_author_id_title', 'books', ['author_id', 'title'], unique=False)
+    op.create_index('ix_books_language_price', 'books', ['language', 'price'], unique=False)
+    op.create_index('ix_books_price', 'books', ['price'], unique=False)
+    op.create_index('ix_books_publication_date', 'books', ['publication_date'], unique=False)
+    op.create_index(
+        'ix_books_created_at', 'books', [sa.text('created_at DESC')],
+        unique=False, postgresql_include=['title']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_index('ix_books_created_at', table_name='books')
+    op.drop_index('ix_books_publication_date', table_name='books')
+    op.drop_index('ix_books_price', table_name='books')
+    op.drop_index('ix_books_language_price', table_name='books')
+    op.drop_index('ix_books_author_id_title', table_name='books')
+    op.create_index('ix_books_author_id', 'books', ['author_id'], unique=False)
+    op.drop_index('ix_book_genres_genre_id_book_id', table_name='book_genres')
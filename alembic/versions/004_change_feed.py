@@ -0,0 +1,54 @@
+"""Change feed: updated_at indexes and tombstones
+
+Лента изменений (app.queries.changes):
+- (updated_at, id) на authors, publishers, genres, books — keyset-чтение
+  изменений после курсора;
+- таблица tombstones и триггеры AFTER DELETE, записывающие удаления
+  (включая каскадные).
+
+Индексы строятся CONCURRENTLY на PostgreSQL (см. app.core.migrations).
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 12:10:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import create_index_concurrently, drop_index_concurrently
+from app.models.tombstone import TRACKED_TABLES, drop_tombstone_triggers, install_tombstone_triggers
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.create_table(
+        'tombstones',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('table_name', sa.String(length=100), nullable=False),
+        sa.Column('row_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tombstones_deleted_at_id', 'tombstones', ['deleted_at', 'id'], unique=False)
+    install_tombstone_triggers(op.get_bind())
+    for table in TRACKED_TABLES:
+        create_index_concurrently(f'ix_{table}_updated_at_id', table, ['updated_at', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    for table in reversed(TRACKED_TABLES):
+        drop_index_concurrently(f'ix_{table}_updated_at_id', table)
+    drop_tombstone_triggers(op.get_bind())
+    op.drop_index('ix_tombstones_deleted_at_id', table_name='tombstones')
+    op.drop_table('tombstones')
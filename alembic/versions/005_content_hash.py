@@ -0,0 +1,44 @@
+"""Content hashes for feed sync
+
+- content_hash на authors, publishers, books: хеш записи фида, которой
+  строка записана в последний раз (CatalogLoader(sync=True) пропускает
+  неизменные записи без UPDATE). У существующих строк хеш NULL — первая
+  синхронизация перезапишет их один раз.
+- record_tombstone() на PostgreSQL не записывает удаление, если UPDATE
+  перенёс строку books в другую секцию.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 13:30:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.tombstone import install_tombstone_triggers
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('authors', 'publishers', 'books')
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    for table in TABLES:
+        op.add_column(table, sa.Column('content_hash', sa.String(length=32), nullable=True))
+    install_tombstone_triggers(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    # ALTER TABLE ... DROP COLUMN (SQLite 3.35+): batch-режим пересоздал бы
+    # таблицы и потерял триггеры tombstones
+    for table in reversed(TABLES):
+        op.drop_column(table, 'content_hash')
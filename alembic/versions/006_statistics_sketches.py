@@ -0,0 +1,38 @@
+"""Statistics sketches
+
+Таблица statistics_sketches: сохранённое состояние скетчей статистики
+каталога (t-digest цен и страниц, HyperLogLog авторов) для
+get_library_statistics(approximate=True).
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 16:40:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.create_table(
+        'statistics_sketches',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('state', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_table('statistics_sketches')
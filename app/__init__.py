@@ -1,8 +1,7 @@
 """
-__version__ = "1.0.0"
-
-"""
-Демонстрационный проект для портфолио
-====================================
 SQLAlchemy Portfolio - Book Catalog
+====================================
+Демонстрационный проект для портфолио
+"""
 
+__version__ = "1.0.0"
@@ -4,30 +4,187 @@ Database Configuration
 Настройка подключения к базе данных SQLAlchemy
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 from contextlib import contextmanager
+from typing import Optional
 import os
 
 # Получаем URL базы данных из переменной окружения или используем SQLite
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./book_catalog.db")
 
-# Создаём движок SQLAlchemy
-# echo=True для логирования SQL-запросов (полезно для отладки)
-engine = create_engine(
-    DATABASE_URL,
-    echo=True,
-    # Для SQLite нужен этот параметр для работы с несколькими потоками
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
 
-# Фабрика сессий
+def install_fork_guard(engine: Engine) -> None:
+    """
+    Защитить пул движка от использования соединений чужого процесса.
+
+    Каждое соединение помечается PID процесса, который его открыл.
+    Если после fork процесс получает из пула соединение родителя, оно
+    отбрасывается без закрытия (сокет принадлежит родителю), а пул
+    открывает новое.
+    """
+    @event.listens_for(engine, "connect")
+    def _remember_pid(dbapi_connection, connection_record):
+        connection_record.info["pid"] = os.getpid()
+
+    @event.listens_for(engine, "checkout")
+    def _check_pid(dbapi_connection, connection_record, connection_proxy):
+        pid = os.getpid()
+        if connection_record.info.get("pid", pid) != pid:
+            connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+            raise exc.DisconnectionError(
+                f"Connection record belongs to pid {connection_record.info['pid']}, "
+                f"attempting to check out in pid {pid}"
+            )
+
+
+def enable_sqlite_foreign_keys(engine: Engine) -> None:
+    """
+    Включить проверку внешних ключей SQLite на каждом соединении.
+
+    SQLite по умолчанию игнорирует FOREIGN KEY, в том числе ON DELETE
+    CASCADE / SET NULL, а связи моделей (passive_deletes=True) полагаются
+    на каскады базы. Для других СУБД ничего не делает.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _foreign_keys_on(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def foreign_keys_enforced(connection: Connection) -> bool:
+    """Применяет ли соединение внешние ключи (и их каскады)."""
+    if connection.dialect.name != "sqlite":
+        return True
+    return bool(connection.exec_driver_sql("PRAGMA foreign_keys").scalar())
+
+
+def create_db_engine(url: str = DATABASE_URL, **kwargs) -> Engine:
+    """
+    Создать движок SQLAlchemy с настройками проекта.
+
+    Используется и для основного движка, и в процессах-воркерах,
+    которым нужен собственный движок (пул соединений не переживает fork).
+
+    Args:
+        url: URL базы данных
+        **kwargs: Дополнительные параметры create_engine
+
+    Returns:
+        Новый движок
+    """
+    if "sqlite" in url:
+        # Для SQLite нужен этот параметр для работы с несколькими потоками
+        kwargs.setdefault("connect_args", {"check_same_thread": False})
+    engine = create_engine(url, **kwargs)
+    install_fork_guard(engine)
+    enable_sqlite_foreign_keys(engine)
+    return engine
+
+
+# Движок создаётся лениво, при первом обращении, а не при импорте модуля:
+# pre-fork серверы (gunicorn) и пулы процессов импортируют модуль до fork,
+# и созданный к этому моменту пул соединений оказался бы общим.
+_engine: Optional[Engine] = None
+_engine_pid: Optional[int] = None
+
+
+def get_engine() -> Engine:
+    """
+    Получить движок текущего процесса.
+
+    При первом вызове создаёт движок; если процесс сменился (fork),
+    сбрасывает унаследованный пул через dispose(close=False) — соединения
+    родителя не закрываются, а просто забываются.
+
+    Returns:
+        Движок SQLAlchemy
+    """
+    global _engine, _engine_pid
+
+    if _engine is None:
+        # echo=True для логирования SQL-запросов (полезно для отладки)
+        _engine = create_db_engine(DATABASE_URL, echo=True)
+        _engine_pid = os.getpid()
+    elif _engine_pid != os.getpid():
+        _engine.dispose(close=False)
+        _engine_pid = os.getpid()
+    return _engine
+
+
+def _reset_engine_after_fork() -> None:
+    """Хук os.register_at_fork: сбросить пул в дочернем процессе."""
+    global _engine_pid
+
+    if _engine is not None:
+        _engine.dispose(close=False)
+        _engine_pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_engine_after_fork)
+
+
+def prewarm_pool(size: Optional[int] = None) -> int:
+    """
+    Заранее открыть соединения пула, чтобы первые запросы воркера
+    не платили за установку соединения.
+
+    Вызывается при старте воркера (например, в gunicorn post_fork).
+
+    Args:
+        size: Количество соединений (по умолчанию — размер пула)
+
+    Returns:
+        Количество открытых соединений (0 для NullPool — там нечего прогревать)
+    """
+    engine = get_engine()
+    if isinstance(engine.pool, NullPool):
+        return 0
+    if size is None:
+        size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(engine.connect())
+    finally:
+        # Соединения возвращаются в пул и остаются открытыми
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+class _EngineSession(Session):
+    """Сессия, которая без явного bind берёт движок текущего процесса."""
+
+    def get_bind(self, mapper=None, **kwargs):
+        if self.bind is None:
+            return get_engine()
+        return super().get_bind(mapper=mapper, **kwargs)
+
+
+# Фабрика сессий; движок подставляется при первом обращении к базе
 SessionLocal = sessionmaker(
+    class_=_EngineSession,
     autocommit=False,
-    autoflush=False,
-    bind=engine
+    autoflush=False
 )
 
+
+def __getattr__(name: str):
+    # Обратная совместимость: `from app.core.database import engine`
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # Базовый класс для всех моделей
 Base = declarative_base()
 
@@ -75,7 +232,7 @@ def init_db():
     """
     # Импортируем модели, чтобы они зарегистрировались в Base.metadata
     from app.models import author, book, genre, publisher  # noqa: F401
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
 
 
 def drop_db():
@@ -83,5 +240,5 @@ def drop_db():
     Удаление всех таблиц. ОСТОРОЖНО: удаляет все данные!
     Используется только для тестирования.
     """
-    Base.metadata.drop_all(bind=engine)
+    Base.metadata.drop_all(bind=get_engine())
 
@@ -0,0 +1,439 @@
+"""
+Migration Utilities
+===================
+Вспомогательные функции для миграций Alembic
+
+Онлайн-миграции больших таблиц (десятки миллионов строк books):
+- backfill() — заполнение данных порциями по ключу с коммитом каждой
+  порции, паузой между порциями и продолжением после обрыва;
+- create_index_concurrently() / drop_index_concurrently() — индексы
+  без блокировки записи (PostgreSQL, вне транзакции миграции);
+- timed_step() и MigrationTimer — время шагов и ревизий в логе.
+
+Миграция, использующая эти функции, фиксирует свою транзакцию до их
+вызова, поэтому env.py выполняет каждую ревизию в отдельной транзакции
+(transaction_per_migration).
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+from alembic import op
+from alembic.operations import ops
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql import ColumnElement, TableClause
+
+from app.core.database import Base
+
+logger = logging.getLogger(__name__)
+
+# Прогресс незавершённых backfill(); таблица служебная, в моделях её нет
+_progress_metadata = MetaData()
+backfill_progress = Table(
+    "backfill_progress",
+    _progress_metadata,
+    Column("name", String(200), primary_key=True),
+    Column("last_key", BigInteger, nullable=False),
+    Column("rows", BigInteger, nullable=False, default=0),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now(), onupdate=func.now()),
+)
+
+
+# ==================== AUTOGENERATE ====================
+
+def _has_expressions(table_name: str, index_name: str) -> bool:
+    table = Base.metadata.tables.get(table_name)
+    if table is None:
+        return False
+    return any(
+        not isinstance(expression, Column)
+        for index in table.indexes if index.name == index_name
+        for expression in index.expressions
+    )
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """
+    Фильтр объектов для autogenerate (context.configure(include_object=...)).
+
+    Индексы по выражениям (например, created_at DESC) отражаются из базы
+    не полностью (SQLite теряет DESC), и autogenerate каждый раз предлагал
+    бы удалить или пересоздать их. Для таких индексов сравнение
+    пропускается — кроме случая, когда индекса в базе ещё нет.
+    Служебная таблица backfill_progress не сравнивается.
+    """
+    if type_ == "table" and name == backfill_progress.name:
+        return False
+    if type_ == "index" and (reflected or compare_to is not None):
+        return not _has_expressions(object.table.name, name)
+    return True
+
+
+# ==================== ПОРЦИОННОЕ ЗАПОЛНЕНИЕ ====================
+
+def _is_autocommit(connection: Connection) -> bool:
+    return connection.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+
+
+@contextmanager
+def _chunk_transaction(connection: Connection, autocommit: bool) -> Iterator[None]:
+    if autocommit:
+        # Каждое выражение фиксируется драйвером само
+        yield
+    else:
+        with connection.begin():
+            yield
+
+
+def _load_progress(connection: Connection, name: str) -> Optional[Dict[str, int]]:
+    backfill_progress.create(connection, checkfirst=True)
+    row = connection.execute(
+        select(backfill_progress.c.last_key, backfill_progress.c.rows)
+        .where(backfill_progress.c.name == name)
+    ).first()
+    return {"last_key": row.last_key, "rows": row.rows} if row else None
+
+
+def _save_progress(connection: Connection, name: str, last_key: int, rows: int, exists: bool) -> None:
+    if exists:
+        connection.execute(
+            update(backfill_progress)
+            .where(backfill_progress.c.name == name)
+            .values(last_key=last_key, rows=rows)
+        )
+    else:
+        connection.execute(insert(backfill_progress).values(name=name, last_key=last_key, rows=rows))
+
+
+def batched_backfill(
+    connection: Connection,
+    table: TableClause,
+    values: Mapping[str, Any],
+    where: Optional[ColumnElement] = None,
+    name: Optional[str] = None,
+    key: str = "id",
+    batch_size: int = 10_000,
+    throttle: float = 0.0,
+    max_batches: Optional[int] = None,
+    log_interval: float = 10.0
+) -> Dict[str, Any]:
+    """
+    UPDATE таблицы порциями по диапазонам ключа (keyset) с коммитом каждой порции.
+
+    Порция — batch_size подряд идущих значений ключа: WHERE key > :last
+    AND key <= :upper. Каждая порция держит блокировки строк недолго и
+    не копит WAL одной огромной транзакцией. После каждой порции
+    последний ключ записывается в backfill_progress, поэтому прерванное
+    заполнение (обрыв, max_batches) продолжается с места остановки;
+    по завершении запись прогресса удаляется.
+
+    Соединение должно быть вне транзакции (порции получают свои
+    транзакции) или в режиме AUTOCOMMIT (внутри autocommit_block()
+    миграции). В режиме AUTOCOMMIT UPDATE и запись прогресса фиксируются
+    раздельно: после обрыва между ними последняя порция повторяется,
+    поэтому values должны давать тот же результат при повторе.
+
+    Args:
+        connection: Соединение
+        table: Таблица (Table или sa.table(...) с нужными колонками)
+        values: Новые значения колонок (константы или выражения)
+        where: Дополнительное условие отбора строк
+        name: Имя для сохранения прогресса (по умолчанию — таблица и колонки)
+        key: Целочисленная колонка для обхода (индексированная)
+        batch_size: Количество значений ключа в порции
+        throttle: Пауза между порциями, секунды (нагрузка на реплики)
+        max_batches: Остановиться после стольких порций (продолжить позже)
+        log_interval: Период записи прогресса в лог, секунды
+
+    Returns:
+        Словарь rows, batches, resumed_from, last_key, finished, seconds
+
+    Raises:
+        RuntimeError: Если соединение внутри незафиксированной транзакции
+    """
+    autocommit = _is_autocommit(connection)
+    if connection.in_transaction() and not autocommit:
+        raise RuntimeError(
+            "batched_backfill needs its own transactions: commit first "
+            "or run inside op.get_context().autocommit_block()"
+        )
+
+    name = name or f"{table.name}:{','.join(sorted(values))}"
+    column = table.c[key]
+    with _chunk_transaction(connection, autocommit):
+        progress = _load_progress(connection, name)
+    resumed_from = progress["last_key"] if progress else None
+    last_key = resumed_from
+    rows = progress["rows"] if progress else 0
+    batches = 0
+    finished = False
+    started = logged = time.perf_counter()
+
+    while max_batches is None or batches < max_batches:
+        remaining = select(column).where(column > last_key) if last_key is not None else select(column)
+        upper = connection.execute(
+            remaining.order_by(column).offset(batch_size - 1).limit(1)
+        ).scalar()
+        if upper is None:
+            upper = connection.execute(select(func.max(remaining.subquery().c[key]))).scalar()
+        if connection.in_transaction() and not autocommit:
+            connection.commit()
+        if upper is None:
+            finished = True
+            break
+
+        statement = update(table).where(column <= upper).values(dict(values))
+        if last_key is not None:
+            statement = statement.where(column > last_key)
+        if where is not None:
+            statement = statement.where(where)
+
+        with _chunk_transaction(connection, autocommit):
+            rows += connection.execute(statement).rowcount
+            _save_progress(connection, name, upper, rows, exists=progress is not None or batches > 0)
+        last_key = upper
+        batches += 1
+
+        if time.perf_counter() - logged >= log_interval:
+            logged = time.perf_counter()
+            logger.info("Backfill %s: %d rows, %s <= %s", name, rows, key, last_key)
+        if throttle:
+            time.sleep(throttle)
+
+    if finished:
+        with _chunk_transaction(connection, autocommit):
+            connection.execute(delete(backfill_progress).where(backfill_progress.c.name == name))
+
+    seconds = time.perf_counter() - started
+    logger.info(
+        "Backfill %s %s: %d rows in %d batches, %.2fs",
+        name, "finished" if finished else "paused", rows, batches, seconds
+    )
+    return {
+        "rows": rows,
+        "batches": batches,
+        "resumed_from": resumed_from,
+        "last_key": last_key,
+        "finished": finished,
+        "seconds": seconds,
+    }
+
+
+def backfill(
+    table: TableClause,
+    values: Mapping[str, Any],
+    where: Optional[ColumnElement] = None,
+    **options
+) -> Dict[str, Any]:
+    """
+    Порционное заполнение из миграции Alembic.
+
+    Фиксирует транзакцию текущей ревизии (уже выполненный DDL, например
+    add_column) и запускает batched_backfill() в autocommit_block().
+    В offline-режиме (--sql) выводит один UPDATE.
+
+    Example:
+        >>> books = sa.table("books", sa.column("id"), sa.column("language"))
+        >>> backfill(books, {"language": "ru"}, where=books.c.language.is_(None))
+
+    Args:
+        table: Таблица (sa.table(...) с ключом и заполняемыми колонками)
+        values: Новые значения колонок
+        where: Дополнительное условие отбора строк
+        **options: Параметры batched_backfill (batch_size, throttle, ...)
+
+    Returns:
+        Статистика batched_backfill (пустой словарь в offline-режиме)
+    """
+    context = op.get_context()
+    if context.as_sql:
+        statement = update(table).values(dict(values))
+        op.execute(statement.where(where) if where is not None else statement)
+        return {}
+
+    with context.autocommit_block():
+        return batched_backfill(op.get_bind(), table, values, where, **options)
+
+
+# ==================== ИНДЕКСЫ БЕЗ БЛОКИРОВОК ====================
+
+def _is_partitioned(connection: Connection, table_name: str) -> bool:
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {"table": table_name}).scalar()
+
+
+def _partitions(connection: Connection, table_name: str) -> List[str]:
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {"table": table_name})
+    return [row[0] for row in rows]
+
+
+def _drop_invalid_index(connection: Connection, index_name: str) -> None:
+    """Удалить индекс, оставшийся INVALID после прерванного CONCURRENTLY."""
+    invalid = connection.execute(text(
+        "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:index)"
+    ), {"index": index_name}).scalar()
+    if invalid:
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+
+
+def _create_index_sql(connection: Connection, index_name: str, table_name: str, columns, **kw) -> str:
+    index = ops.CreateIndexOp(index_name, table_name, columns, **kw).to_index()
+    return str(CreateIndex(index, if_not_exists=True).compile(dialect=connection.dialect))
+
+
+def create_index_concurrently(
+    index_name: str,
+    table_name: str,
+    columns: Sequence[Any],
+    **kw
+) -> None:
+    """
+    Создать индекс без блокировки записи в таблицу.
+
+    PostgreSQL: CREATE INDEX CONCURRENTLY IF NOT EXISTS вне транзакции
+    (транзакция ревизии фиксируется). Индекс, оставшийся INVALID после
+    прерванной попытки, удаляется и строится заново.
+
+    Секционированную таблицу PostgreSQL не индексирует CONCURRENTLY,
+    поэтому индекс создаётся на родителе с ON ONLY (мгновенно, пока
+    невалиден), затем CONCURRENTLY на каждой секции и присоединяется к
+    родительскому (ALTER INDEX ... ATTACH PARTITION). Родительский индекс
+    становится валидным, когда присоединены индексы всех секций.
+    Многоуровневое секционирование не поддерживается.
+
+    На других СУБД и в offline-режиме — обычный op.create_index().
+
+    Args:
+        index_name: Имя индекса
+        table_name: Таблица
+        columns: Колонки или выражения (sa.text("created_at DESC"))
+        **kw: Параметры op.create_index (unique, postgresql_include, ...)
+    """
+    context = op.get_context()
+    connection = op.get_bind()
+    if context.as_sql or connection.dialect.name != "postgresql":
+        op.create_index(index_name, table_name, columns, **kw)
+        return
+
+    with context.autocommit_block():
+        connection = op.get_bind()
+        if not _is_partitioned(connection, table_name):
+            _drop_invalid_index(connection, index_name)
+            connection.execute(text(_create_index_sql(
+                connection, index_name, table_name, columns, postgresql_concurrently=True, **kw
+            )))
+            return
+
+        parent_sql = _create_index_sql(connection, index_name, table_name, columns, **kw)
+        connection.execute(text(parent_sql.replace(f" ON {table_name} ", f" ON ONLY {table_name} ", 1)))
+        for partition in _partitions(connection, table_name):
+            child = f"{index_name}_{partition}"[:63]
+            _drop_invalid_index(connection, child)
+            connection.execute(text(_create_index_sql(
+                connection, child, partition, columns, postgresql_concurrently=True, **kw
+            )))
+            attached = connection.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_inherits "
+                "WHERE inhrelid = to_regclass(:child) AND inhparent = to_regclass(:parent))"
+            ), {"child": child, "parent": index_name}).scalar()
+            if not attached:
+                connection.execute(text(f"ALTER INDEX {index_name} ATTACH PARTITION {child}"))
+
+
+def drop_index_concurrently(index_name: str, table_name: str) -> None:
+    """
+    Удалить индекс без блокировки записи в таблицу.
+
+    PostgreSQL: DROP INDEX CONCURRENTLY IF EXISTS вне транзакции. Индекс
+    секционированной таблицы PostgreSQL удаляет только обычным DROP INDEX
+    (короткая блокировка родителя; индексы секций удаляются вместе с ним).
+    На других СУБД и в offline-режиме — обычный op.drop_index().
+
+    Args:
+        index_name: Имя индекса
+        table_name: Таблица
+    """
+    context = op.get_context()
+    connection = op.get_bind()
+    if context.as_sql or connection.dialect.name != "postgresql":
+        op.drop_index(index_name, table_name=table_name)
+        return
+
+    with context.autocommit_block():
+        connection = op.get_bind()
+        concurrently = "" if _is_partitioned(connection, table_name) else " CONCURRENTLY"
+        connection.execute(text(f"DROP INDEX{concurrently} IF EXISTS {index_name}"))
+
+
+# ==================== ВРЕМЯ ВЫПОЛНЕНИЯ ====================
+
+@contextmanager
+def timed_step(label: str) -> Iterator[None]:
+    """
+    Записать в лог время шага миграции.
+
+    Example:
+        >>> with timed_step("books.content_hash backfill"):
+        ...     backfill(books, {...})
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        logger.info("%s took %.2fs", label, time.perf_counter() - started)
+
+
+class MigrationTimer:
+    """
+    Время выполнения каждой ревизии (context.configure(on_version_apply=...)).
+
+    Alembic вызывает обработчик после каждой применённой ревизии; время
+    ревизии — интервал от предыдущего вызова (или от reset()).
+    """
+
+    def __init__(self):
+        self.timings: List[Dict[str, Any]] = []
+        self._started = time.perf_counter()
+
+    def reset(self) -> None:
+        """Начать отсчёт заново (перед context.run_migrations())."""
+        self._started = time.perf_counter()
+
+    def __call__(self, ctx, step, heads, run_args) -> None:
+        now = time.perf_counter()
+        source = ", ".join(step.source_revision_ids) or "base"
+        destination = ", ".join(step.destination_revision_ids) or "base"
+        seconds = now - self._started
+        self._started = now
+
+        self.timings.append({
+            "source": source,
+            "destination": destination,
+            "upgrade": step.is_upgrade,
+            "seconds": seconds,
+        })
+        logger.info(
+            "%s %s -> %s took %.2fs",
+            "Upgrade" if step.is_upgrade else "Downgrade", source, destination, seconds
+        )
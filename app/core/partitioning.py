@@ -0,0 +1,452 @@
+"""
+Books Partitioning
+==================
+Секционирование таблицы books по publication_date (PostgreSQL)
+
+Декларативное секционирование PostgreSQL (PARTITION BY RANGE) позволяет
+планировщику отбрасывать секции, не пересекающиеся с условием запроса
+(partition pruning): выборка книг за период читает только секции
+нужных лет, а не всю таблицу.
+
+Ограничения PostgreSQL для секционированной таблицы:
+- первичный ключ и уникальные ограничения обязаны включать ключ
+  секционирования, а publication_date допускает NULL, поэтому у books
+  нет PRIMARY KEY, а индексы по id и isbn не уникальны. Уникальность id
+  обеспечивает последовательность, уникальность isbn — триггер,
+  поддерживающий несекционированную таблицу book_isbns (isbn PRIMARY
+  KEY -> book_id): повторный ISBN отклоняется той же ошибкой
+  unique_violation (IntegrityError), что и уникальный индекс;
+- внешний ключ book_genres.book_id -> books.id невозможен; каскадное
+  удаление связей с жанрами выполняет триггер.
+
+Секционирование включается явно: миграцией при BOOKS_PARTITIONING=1
+или командой python -m app.core.partitioning partition.
+
+Книги без даты и с датами вне созданных секций попадают в секцию
+books_default. На SQLite и других СУБД все функции ничего не делают.
+"""
+
+import os
+import sys
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Интервал секций: "year" (books_y2024) или "decade" (books_d2020)
+BOOKS_PARTITION_INTERVAL = os.getenv("BOOKS_PARTITION_INTERVAL", "year")
+
+# Сколько будущих секций держать созданными заранее
+BOOKS_PARTITIONS_AHEAD = int(os.getenv("BOOKS_PARTITIONS_AHEAD", "2"))
+
+DEFAULT_PARTITION = "books_default"
+
+# Таблица уникальности ISBN секционированной books
+ISBN_TABLE = "book_isbns"
+
+# Настройка сессии, отключающая каскадный триггер на время переноса строк
+MAINTENANCE_SETTING = "app.partition_maintenance"
+
+# Индексы books, уникальные в обычной таблице (на секционированной
+# уникальность isbn обеспечивает book_isbns)
+_UNIQUE_INDEXES = ("ix_books_isbn",)
+
+# Триггер ленты изменений на books (app.models.tombstone, ревизия 004)
+_TOMBSTONE_TRIGGER = "books_tombstone"
+
+
+# ==================== ГРАНИЦЫ СЕКЦИЙ ====================
+
+def _interval_years(interval: str) -> int:
+    if interval == "year":
+        return 1
+    if interval == "decade":
+        return 10
+    raise ValueError(f"Unknown partition interval: {interval}")
+
+
+def partition_start(year: int, interval: str = BOOKS_PARTITION_INTERVAL) -> int:
+    """Первый год секции, в которую попадает год."""
+    step = _interval_years(interval)
+    return year - year % step
+
+
+def partition_name(year: int, interval: str = BOOKS_PARTITION_INTERVAL) -> str:
+    """Имя секции, в которую попадает год: books_y2024 или books_d2020."""
+    prefix = "y" if interval == "year" else "d"
+    return f"books_{prefix}{partition_start(year, interval)}"
+
+
+def partition_bounds(year: int, interval: str = BOOKS_PARTITION_INTERVAL) -> Tuple[date, date]:
+    """Границы секции [from, to) для года."""
+    start = partition_start(year, interval)
+    return date(start, 1, 1), date(start + _interval_years(interval), 1, 1)
+
+
+def partition_years(
+    first_year: int,
+    last_year: int,
+    interval: str = BOOKS_PARTITION_INTERVAL
+) -> List[int]:
+    """Первые годы всех секций, покрывающих годы first_year..last_year."""
+    step = _interval_years(interval)
+    return list(range(partition_start(first_year, interval), last_year + 1, step))
+
+
+# ==================== СОСТОЯНИЕ ====================
+
+def partitioning_enabled() -> bool:
+    """Включено ли секционирование books миграцией (BOOKS_PARTITIONING)."""
+    return os.getenv("BOOKS_PARTITIONING", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _is_postgresql(connection: Connection) -> bool:
+    return connection.dialect.name == "postgresql"
+
+
+def is_books_partitioned(connection: Connection) -> bool:
+    """Секционирована ли таблица books."""
+    if not _is_postgresql(connection):
+        return False
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass('books'))"
+    )).scalar()
+
+
+def list_book_partitions(connection: Connection) -> List[str]:
+    """Имена секций books (пустой список, если таблица не секционирована)."""
+    if not is_books_partitioned(connection):
+        return []
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('books') ORDER BY c.relname"
+    ))
+    return [row[0] for row in rows]
+
+
+# ==================== СОЗДАНИЕ СЕКЦИЙ ====================
+
+def create_book_partition(
+    connection: Connection,
+    year: int,
+    interval: str = BOOKS_PARTITION_INTERVAL
+) -> bool:
+    """
+    Создать секцию для года и присоединить её к books.
+
+    Если в секции по умолчанию уже есть книги этого диапазона, они
+    переносятся в новую секцию: PostgreSQL не даёт присоединить секцию,
+    пока такие строки остаются в books_default.
+
+    Args:
+        connection: Соединение PostgreSQL (внутри транзакции)
+        year: Любой год секции
+        interval: Интервал секций
+
+    Returns:
+        True, если секция создана; False, если уже существовала
+    """
+    name = partition_name(year, interval)
+    if name in list_book_partitions(connection):
+        return False
+
+    lower, upper = partition_bounds(year, interval)
+    connection.execute(text(
+        f"CREATE TABLE {name} (LIKE books INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    connection.execute(text(f"SELECT set_config('{MAINTENANCE_SETTING}', 'on', true)"))
+    connection.execute(text(
+        f"WITH moved AS ("
+        f"DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE publication_date >= :lower AND publication_date < :upper RETURNING *"
+        f") INSERT INTO {name} SELECT * FROM moved"
+    ), {"lower": lower, "upper": upper})
+    connection.execute(text(f"SELECT set_config('{MAINTENANCE_SETTING}', 'off', true)"))
+    connection.execute(text(
+        f"ALTER TABLE books ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    ))
+    return True
+
+
+def ensure_book_partitions(
+    connection: Connection,
+    ahead: int = BOOKS_PARTITIONS_AHEAD,
+    interval: str = BOOKS_PARTITION_INTERVAL,
+    today: Optional[date] = None
+) -> List[str]:
+    """
+    Заранее создать секции текущего и ближайших будущих периодов.
+
+    Запускается периодически (cron, планировщик), чтобы новые книги
+    не попадали в books_default.
+
+    Args:
+        connection: Соединение (внутри транзакции)
+        ahead: Количество будущих секций
+        interval: Интервал секций
+        today: Текущая дата (для тестов)
+
+    Returns:
+        Имена созданных секций
+    """
+    if not is_books_partitioned(connection):
+        return []
+
+    year = (today or date.today()).year
+    step = _interval_years(interval)
+    created = []
+    for start in partition_years(year, year + ahead * step, interval):
+        if create_book_partition(connection, start, interval):
+            created.append(partition_name(start, interval))
+    return created
+
+
+# ==================== ПРЕОБРАЗОВАНИЕ ТАБЛИЦЫ ====================
+
+_CASCADE_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION books_delete_genre_links() RETURNS trigger AS $$
+BEGIN
+    -- Перенос строк между секциями — не удаление книги
+    IF current_setting('{MAINTENANCE_SETTING}', true) = 'on'
+       OR EXISTS (SELECT 1 FROM books WHERE id = OLD.id) THEN
+        RETURN OLD;
+    END IF;
+    DELETE FROM book_genres WHERE book_id = OLD.id;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+_ISBN_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION books_unique_isbn() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('{MAINTENANCE_SETTING}', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    -- Перенос строки в другую секцию (DELETE + INSERT) сохраняет её isbn
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.isbn IS NOT NULL THEN
+        DELETE FROM {ISBN_TABLE} WHERE isbn = OLD.isbn AND book_id = OLD.id
+            AND NOT EXISTS (SELECT 1 FROM books WHERE id = OLD.id AND isbn = OLD.isbn);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.isbn IS NOT NULL THEN
+        INSERT INTO {ISBN_TABLE} (isbn, book_id) VALUES (NEW.isbn, NEW.id)
+            ON CONFLICT (isbn) DO NOTHING;
+        IF NOT EXISTS (SELECT 1 FROM {ISBN_TABLE} WHERE isbn = NEW.isbn AND book_id = NEW.id) THEN
+            RAISE EXCEPTION 'duplicate key value violates unique constraint "{ISBN_TABLE}_pkey"'
+                USING ERRCODE = 'unique_violation',
+                      DETAIL = format('Key (isbn)=(%s) already exists.', NEW.isbn);
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _book_genres_fk(connection: Connection) -> Optional[str]:
+    return connection.execute(text(
+        "SELECT conname FROM pg_constraint "
+        "WHERE conrelid = to_regclass('book_genres') AND contype = 'f' "
+        "AND confrelid = to_regclass('books')"
+    )).scalar()
+
+
+def _book_indexes(connection: Connection) -> List[Tuple[str, str]]:
+    """
+    Индексы books, кроме первичного ключа: [(имя, CREATE INDEX ...)].
+
+    Индексы берутся из каталога, а не из моделей: таблицу пересоздают и
+    миграция 002 (до составных индексов 003 и 004), и команда partition
+    на схеме последней ревизии.
+    """
+    rows = connection.execute(text(
+        "SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = to_regclass('books') AND NOT i.indisprimary ORDER BY c.relname"
+    ))
+    return [(name, definition) for name, definition in rows]
+
+
+def _has_tombstone_trigger(connection: Connection) -> bool:
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_trigger "
+        "WHERE tgrelid = to_regclass('books') AND tgname = :name)"
+    ), {"name": _TOMBSTONE_TRIGGER}).scalar()
+
+
+def _restore_tombstone_trigger(connection: Connection) -> None:
+    # Импорт здесь: app.models.tombstone импортирует этот модуль
+    from app.models.tombstone import install_tombstone_triggers
+
+    install_tombstone_triggers(connection, ["books"])
+
+
+def _add_book_foreign_keys(connection: Connection) -> None:
+    connection.execute(text(
+        "ALTER TABLE books ADD CONSTRAINT books_author_id_fkey "
+        "FOREIGN KEY (author_id) REFERENCES authors (id) ON DELETE CASCADE"
+    ))
+    connection.execute(text(
+        "ALTER TABLE books ADD CONSTRAINT books_publisher_id_fkey "
+        "FOREIGN KEY (publisher_id) REFERENCES publishers (id) ON DELETE SET NULL"
+    ))
+
+
+def partition_books_table(
+    connection: Connection,
+    interval: str = BOOKS_PARTITION_INTERVAL,
+    ahead: int = BOOKS_PARTITIONS_AHEAD,
+    today: Optional[date] = None
+) -> List[str]:
+    """
+    Преобразовать books в таблицу, секционированную по publication_date.
+
+    Создаёт секции для всех периодов, в которых есть книги, и для
+    текущего и будущих периодов, переносит данные и пересоздаёт индексы
+    (те, что были у таблицы, уникальные — без UNIQUE), внешние ключи,
+    каскад на book_genres, триггер ленты изменений (если он был) и
+    проверку уникальности isbn (book_isbns). Используется миграцией при
+    BOOKS_PARTITIONING=1 и командой partition.
+
+    Args:
+        connection: Соединение PostgreSQL (внутри транзакции)
+        interval: Интервал секций
+        ahead: Количество будущих секций
+        today: Текущая дата (для тестов)
+
+    Returns:
+        Имена созданных секций
+    """
+    if not _is_postgresql(connection) or is_books_partitioned(connection):
+        return []
+
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence('books', 'id')")).scalar()
+    indexes = _book_indexes(connection)
+    tombstones = _has_tombstone_trigger(connection)
+    data_years = [
+        int(row[0]) for row in connection.execute(text(
+            "SELECT DISTINCT extract(year FROM publication_date) FROM books "
+            "WHERE publication_date IS NOT NULL"
+        ))
+    ]
+    year = (today or date.today()).year
+    step = _interval_years(interval)
+    starts = sorted(
+        {partition_start(y, interval) for y in data_years}
+        | set(partition_years(year, year + ahead * step, interval))
+    )
+
+    # Последовательность id переживает пересоздание таблицы
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    connection.execute(text(
+        "CREATE TABLE books_partitioned (LIKE books INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (publication_date)"
+    ))
+    created = []
+    for start in starts:
+        name = partition_name(start, interval)
+        lower, upper = partition_bounds(start, interval)
+        connection.execute(text(
+            f"CREATE TABLE {name} PARTITION OF books_partitioned "
+            f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        created.append(name)
+    connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF books_partitioned DEFAULT"))
+
+    connection.execute(text("INSERT INTO books_partitioned SELECT * FROM books"))
+
+    fk = _book_genres_fk(connection)
+    if fk:
+        connection.execute(text(f"ALTER TABLE book_genres DROP CONSTRAINT {fk}"))
+    connection.execute(text("DROP TABLE books"))
+    connection.execute(text("ALTER TABLE books_partitioned RENAME TO books"))
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY books.id"))
+
+    _add_book_foreign_keys(connection)
+    for _, definition in indexes:
+        connection.execute(text(definition.replace("CREATE UNIQUE INDEX", "CREATE INDEX", 1)))
+    if tombstones:
+        _restore_tombstone_trigger(connection)
+
+    connection.execute(text(_CASCADE_FUNCTION))
+    connection.execute(text(
+        "CREATE TRIGGER books_delete_genre_links AFTER DELETE ON books "
+        "FOR EACH ROW EXECUTE FUNCTION books_delete_genre_links()"
+    ))
+
+    connection.execute(text(
+        f"CREATE TABLE {ISBN_TABLE} (isbn varchar(20) PRIMARY KEY, book_id integer NOT NULL)"
+    ))
+    connection.execute(text(
+        f"INSERT INTO {ISBN_TABLE} (isbn, book_id) SELECT isbn, id FROM books WHERE isbn IS NOT NULL"
+    ))
+    connection.execute(text(_ISBN_FUNCTION))
+    connection.execute(text(
+        "CREATE TRIGGER books_unique_isbn AFTER INSERT OR UPDATE OF isbn OR DELETE ON books "
+        "FOR EACH ROW EXECUTE FUNCTION books_unique_isbn()"
+    ))
+    return created + [DEFAULT_PARTITION]
+
+
+def unpartition_books_table(connection: Connection) -> None:
+    """
+    Вернуть books в обычную таблицу (откат миграции).
+
+    Восстанавливает первичный ключ, индексы секционированной таблицы (по
+    isbn — уникальный), триггер ленты изменений (если он был) и внешний
+    ключ book_genres.book_id.
+    """
+    if not is_books_partitioned(connection):
+        return
+
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence('books', 'id')")).scalar()
+    indexes = _book_indexes(connection)
+    tombstones = _has_tombstone_trigger(connection)
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    connection.execute(text("CREATE TABLE books_plain (LIKE books INCLUDING DEFAULTS)"))
+    connection.execute(text("INSERT INTO books_plain SELECT * FROM books"))
+
+    connection.execute(text("DROP TABLE books CASCADE"))
+    connection.execute(text("DROP FUNCTION IF EXISTS books_delete_genre_links()"))
+    connection.execute(text("DROP FUNCTION IF EXISTS books_unique_isbn()"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {ISBN_TABLE}"))
+    connection.execute(text("ALTER TABLE books_plain RENAME TO books"))
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY books.id"))
+    connection.execute(text("ALTER TABLE books ADD CONSTRAINT books_pkey PRIMARY KEY (id)"))
+
+    _add_book_foreign_keys(connection)
+    for name, definition in indexes:
+        if name in _UNIQUE_INDEXES:
+            definition = definition.replace("CREATE INDEX", "CREATE UNIQUE INDEX", 1)
+        connection.execute(text(definition))
+    if tombstones:
+        _restore_tombstone_trigger(connection)
+
+    connection.execute(text(
+        "ALTER TABLE book_genres ADD CONSTRAINT book_genres_book_id_fkey "
+        "FOREIGN KEY (book_id) REFERENCES books (id) ON DELETE CASCADE"
+    ))
+
+
+if __name__ == "__main__":
+    # Обслуживание по расписанию: python -m app.core.partitioning
+    # Включение и отключение: python -m app.core.partitioning partition|unpartition
+    from app.core.database import get_engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "ensure"
+    with get_engine().begin() as conn:
+        if command == "partition":
+            names = partition_books_table(conn)
+        elif command == "unpartition":
+            unpartition_books_table(conn)
+            names = []
+        elif command == "ensure":
+            names = ensure_book_partitions(conn)
+        else:
+            sys.exit(f"Unknown command: {command} (ensure, partition, unpartition)")
+    print(f"Created partitions: {', '.join(names) or 'none'}")
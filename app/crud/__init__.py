@@ -4,7 +4,7 @@ CRUD module - Create, Read, Update, Delete operations
 Классы для работы с базой данных
 """
 
-from app.crud.base import BaseCRUD
+from app.crud.base import BaseCRUD, unit_of_work
 from app.crud.author import AuthorCRUD, author_crud
 from app.crud.book import BookCRUD, book_crud
 from app.crud.genre import GenreCRUD, genre_crud
@@ -12,6 +12,7 @@ from app.crud.publisher import PublisherCRUD, publisher_crud
 
 __all__ = [
     "BaseCRUD",
+    "unit_of_work",
     "AuthorCRUD",
     "BookCRUD",
     "GenreCRUD",
@@ -4,15 +4,52 @@ Async CRUD Operations
 Асинхронные CRUD операции для демонстрации async SQLAlchemy
 """
 
-from typing import TypeVar, Generic, Type, Optional, List, Any
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
-from sqlalchemy.orm import selectinload
-from app.models.base import BaseModel
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import (
+    TypeVar, Generic, Type, Optional, List, Any, AsyncIterator,
+    Awaitable, Callable, Sequence, Tuple
+)
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select, update, delete, exists, func
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.orm import lazyload, selectinload, undefer, with_parent
+from app.core.database_async import AsyncSessionLocal, async_pool_capacity
+from app.models.base import BaseModel, json_default, model_to_dict, paginate
+from app.core.database import foreign_keys_enforced
+from app.crud.author import author_tree_deletes
+from app.crud.base import BaseCRUD, UNIT_OF_WORK_KEY, build_conditions, in_unit_of_work
 
 ModelType = TypeVar("ModelType", bound=BaseModel)
 
 
+@asynccontextmanager
+async def async_unit_of_work(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    Асинхронный пакетный режим: один коммит на весь блок.
+    
+    См. app.crud.base.unit_of_work.
+    
+    Example:
+        >>> async with async_unit_of_work(db):
+        ...     for name in names:
+        ...         await async_genre_crud.get_or_create(db, name)
+    """
+    depth = db.info.get(UNIT_OF_WORK_KEY, 0)
+    db.info[UNIT_OF_WORK_KEY] = depth + 1
+    try:
+        yield db
+        if depth == 0:
+            await db.commit()
+    except Exception:
+        if depth == 0:
+            await db.rollback()
+        raise
+    finally:
+        db.info[UNIT_OF_WORK_KEY] = depth
+
+
 class AsyncBaseCRUD(Generic[ModelType]):
     """
     Асинхронный базовый класс с CRUD операциями.
@@ -23,6 +60,18 @@ class AsyncBaseCRUD(Generic[ModelType]):
     def __init__(self, model: Type[ModelType]):
         self.model = model
     
+    async def _commit(self, db: AsyncSession, *objs: ModelType) -> None:
+        """
+        Зафиксировать изменения: вне async_unit_of_work — commit и refresh,
+        внутри — только flush.
+        """
+        if in_unit_of_work(db):
+            await db.flush()
+            return
+        await db.commit()
+        for obj in objs:
+            await db.refresh(obj)
+    
     async def create(self, db: AsyncSession, **kwargs) -> ModelType:
         """
         Асинхронное создание записи.
@@ -36,8 +85,7 @@ class AsyncBaseCRUD(Generic[ModelType]):
         """
         db_obj = self.model(**kwargs)
         db.add(db_obj)
-        await db.commit()
-        await db.refresh(db_obj)
+        await self._commit(db, db_obj)
         return db_obj
     
     async def get(self, db: AsyncSession, id: int) -> Optional[ModelType]:
@@ -79,6 +127,54 @@ class AsyncBaseCRUD(Generic[ModelType]):
         )
         return result.scalars().all()
     
+    async def _stream(self, db: AsyncSession, stmt, chunk_size: int) -> AsyncIterator[ModelType]:
+        """
+        Отдавать объекты запроса по мере получения строк.
+        
+        AsyncSession.stream_scalars открывает серверный курсор (asyncpg)
+        или читает курсор порциями fetchmany (aiosqlite); yield_per
+        ограничивает буфер ORM одной порцией. Курсор закрывается и при
+        досрочном выходе из цикла.
+        """
+        result = await db.stream_scalars(stmt.execution_options(yield_per=chunk_size))
+        try:
+            async for obj in result:
+                yield obj
+        finally:
+            await result.close()
+    
+    def stream_multi(
+        self,
+        db: AsyncSession,
+        *criteria,
+        order_by=None,
+        chunk_size: int = 1000,
+        **filters
+    ) -> AsyncIterator[ModelType]:
+        """
+        Потоковое чтение записей с постоянным расходом памяти.
+        
+        Args:
+            db: Асинхронная сессия (занята до конца итерации)
+            *criteria: SQL-выражения фильтра
+            order_by: Сортировка (по умолчанию — по id)
+            chunk_size: Размер порции чтения
+            **filters: Фильтры поле=значение
+            
+        Returns:
+            Асинхронный итератор объектов
+        
+        Example:
+            >>> async for book in async_book_crud.stream_multi(db, language="Russian"):
+            ...     await send(book)
+        """
+        stmt = select(self.model)
+        conditions = build_conditions(self.model, criteria, filters)
+        if conditions:
+            stmt = stmt.where(*conditions)
+        stmt = stmt.order_by(order_by if order_by is not None else self.model.id)
+        return self._stream(db, stmt, chunk_size)
+    
     async def update(
         self, 
         db: AsyncSession, 
@@ -105,8 +201,7 @@ class AsyncBaseCRUD(Generic[ModelType]):
             if hasattr(db_obj, field):
                 setattr(db_obj, field, value)
         
-        await db.commit()
-        await db.refresh(db_obj)
+        await self._commit(db, db_obj)
         return db_obj
     
     async def delete(self, db: AsyncSession, *, id: int) -> bool:
@@ -125,20 +220,173 @@ class AsyncBaseCRUD(Generic[ModelType]):
             return False
         
         await db.delete(db_obj)
-        await db.commit()
+        await self._commit(db)
         return True
     
-    async def count(self, db: AsyncSession) -> int:
+    async def count(self, db: AsyncSession, *criteria, **filters) -> int:
         """
         Асинхронный подсчёт записей.
         
+        Args:
+            db: Асинхронная сессия
+            *criteria: SQL-условия
+            **filters: Условия равенства поле=значение
+        
         Returns:
             Количество записей
         """
+        stmt = select(func.count()).select_from(self.model)
+        conditions = build_conditions(self.model, criteria, filters)
+        if conditions:
+            stmt = stmt.where(*conditions)
+        result = await db.execute(stmt)
+        return result.scalar() or 0
+    
+    async def exists(self, db: AsyncSession, id: int) -> bool:
+        """
+        Асинхронная проверка существования записи через SELECT EXISTS(...).
+        
+        Args:
+            db: Асинхронная сессия
+            id: ID записи
+        
+        Returns:
+            True если существует, False если нет
+        """
         result = await db.execute(
-            select(func.count()).select_from(self.model)
+            select(exists().where(self.model.id == id))
         )
-        return result.scalar() or 0
+        return result.scalar_one()
+    
+    async def estimate_count(self, db: AsyncSession) -> int:
+        """
+        Приблизительное количество записей из статистики планировщика.
+        
+        См. BaseCRUD.estimate_count.
+        """
+        return await db.run_sync(BaseCRUD(self.model).estimate_count)
+
+
+# ==================== Экспорт ====================
+
+async def stream_ndjson(
+    objects: AsyncIterator[BaseModel],
+    columns: Optional[Sequence[str]] = None
+) -> AsyncIterator[str]:
+    """
+    Преобразовать поток объектов в строки NDJSON.
+    
+    Подходит для потокового HTTP-ответа: строки отдаются по мере
+    чтения из базы, весь результат в памяти не собирается.
+    
+    Example:
+        >>> return StreamingResponse(
+        ...     stream_ndjson(async_book_crud.stream_by_author(db, author_id)),
+        ...     media_type="application/x-ndjson"
+        ... )
+    """
+    async for obj in objects:
+        yield json.dumps(
+            model_to_dict(obj, columns), ensure_ascii=False, default=json_default
+        ) + "\n"
+
+
+# ==================== Параллельное выполнение ====================
+
+AsyncOperation = Callable[[AsyncSession], Awaitable[Any]]
+
+# Ошибки, после которых операцию имеет смысл повторить на новом соединении
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (OperationalError, InterfaceError)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Временная ли ошибка: обрыв соединения, блокировка, deadlock и т.п."""
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+async def run_concurrently(
+    operations: Sequence[AsyncOperation],
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    retries: int = 2,
+    backoff: float = 0.05
+) -> dict:
+    """
+    Выполнить набор CRUD-операций действительно параллельно.
+
+    AsyncSession нельзя использовать из нескольких задач одновременно,
+    поэтому каждая операция получает собственную сессию и выполняется
+    в async_unit_of_work — одной транзакцией, которую безопасно повторить.
+    Число одновременно работающих операций ограничено семафором по размеру
+    пула соединений.
+
+    Args:
+        operations: Функции, принимающие сессию, например
+            `lambda db: async_author_crud.create(db, name="...")`
+        session_factory: Фабрика сессий
+        concurrency: Предел параллельности (по умолчанию — ёмкость пула)
+        timeout: Таймаут одной попытки, секунды (по таймауту не повторяется)
+        retries: Повторы при временных ошибках
+        backoff: Базовая пауза перед повтором, удваивается с каждой попыткой
+
+    Returns:
+        Словарь:
+        - results: результаты в порядке операций (None для неудачных)
+        - errors: {индекс операции: исключение}
+        - succeeded, failed, retried: счётчики
+
+    Example:
+        >>> report = await run_concurrently([
+        ...     partial(async_author_crud.create, name=name) for name in names
+        ... ])
+        >>> report["succeeded"], report["errors"]
+        (3, {})
+    """
+    if concurrency is None:
+        concurrency = async_pool_capacity(session_factory.kw.get("bind"))
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    retried = 0
+
+    async def attempt(operation: AsyncOperation) -> Any:
+        async with session_factory() as db:
+            async with async_unit_of_work(db):
+                return await operation(db)
+
+    async def run(operation: AsyncOperation) -> Any:
+        nonlocal retried
+        async with semaphore:
+            for number in range(retries + 1):
+                try:
+                    return await asyncio.wait_for(attempt(operation), timeout)
+                except Exception as error:
+                    if number == retries or not is_transient_error(error):
+                        raise
+                    retried += 1
+                    await asyncio.sleep(backoff * 2 ** number)
+
+    outcomes = await asyncio.gather(
+        *(run(operation) for operation in operations),
+        return_exceptions=True
+    )
+
+    results, errors = [], {}
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, BaseException):
+            errors[index] = outcome
+            results.append(None)
+        else:
+            results.append(outcome)
+
+    return {
+        "results": results,
+        "errors": errors,
+        "succeeded": len(outcomes) - len(errors),
+        "failed": len(errors),
+        "retried": retried,
+    }
 
 
 # ==================== Специализированные асинхронные CRUD ====================
@@ -169,6 +417,29 @@ class AsyncAuthorCRUD(AsyncBaseCRUD[Author]):
         )
         return result.scalars().all()
     
+    def stream_search_by_name(
+        self,
+        db: AsyncSession,
+        name: str,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[Author]:
+        """Потоковый поиск авторов по части имени (см. stream_multi)."""
+        return self.stream_multi(db, Author.name.ilike(f"%{name}%"), chunk_size=chunk_size)
+    
+    async def get_multi_with_books_count(
+        self,
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[Author]:
+        """Список авторов с books_count одним SELECT (см. AuthorCRUD)."""
+        result = await db.execute(
+            select(Author)
+            .options(undefer(Author.books_count), lazyload(Author.books))
+            .order_by(Author.id).offset(skip).limit(limit)
+        )
+        return result.scalars().all()
+    
     async def get_with_books(self, db: AsyncSession, author_id: int) -> Optional[Author]:
         """Получить автора с книгами (eager loading)."""
         result = await db.execute(
@@ -177,6 +448,29 @@ class AsyncAuthorCRUD(AsyncBaseCRUD[Author]):
             .where(Author.id == author_id)
         )
         return result.scalar_one_or_none()
+    
+    async def delete_author_tree(self, db: AsyncSession, author_id: int) -> Optional[int]:
+        """
+        Удалить автора со всеми книгами каскадом базы (см. AuthorCRUD.delete_author_tree).
+
+        Returns:
+            Количество удалённых книг или None, если автора нет
+        """
+        if not await db.scalar(select(exists().where(Author.id == author_id))):
+            return None
+
+        books = await db.scalar(
+            select(func.count()).select_from(Book).where(Book.author_id == author_id)
+        )
+        cascades = await db.run_sync(lambda session: foreign_keys_enforced(session.connection()))
+        for statement in author_tree_deletes(author_id, cascades):
+            await db.execute(statement)
+        await self._commit(db)
+        return books
+    
+    async def delete(self, db: AsyncSession, *, id: int) -> bool:
+        """Удалить автора вместе с книгами (см. delete_author_tree)."""
+        return await self.delete_author_tree(db, id) is not None
 
 
 class AsyncBookCRUD(AsyncBaseCRUD[Book]):
@@ -192,17 +486,40 @@ class AsyncBookCRUD(AsyncBaseCRUD[Book]):
         )
         return result.scalar_one_or_none()
     
+    async def get_multi_with_genre_names(
+        self,
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[Book]:
+        """Список книг с genre_names_joined одним SELECT (см. BookCRUD)."""
+        result = await db.execute(
+            select(Book)
+            .options(undefer(Book.genre_names_joined), lazyload(Book.genres))
+            .order_by(Book.id).offset(skip).limit(limit)
+        )
+        return result.scalars().all()
+    
     async def get_by_author(
         self, 
         db: AsyncSession, 
         author_id: int
     ) -> List[Book]:
-        """Получить все книги автора."""
+        """Получить все книги автора, отсортированные по названию."""
         result = await db.execute(
-            select(Book).where(Book.author_id == author_id)
+            select(Book).where(Book.author_id == author_id).order_by(Book.title)
         )
         return result.scalars().all()
     
+    def stream_by_author(
+        self,
+        db: AsyncSession,
+        author_id: int,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[Book]:
+        """Потоковое чтение книг автора (см. stream_multi)."""
+        return self.stream_multi(db, author_id=author_id, chunk_size=chunk_size)
+    
     async def get_with_relations(
         self, 
         db: AsyncSession, 
@@ -238,8 +555,7 @@ class AsyncBookCRUD(AsyncBaseCRUD[Book]):
         
         if genre and genre not in book.genres:
             book.genres.append(genre)
-            await db.commit()
-            await db.refresh(book)
+            await self._commit(db, book)
         
         return book
 
@@ -268,6 +584,20 @@ class AsyncGenreCRUD(AsyncBaseCRUD[Genre]):
         if genre:
             return genre
         return await self.create(db, name=name, description=description)
+    
+    async def get_with_books(
+        self,
+        db: AsyncSession,
+        genre_id: int,
+        *criteria,
+        **options
+    ) -> Optional[Tuple[Genre, List[Book]]]:
+        """Жанр и страница его книг (см. GenreCRUD.get_with_books)."""
+        genre = await self.get(db, genre_id)
+        if genre is None:
+            return None
+        stmt = paginate(select(Book).where(with_parent(genre, Genre.books)), Book, *criteria, **options)
+        return genre, (await db.execute(stmt)).scalars().all()
 
 
 class AsyncPublisherCRUD(AsyncBaseCRUD[Publisher]):
@@ -282,6 +612,22 @@ class AsyncPublisherCRUD(AsyncBaseCRUD[Publisher]):
             select(Publisher).where(Publisher.name == name)
         )
         return result.scalar_one_or_none()
+    
+    async def get_books_page(
+        self,
+        db: AsyncSession,
+        publisher_id: int,
+        *criteria,
+        **options
+    ) -> Optional[Tuple[Publisher, List[Book]]]:
+        """Издательство и страница его книг (см. PublisherCRUD.get_books_page)."""
+        publisher = await self.get(db, publisher_id)
+        if publisher is None:
+            return None
+        stmt = paginate(
+            select(Book).where(with_parent(publisher, Publisher.books)), Book, *criteria, **options
+        )
+        return publisher, (await db.execute(stmt)).scalars().all()
 
 
 # Синглтоны для удобства
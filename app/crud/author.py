@@ -5,9 +5,40 @@ CRUD операции для модели Author
 """
 
 from typing import Optional, List
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.orm import Session, lazyload, undefer
+from sqlalchemy.sql import Executable
+from app.core.database import foreign_keys_enforced
 from app.crud.base import BaseCRUD
 from app.models.author import Author
+from app.models.book import Book, book_genres
+
+
+def author_tree_deletes(author_id: int, cascades: bool) -> List[Executable]:
+    """
+    Выражения удаления автора вместе с книгами.
+
+    Если база применяет внешние ключи, достаточно удалить автора: книги
+    и их связи с жанрами удалит ON DELETE CASCADE. Иначе (SQLite без
+    PRAGMA foreign_keys) связи и книги удаляются явно, тоже пакетно.
+
+    Args:
+        author_id: ID автора
+        cascades: Применяет ли база каскады внешних ключей
+
+    Returns:
+        DELETE-выражения в порядке выполнения
+    """
+    statements = []
+    if not cascades:
+        books = select(Book.id).where(Book.author_id == author_id)
+        statements += [
+            delete(book_genres).where(book_genres.c.book_id.in_(books)),
+            delete(Book).where(Book.author_id == author_id)
+            .execution_options(synchronize_session=False),
+        ]
+    statements.append(delete(Author).where(Author.id == author_id))
+    return statements
 
 
 class AuthorCRUD(BaseCRUD[Author]):
@@ -61,6 +92,31 @@ class AuthorCRUD(BaseCRUD[Author]):
         """
         return db.query(Author).filter(Author.country == country).all()
     
+    def get_multi_with_books_count(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[Author]:
+        """
+        Список авторов с количеством книг одним SELECT.
+
+        books_count вычисляется коррелированным подзапросом в том же
+        запросе; коллекция books не загружается (lazyload вместо selectin).
+
+        Args:
+            db: Сессия базы данных
+            skip: Пропустить записей
+            limit: Лимит записей
+
+        Returns:
+            Список авторов с загруженным books_count
+        """
+        return db.query(Author).options(
+            undefer(Author.books_count),
+            lazyload(Author.books)
+        ).order_by(Author.id).offset(skip).limit(limit).all()
+    
     def get_with_books(self, db: Session, author_id: int) -> Optional[Author]:
         """
         Получить автора вместе с его книгами.
@@ -107,6 +163,45 @@ class AuthorCRUD(BaseCRUD[Author]):
         
         return query.all()
 
+    def delete_author_tree(self, db: Session, author_id: int) -> Optional[int]:
+        """
+        Удалить автора со всеми книгами, не загружая книги в сессию.
+
+        Книги удаляются каскадом базы одним DELETE, а не по одной строке
+        через ORM-каскад Author.books. Загруженные ранее в сессию объекты
+        книг автора устаревают и недоступны после коммита.
+
+        Args:
+            db: Сессия базы данных
+            author_id: ID автора
+
+        Returns:
+            Количество удалённых книг или None, если автора нет
+        """
+        if not db.scalar(select(exists().where(Author.id == author_id))):
+            return None
+
+        books = db.scalar(
+            select(func.count()).select_from(Book).where(Book.author_id == author_id)
+        )
+        for statement in author_tree_deletes(author_id, foreign_keys_enforced(db.connection())):
+            db.execute(statement)
+        self._commit(db)
+        return books
+
+    def delete(self, db: Session, *, id: int) -> bool:
+        """
+        Удалить автора вместе с книгами (см. delete_author_tree).
+
+        Args:
+            db: Сессия базы данных
+            id: ID автора
+
+        Returns:
+            True если удалено, False если не найдено
+        """
+        return self.delete_author_tree(db, id) is not None
+
 
 # Синглтон для удобства использования
 author_crud = AuthorCRUD()
@@ -1,191 +1,339 @@
 """
-        return self.get(db, id) is not None
+Base CRUD
+=========
+Базовый класс для CRUD операций
+"""
+
+from contextlib import contextmanager
+from typing import TypeVar, Generic, Type, Optional, List, Any, Iterator
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, exists, func, text
+from app.models.base import BaseModel
+
+ModelType = TypeVar("ModelType", bound=BaseModel)
+
+# Ключ в Session.info: глубина вложенности unit_of_work
+UNIT_OF_WORK_KEY = "crud_unit_of_work"
+
+# Максимум параметров в одном IN (...) — ограничение SQLite по умолчанию 999
+_IN_CHUNK = 500
+
+
+def in_unit_of_work(db: Session) -> bool:
+    """Проверить, выполняется ли сессия внутри unit_of_work."""
+    return db.info.get(UNIT_OF_WORK_KEY, 0) > 0
+
+
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[Session]:
+    """
+    Пакетный режим: CRUD-методы внутри блока делают только flush,
+    а коммит выполняется один раз при выходе.
+    
+    Вместо коммита (и fsync) на каждый create/update/delete — один на весь
+    блок. refresh после записи не выполняется: первичные ключи и значения
+    по умолчанию известны после flush (RETURNING / Python-side defaults).
+    При исключении вся работа блока откатывается.
+    
+    Вложенные блоки допустимы: коммитит только внешний.
+    
+    Example:
+        >>> with unit_of_work(db):
+        ...     author = author_crud.create(db, name="Толстой")
+        ...     for title in titles:
+        ...         book_crud.create(db, title=title, author_id=author.id)
+    """
+    depth = db.info.get(UNIT_OF_WORK_KEY, 0)
+    db.info[UNIT_OF_WORK_KEY] = depth + 1
+    try:
+        yield db
+        if depth == 0:
+            db.commit()
+    except Exception:
+        if depth == 0:
+            db.rollback()
+        raise
+    finally:
+        db.info[UNIT_OF_WORK_KEY] = depth
+
+
+def build_conditions(model: Type[BaseModel], criteria: tuple, filters: dict) -> list:
+    """
+    Собрать условия WHERE из SQL-выражений и пар поле=значение.
+    
+    Raises:
+        ValueError: Если поля нет в модели
+    """
+    conditions = list(criteria)
+    for field_name, value in filters.items():
+        field = getattr(model, field_name, None)
+        if field is None:
+            raise ValueError(f"Field '{field_name}' not found in {model.__name__}")
+        conditions.append(field == value)
+    return conditions
+
+
+class BaseCRUD(Generic[ModelType]):
+    """
+    Базовый класс с CRUD операциями.
+    Все остальные CRUD классы наследуются от него.
+    
+    Использует паттерн Generic для типизации.
+    """
+    
+    def __init__(self, model: Type[ModelType]):
         """
-            True если существует, False если нет
-        Returns:
-            
-            id: ID записи
-            db: Сессия базы данных
         Args:
-        
-        Проверить существование записи.
+            model: Класс модели SQLAlchemy
         """
-    def exists(self, db: Session, id: int) -> bool:
+        self.model = model
     
-        return db.query(self.model).count()
+    def _commit(self, db: Session, *objs: ModelType) -> None:
         """
-            Количество записей в таблице
-        Returns:
-            
-            db: Сессия базы данных
-        Args:
+        Зафиксировать изменения после мутирующей операции.
         
-        Подсчитать количество записей.
+        Вне unit_of_work — commit и refresh объектов (как раньше);
+        внутри — только flush, коммит выполнит unit_of_work.
         """
-    def count(self, db: Session) -> int:
-    
-        return True
+        if in_unit_of_work(db):
+            db.flush()
+            return
         db.commit()
-        db.delete(db_obj)
-        
-            return False
-        if db_obj is None:
-        db_obj = self.get(db, id)
+        for obj in objs:
+            db.refresh(obj)
+    
+    def create(self, db: Session, **kwargs) -> ModelType:
         """
-            True если удалено, False если не найдено
+        Создать новую запись.
+        
+        Args:
+            db: Сессия базы данных
+            **kwargs: Поля для создания объекта
+            
         Returns:
+            Созданный объект
             
-            id: ID записи для удаления
-            db: Сессия базы данных
-        Args:
-        
-        Удалить запись.
+        Example:
+            >>> crud = BaseCRUD(Author)
+            >>> author = crud.create(db, name="Толстой", country="Россия")
         """
-    def delete(self, db: Session, *, id: int) -> bool:
-    
+        db_obj = self.model(**kwargs)
+        db.add(db_obj)
+        self._commit(db, db_obj)
         return db_obj
-        db.refresh(db_obj)
-        db.commit()
-        
-                setattr(db_obj, field, value)
-            if hasattr(db_obj, field):
-        for field, value in kwargs.items():
-        
-            return None
-        if db_obj is None:
-        db_obj = self.get(db, id)
+    
+    def get(self, db: Session, id: int) -> Optional[ModelType]:
         """
-            Обновлённый объект или None
-        Returns:
-            
-            **kwargs: Поля для обновления
-            id: ID записи для обновления
-            db: Сессия базы данных
-        Args:
+        Получить запись по ID.
         
-        Обновить запись.
+        Args:
+            db: Сессия базы данных
+            id: ID записи
+            
+        Returns:
+            Объект или None, если не найден
         """
-    ) -> Optional[ModelType]:
-        **kwargs
-        id: int, 
-        *, 
-        db: Session, 
-        self, 
-    def update(
+        return db.query(self.model).filter(self.model.id == id).first()
     
-        return db.query(self.model).all()
+    def get_by_ids(self, db: Session, ids: List[int]) -> List[ModelType]:
         """
-            Список всех объектов
-        Returns:
-            
-            db: Сессия базы данных
-        Args:
+        Получить записи по списку ID (порциями IN).
         
-        Получить все записи.
+        Args:
+            db: Сессия базы данных
+            ids: ID записей
+            
+        Returns:
+            Найденные объекты в порядке ids; отсутствующие пропускаются
         """
-    def get_all(self, db: Session) -> List[ModelType]:
+        found = {}
+        for i in range(0, len(ids), _IN_CHUNK):
+            for obj in db.query(self.model).filter(self.model.id.in_(ids[i:i + _IN_CHUNK])):
+                found[obj.id] = obj
+        return [found[id] for id in ids if id in found]
     
-        return db.query(self.model).offset(skip).limit(limit).all()
+    def get_by_field(
+        self, 
+        db: Session, 
+        field_name: str, 
+        value: Any
+    ) -> Optional[ModelType]:
         """
-            Список объектов
-        Returns:
-            
-            limit: Максимальное количество записей
-            skip: Сколько записей пропустить
-            db: Сессия базы данных
-        Args:
+        Получить запись по значению поля.
         
-        Получить список записей с пагинацией.
+        Args:
+            db: Сессия базы данных
+            field_name: Имя поля
+            value: Значение для поиска
+            
+        Returns:
+            Первый найденный объект или None
         """
-    ) -> List[ModelType]:
-        limit: int = 100
-        skip: int = 0, 
-        *, 
-        db: Session, 
-        self, 
-    def get_multi(
-    
-        return db.query(self.model).filter(field == value).first()
-            raise ValueError(f"Field '{field_name}' not found in {self.model.__name__}")
-        if field is None:
         field = getattr(self.model, field_name, None)
+        if field is None:
+            raise ValueError(f"Field '{field_name}' not found in {self.model.__name__}")
+        return db.query(self.model).filter(field == value).first()
+    
+    def get_multi(
+        self, 
+        db: Session, 
+        *, 
+        skip: int = 0, 
+        limit: int = 100
+    ) -> List[ModelType]:
         """
-            Первый найденный объект или None
-        Returns:
-            
-            value: Значение для поиска
-            field_name: Имя поля
-            db: Сессия базы данных
-        Args:
+        Получить список записей с пагинацией.
         
-        Получить запись по значению поля.
+        Args:
+            db: Сессия базы данных
+            skip: Сколько записей пропустить
+            limit: Максимальное количество записей
+            
+        Returns:
+            Список объектов
         """
-    ) -> Optional[ModelType]:
-        value: Any
-        field_name: str, 
-        db: Session, 
-        self, 
-    def get_by_field(
+        return db.query(self.model).offset(skip).limit(limit).all()
     
-        return db.query(self.model).filter(self.model.id == id).first()
+    def get_all(self, db: Session) -> List[ModelType]:
         """
-            Объект или None, если не найден
-        Returns:
-            
-            id: ID записи
+        Получить все записи.
+        
+        Args:
             db: Сессия базы данных
+            
+        Returns:
+            Список всех объектов
+        """
+        return db.query(self.model).all()
+    
+    def update(
+        self, 
+        db: Session, 
+        *, 
+        id: int, 
+        **kwargs
+    ) -> Optional[ModelType]:
+        """
+        Обновить запись.
+        
         Args:
+            db: Сессия базы данных
+            id: ID записи для обновления
+            **kwargs: Поля для обновления
+            
+        Returns:
+            Обновлённый объект или None
+        """
+        db_obj = self.get(db, id)
+        if db_obj is None:
+            return None
         
-        Получить запись по ID.
+        for field, value in kwargs.items():
+            if hasattr(db_obj, field):
+                setattr(db_obj, field, value)
+        
+        self._commit(db, db_obj)
+        return db_obj
+    
+    def delete(self, db: Session, *, id: int) -> bool:
         """
-    def get(self, db: Session, id: int) -> Optional[ModelType]:
+        Удалить запись.
+        
+        Args:
+            db: Сессия базы данных
+            id: ID записи для удаления
+            
+        Returns:
+            True если удалено, False если не найдено
+        """
+        db_obj = self.get(db, id)
+        if db_obj is None:
+            return False
+        
+        db.delete(db_obj)
+        self._commit(db)
+        return True
     
-        return db_obj
-        db.refresh(db_obj)
-        db.commit()
-        db.add(db_obj)
-        db_obj = self.model(**kwargs)
+    def count(self, db: Session, *criteria, **filters) -> int:
         """
-            >>> author = crud.create(db, name="Толстой", country="Россия")
-            >>> crud = BaseCRUD(Author)
-        Example:
+        Подсчитать количество записей.
+        
+        Выполняет прямой SELECT count(*) FROM ... WHERE ..., без подзапроса
+        над всей таблицей, как Query.count().
+        
+        Args:
+            db: Сессия базы данных
+            *criteria: SQL-условия (например, Book.price > 500)
+            **filters: Условия равенства поле=значение
             
-            Созданный объект
         Returns:
+            Количество записей, удовлетворяющих условиям
             
-            **kwargs: Поля для создания объекта
-            db: Сессия базы данных
-        Args:
-        
-        Создать новую запись.
+        Example:
+            >>> book_crud.count(db, Book.price > 500, language="Russian")
         """
-    def create(self, db: Session, **kwargs) -> ModelType:
+        stmt = select(func.count()).select_from(self.model)
+        conditions = build_conditions(self.model, criteria, filters)
+        if conditions:
+            stmt = stmt.where(*conditions)
+        return db.execute(stmt).scalar_one()
     
-        self.model = model
+    def estimate_count(self, db: Session) -> int:
         """
-            model: Класс модели SQLAlchemy
+        Приблизительное количество записей из статистики планировщика.
+        
+        Для пагинации в UI, где точность не важна, а COUNT(*) по большой
+        таблице стоит полного сканирования:
+        - PostgreSQL: pg_class.reltuples (обновляется ANALYZE/autovacuum)
+        - SQLite: sqlite_stat1 (обновляется ANALYZE)
+        Если статистики нет, выполняется точный count().
+        
         Args:
+            db: Сессия базы данных
+            
+        Returns:
+            Оценка количества записей
         """
-    def __init__(self, model: Type[ModelType]):
-    
-    """
-    Использует паттерн Generic для типизации.
+        table = self.model.__tablename__
+        dialect = db.get_bind().dialect.name
+        estimate = None
+        
+        if dialect == "postgresql":
+            estimate = db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+                {"table": table}
+            ).scalar()
+        elif dialect == "sqlite":
+            has_stats = db.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            ).scalar()
+            if has_stats:
+                # stat: "<строк в таблице> <строк на значение индекса> ..."
+                stat = db.execute(
+                    text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"),
+                    {"table": table}
+                ).scalar()
+                if stat:
+                    estimate = int(stat.split()[0])
+        
+        # reltuples = -1: таблица ещё ни разу не анализировалась (PostgreSQL 14+)
+        if estimate is None or estimate < 0:
+            return self.count(db)
+        return int(estimate)
     
-    Все остальные CRUD классы наследуются от него.
-    Базовый класс с CRUD операциями.
-    """
-class BaseCRUD(Generic[ModelType]):
-
-
-ModelType = TypeVar("ModelType", bound=BaseModel)
-
-from app.models.base import BaseModel
-from sqlalchemy import select, update, delete
-from sqlalchemy.orm import Session
-from typing import TypeVar, Generic, Type, Optional, List, Any
-
-"""
-Базовый класс для CRUD операций
-=========
-Base CRUD
-
+    def exists(self, db: Session, id: int) -> bool:
+        """
+        Проверить существование записи.
+        
+        Выполняет SELECT EXISTS(...) без загрузки объекта и его связей.
+        
+        Args:
+            db: Сессия базы данных
+            id: ID записи
+            
+        Returns:
+            True если существует, False если нет
+        """
+        return db.execute(
+            select(exists().where(self.model.id == id))
+        ).scalar_one()
@@ -4,13 +4,15 @@ Book CRUD
 CRUD операции для модели Book
 """
 
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import date
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm import Session, lazyload, selectinload, undefer
 from sqlalchemy import and_, or_
 from app.crud.base import BaseCRUD
 from app.models.book import Book
 from app.models.genre import Genre
+from app.queries.facets import FacetIndex, facet_counts_sql, ids_from_bits, search_criteria
+from app.queries.similarity import GenreMatrix
 
 
 class BookCRUD(BaseCRUD[Book]):
@@ -18,8 +20,18 @@ class BookCRUD(BaseCRUD[Book]):
     CRUD операции для книг.
 
     Расширяет базовый CRUD специфичными методами для Book.
+
+    Attributes:
+        facet_index: Фасетный индекс (app.queries.facets.FacetIndex); пока
+            он задан, advanced_search без фильтров по названию и автору и
+            faceted_search отвечают по нему, а не запросами с JOIN
+        genre_matrix: Матрица книга × жанр (app.queries.similarity.GenreMatrix)
+            для similar_books; без неё матрица строится на каждый вызов
     """
 
+    facet_index: Optional[FacetIndex] = None
+    genre_matrix: Optional[GenreMatrix] = None
+
     def __init__(self):
         super().__init__(Book)
 
@@ -51,6 +63,31 @@ class BookCRUD(BaseCRUD[Book]):
             Book.title.ilike(f"%{title}%")
         ).all()
 
+    def get_multi_with_genre_names(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[Book]:
+        """
+        Список книг с названиями жанров одним SELECT.
+
+        genre_names_joined собирается базой (group_concat/string_agg) в
+        подзапросе того же запроса; коллекция genres не загружается.
+
+        Args:
+            db: Сессия базы данных
+            skip: Пропустить записей
+            limit: Лимит записей
+
+        Returns:
+            Список книг с загруженным genre_names_joined
+        """
+        return db.query(Book).options(
+            undefer(Book.genre_names_joined),
+            lazyload(Book.genres)
+        ).order_by(Book.id).offset(skip).limit(limit).all()
+
     def get_by_author(
         self,
         db: Session,
@@ -59,7 +96,7 @@ class BookCRUD(BaseCRUD[Book]):
         limit: int = 100
     ) -> List[Book]:
         """
-        Получить книги автора.
+        Получить книги автора, отсортированные по названию.
 
         Args:
             db: Сессия базы данных
@@ -72,7 +109,7 @@ class BookCRUD(BaseCRUD[Book]):
         """
         return db.query(Book).filter(
             Book.author_id == author_id
-        ).offset(skip).limit(limit).all()
+        ).order_by(Book.title).offset(skip).limit(limit).all()
 
     def get_by_genre(self, db: Session, genre_id: int) -> List[Book]:
         """
@@ -182,8 +219,7 @@ class BookCRUD(BaseCRUD[Book]):
 
         if genre not in book.genres:
             book.genres.append(genre)
-            db.commit()
-            db.refresh(book)
+            self._commit(db, book)
 
         return book
 
@@ -211,8 +247,7 @@ class BookCRUD(BaseCRUD[Book]):
         genre = db.query(Genre).filter(Genre.id == genre_id).first()
         if genre and genre in book.genres:
             book.genres.remove(genre)
-            db.commit()
-            db.refresh(book)
+            self._commit(db, book)
 
         return book
 
@@ -229,7 +264,9 @@ class BookCRUD(BaseCRUD[Book]):
         """
         Расширенный поиск книг с несколькими фильтрами.
 
-        Демонстрирует построение динамических запросов.
+        Демонстрирует построение динамических запросов. Если задан
+        facet_index, а title и author_name — нет, книги отбираются по
+        битовым множествам индекса.
 
         Args:
             db: Сессия базы данных
@@ -245,6 +282,10 @@ class BookCRUD(BaseCRUD[Book]):
         """
         from app.models.author import Author
 
+        if self.facet_index is not None and not title and not author_name:
+            bits = self.facet_index.search(genre_name, language, min_price, max_price)
+            return self.get_by_ids(db, ids_from_bits(bits).tolist())
+
         query = db.query(Book)
 
         # Динамически добавляем фильтры
@@ -272,6 +313,80 @@ class BookCRUD(BaseCRUD[Book]):
 
         return query.all()
 
+    def faceted_search(
+        self,
+        db: Session,
+        genre_name: Optional[str] = None,
+        language: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        skip: int = 0,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Страница результатов поиска вместе со счётчиками фасетов.
+
+        С facet_index — пересечения битовых множеств и bit_count() в
+        памяти; без него — SQL (выборка страницы, COUNT и GROUP BY по
+        жанрам и языкам).
+
+        Args:
+            db: Сессия базы данных
+            genre_name: Часть названия жанра
+            language: Язык книги
+            min_price: Минимальная цена
+            max_price: Максимальная цена
+            skip: Пропустить записей
+            limit: Лимит записей
+
+        Returns:
+            {"items": книги страницы по id, "total": всего найдено,
+             "facets": {"genres": {...}, "languages": {...}}}
+        """
+        filters = {
+            "genre_name": genre_name, "language": language,
+            "min_price": min_price, "max_price": max_price,
+        }
+        if self.facet_index is not None:
+            ids = ids_from_bits(self.facet_index.search(**filters))
+            return {
+                "items": self.get_by_ids(db, ids[skip:skip + limit].tolist()),
+                "total": len(ids),
+                "facets": self.facet_index.facets(**filters),
+            }
+
+        criteria = search_criteria(**filters)
+        return {
+            "items": db.query(Book).filter(*criteria).order_by(Book.id).offset(skip).limit(limit).all(),
+            "total": self.count(db, *criteria),
+            "facets": facet_counts_sql(db, **filters),
+        }
+
+    def similar_books(
+        self,
+        db: Session,
+        book_id: int,
+        k: int = 10,
+        metric: str = "cosine"
+    ) -> List[Book]:
+        """
+        Книги, похожие по жанрам (см. GenreMatrix.similar_books).
+
+        Три запроса на построение матрицы (если genre_matrix не задана) и
+        один на загрузку результата — вместо get_by_genre по каждому жанру.
+
+        Args:
+            db: Сессия базы данных
+            book_id: ID книги
+            k: Максимум книг
+            metric: "cosine" или "jaccard"
+
+        Returns:
+            Книги от более похожих к менее похожим
+        """
+        matrix = self.genre_matrix or GenreMatrix.build(db)
+        return self.get_by_ids(db, [item["id"] for item in matrix.similar_books(book_id, k, metric)])
+
 
 # Синглтон для удобства использования
 book_crud = BookCRUD()
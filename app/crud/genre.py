@@ -4,9 +4,11 @@ Genre CRUD
 CRUD операции для модели Genre
 """
 
-from typing import Optional, List
+from typing import Iterable, Optional, List, Tuple
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.crud.base import BaseCRUD
+from app.models.book import Book, book_genres
 from app.models.genre import Genre
 
 
@@ -48,6 +50,62 @@ class GenreCRUD(BaseCRUD[Genre]):
             return genre
         return self.create(db, name=name, description=description)
 
+    def get_with_books(
+        self,
+        db: Session,
+        genre_id: int,
+        *criteria,
+        **options
+    ) -> Optional[Tuple[Genre, List[Book]]]:
+        """
+        Получить жанр и страницу его книг.
+
+        Коллекция Genre.books динамическая: читается только страница.
+
+        Args:
+            db: Сессия базы данных
+            genre_id: ID жанра
+            *criteria: Условия на книги
+            **options: order_by, skip, limit, after_id и фильтры поле=значение
+                (см. app.models.base.paginate)
+
+        Returns:
+            (жанр, книги страницы) или None, если жанра нет
+        """
+        genre = self.get(db, genre_id)
+        if genre is None:
+            return None
+        return genre, genre.books.page(*criteria, **options)
+
+    def add_books(self, db: Session, genre_id: int, book_ids: Iterable[int]) -> Optional[int]:
+        """
+        Добавить книги в жанр, не загружая книги жанра.
+
+        Args:
+            db: Сессия базы данных
+            genre_id: ID жанра
+            book_ids: ID книг (уже связанные и несуществующие пропускаются)
+
+        Returns:
+            Количество добавленных книг или None, если жанра нет
+        """
+        genre = self.get(db, genre_id)
+        if genre is None:
+            return None
+
+        book_ids = set(book_ids)
+        linked = set(db.scalars(
+            select(book_genres.c.book_id).where(
+                book_genres.c.genre_id == genre_id,
+                book_genres.c.book_id.in_(book_ids)
+            )
+        ))
+        books = db.query(Book).filter(Book.id.in_(book_ids - linked)).all()
+        for book in books:
+            genre.books.append(book)
+        self._commit(db)
+        return len(books)
+
     def get_popular_genres(self, db: Session, limit: int = 10) -> List[tuple]:
         """
         Получить самые популярные жанры по количеству книг.
@@ -60,7 +118,6 @@ class GenreCRUD(BaseCRUD[Genre]):
             Список кортежей (genre_name, book_count)
         """
         from sqlalchemy import func
-        from app.models.book import Book, book_genres
 
         return db.query(
             Genre.name,
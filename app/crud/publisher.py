@@ -4,9 +4,10 @@ Publisher CRUD
 CRUD операции для модели Publisher
 """
 
-from typing import Optional, List
-from sqlalchemy.orm import Session, selectinload
+from typing import Optional, List, Tuple
+from sqlalchemy.orm import Session
 from app.crud.base import BaseCRUD
+from app.models.book import Book
 from app.models.publisher import Publisher
 
 
@@ -48,18 +49,48 @@ class PublisherCRUD(BaseCRUD[Publisher]):
 
     def get_with_books(self, db: Session, publisher_id: int) -> Optional[Publisher]:
         """
-        Получить издательство со всеми книгами.
+        Получить издательство с его книгами.
+
+        Коллекция Publisher.books динамическая и не загружается заранее:
+        publisher.books — запрос (all(), count(), page()); страница книг —
+        get_books_page.
+
+        Args:
+            db: Сессия базы данных
+            publisher_id: ID издательства
+
+        Returns:
+            Издательство или None
+        """
+        return self.get(db, publisher_id)
+
+    def get_books_page(
+        self,
+        db: Session,
+        publisher_id: int,
+        *criteria,
+        **options
+    ) -> Optional[Tuple[Publisher, List[Book]]]:
+        """
+        Получить издательство и страницу его книг.
+
+        Коллекция Publisher.books динамическая: вместо загрузки всех книг
+        читается только страница.
 
         Args:
             db: Сессия базы данных
             publisher_id: ID издательства
+            *criteria: Условия на книги
+            **options: order_by, skip, limit, after_id и фильтры поле=значение
+                (см. app.models.base.paginate)
 
         Returns:
-            Издательство с книгами или None
+            (издательство, книги страницы) или None, если издательства нет
         """
-        return db.query(Publisher).options(
-            selectinload(Publisher.books)
-        ).filter(Publisher.id == publisher_id).first()
+        publisher = self.get(db, publisher_id)
+        if publisher is None:
+            return None
+        return publisher, publisher.books.page(*criteria, **options)
 
     def get_publishers_stats(self, db: Session) -> List[tuple]:
         """
@@ -0,0 +1,205 @@
+"""
+Write-Behind Buffer
+===================
+Буфер отложенной записи для потока частых обновлений (asyncio)
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.database_async import AsyncSessionLocal
+from app.crud.async_crud import AsyncBaseCRUD
+from app.models.base import ContentHashMixin
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Буфер отложенной записи поверх AsyncBaseCRUD.
+
+    Вместо UPDATE с коммитом на каждое событие обновления копятся в памяти
+    и объединяются по первичному ключу (последнее значение поля побеждает).
+    Сброс выполняется одним executemany UPDATE в одной транзакции:
+    - каждые flush_interval секунд;
+    - сразу, когда накопилось max_batch строк.
+
+    Если в буфере max_pending строк, submit() ждёт сброса (backpressure),
+    а не растит очередь без ограничений. close() (или выход из async with)
+    гарантирует сброс всего накопленного.
+
+    Как и изменение через ORM, сброс обнуляет content_hash обновлённых
+    строк (ContentHashMixin): строка разошлась с фидом.
+
+    Example:
+        >>> async with WriteBehindBuffer(async_book_crud, flush_interval=0.2) as prices:
+        ...     async for event in price_stream:
+        ...         await prices.submit(event.book_id, price=event.price)
+    """
+
+    def __init__(
+        self,
+        crud: AsyncBaseCRUD,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        flush_interval: float = 0.1,
+        max_batch: int = 1000,
+        max_pending: int = 10_000
+    ):
+        """
+        Args:
+            crud: Асинхронный CRUD модели, строки которой обновляются
+            session_factory: Фабрика сессий для сброса
+            flush_interval: Период сброса, секунды
+            max_batch: Количество строк, при котором сброс запускается сразу
+            max_pending: Предел строк в буфере, после которого submit ждёт
+        """
+        if max_pending < max_batch:
+            raise ValueError("max_pending must be greater than or equal to max_batch")
+
+        self.crud = crud
+        self.model = crud.model
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+
+        self._columns = {column.key for column in self.model.__table__.columns} - {"id"}
+        # Массовый UPDATE не вызывает before_update ContentHashMixin
+        self._resets_hash = issubclass(self.model, ContentHashMixin)
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._space = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.stats = {
+            "submitted": 0,
+            "coalesced": 0,
+            "flushed_rows": 0,
+            "flushes": 0,
+            "errors": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def __aenter__(self) -> "WriteBehindBuffer":
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    # ==================== ЖИЗНЕННЫЙ ЦИКЛ ====================
+
+    def start(self) -> None:
+        """Запустить фоновый сброс по таймеру."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """
+        Остановить фоновый сброс и записать всё накопленное.
+
+        После close() новые submit() запрещены.
+        """
+        self._closed = True
+        if self._task is not None:
+            # Не отменяем задачу: отмена посреди сброса оборвала бы транзакцию
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        while self._pending:
+            await self.flush()
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Строки возвращены в буфер — повторим на следующем тике
+                logger.exception("Write-behind flush of %s failed", self.model.__name__)
+
+    # ==================== ЗАПИСЬ ====================
+
+    async def submit(self, id: int, **fields) -> None:
+        """
+        Поставить обновление строки в буфер.
+
+        Повторные обновления той же строки до сброса объединяются.
+
+        Args:
+            id: Первичный ключ
+            **fields: Новые значения полей
+
+        Raises:
+            RuntimeError: Если буфер закрыт
+            ValueError: Если поля нет в таблице
+        """
+        if self._closed:
+            raise RuntimeError("WriteBehindBuffer is closed")
+        unknown = set(fields) - self._columns
+        if unknown:
+            raise ValueError(f"Unknown fields for {self.model.__name__}: {sorted(unknown)}")
+
+        if id not in self._pending and len(self._pending) >= self.max_pending:
+            async with self._space:
+                while id not in self._pending and len(self._pending) >= self.max_pending:
+                    self._wakeup.set()
+                    await self._space.wait()
+
+        self.stats["submitted"] += 1
+        row = self._pending.get(id)
+        if row is None:
+            self._pending[id] = dict(fields)
+        else:
+            self.stats["coalesced"] += 1
+            row.update(fields)
+
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        Записать накопленные обновления одним пакетом.
+
+        При ошибке транзакция откатывается, а строки возвращаются в буфер
+        (более свежие значения, поступившие во время сброса, сохраняются).
+
+        Returns:
+            Количество обновлённых строк
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            async with self._space:
+                self._space.notify_all()
+
+            reset = {"content_hash": None} if self._resets_hash else {}
+            rows = [{"id": id, **reset, **fields} for id, fields in batch.items()]
+            try:
+                async with self.session_factory() as session:
+                    # ORM bulk UPDATE по первичному ключу — executemany,
+                    # строки группируются по набору обновляемых полей
+                    await session.execute(update(self.model), rows)
+                    await session.commit()
+            except BaseException:
+                self.stats["errors"] += 1
+                for id, fields in batch.items():
+                    self._pending[id] = {**fields, **self._pending.get(id, {})}
+                raise
+
+            self.stats["flushes"] += 1
+            self.stats["flushed_rows"] += len(rows)
+            return len(rows)
@@ -0,0 +1,16 @@
+"""
+Ingest module - bulk catalog loading
+====================================
+Массовая загрузка каталога из фидов издательств
+"""
+
+from app.ingest.keyindex import BloomFilter, ImportKeyIndex
+from app.ingest.loader import CatalogLoader, LookupTable, read_records
+
+__all__ = [
+    "BloomFilter",
+    "CatalogLoader",
+    "ImportKeyIndex",
+    "LookupTable",
+    "read_records",
+]
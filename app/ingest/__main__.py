@@ -0,0 +1,106 @@
+"""
+Catalog Loader CLI
+==================
+Командная строка для массовой загрузки каталога
+
+Пример:
+    python -m app.ingest feed.csv --chunk-size 10000 --checkpoint feed.ckpt
+    python -m app.ingest feed-1.jsonl feed-2.jsonl --workers 8
+    python -m app.ingest daily-feed.csv --sync
+    python -m app.ingest feed.csv --key-index
+"""
+
+import argparse
+import sys
+import time
+
+from app.core.database import SessionLocal
+from app.ingest.loader import CatalogLoader
+from app.ingest.parallel import ParallelCatalogLoader
+
+
+def _print_progress(started: float):
+    def report(stats: dict) -> None:
+        elapsed = time.perf_counter() - started
+        rate = stats["processed"] / elapsed if elapsed else 0
+        print(
+            f"\r  обработано: {stats['processed']:>10}  "
+            f"добавлено: {stats['inserted']:>10}  "
+            f"обновлено: {stats['updated']:>8}  "
+            f"без изменений: {stats['unchanged']:>10}  "
+            f"пропущено: {stats['skipped']:>8}  "
+            f"ошибок: {stats['errors']:>6}  "
+            f"({rate:,.0f} зап/с)",
+            end="",
+            file=sys.stderr,
+            flush=True
+        )
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.ingest",
+        description="Массовая загрузка книг из CSV/JSONL фидов"
+    )
+    parser.add_argument("paths", nargs="+", help="Файлы фидов (.csv, .jsonl)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Формат файлов")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Записей в транзакции")
+    parser.add_argument("--checkpoint", help="Файл контрольной точки для возобновления")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Количество процессов (>1 — параллельная загрузка по шардам)"
+    )
+    parser.add_argument(
+        "--sync", action="store_true",
+        help="Обновлять изменившиеся книги с существующим ISBN (по хешу записи)"
+    )
+    parser.add_argument(
+        "--key-index", action="store_true",
+        help="Индекс существующих ISBN и имён в памяти (фильтр Блума): промахи не идут в базу"
+    )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.workers > 1:
+        stats = ParallelCatalogLoader(
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            checkpoint_path=args.checkpoint,
+            sync=args.sync,
+            key_index=args.key_index
+        ).load(args.paths, args.format)
+        print(f"Готово за {time.perf_counter() - started:.1f} с: {stats}")
+        return 0
+
+    db = SessionLocal()
+    try:
+        loader = CatalogLoader(
+            db,
+            chunk_size=args.chunk_size,
+            checkpoint_path=args.checkpoint,
+            progress=_print_progress(started),
+            sync=args.sync,
+            key_index=args.key_index
+        )
+        for path in args.paths:
+            loader.load(path, args.format)
+    finally:
+        db.close()
+
+    print(file=sys.stderr)
+    print(f"Готово за {time.perf_counter() - started:.1f} с: {loader.stats}")
+    if loader.key_index is not None:
+        for kind, report in loader.key_index.report().items():
+            print(
+                f"  индекс {kind}: {report['keys']} ключей, "
+                f"{report['memory_bytes'] / 2**20:.1f} МБ, "
+                f"промахов без запроса: {report['misses']}/{report['lookups']}, "
+                f"ложных срабатываний: {report['observed_fp_rate']:.2%} "
+                f"(ожидалось {report['expected_fp_rate']:.2%})"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Import Key Index
+================
+Индекс существующих ключей (ISBN, имена авторов и издательств) в памяти
+на время загрузки: определённые промахи не идут в базу
+
+Фильтр Блума отвечает «точно нет» или «возможно есть»; отсортированный
+массив 64-битных хешей ключей (exact=True) отсекает ложные срабатывания
+фильтра. Положительный ответ индекса всё равно проверяется запросом к
+базе (нужны id и content_hash), поэтому индекс только сокращает запросы
+и не может привести к неверной вставке.
+"""
+
+import hashlib
+import math
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.author import Author
+from app.models.book import Book
+from app.models.publisher import Publisher
+
+# Строк ключей за одну выборку при построении индекса
+_BUILD_BATCH = 50000
+
+
+def normalize_isbn(value: str) -> str:
+    """Ключ ISBN: без пробелов по краям."""
+    return value.strip()
+
+
+def normalize_name(value: str) -> str:
+    """
+    Ключ имени: NFKC, casefold и схлопнутые пробелы.
+
+    Нормализация только расширяет совпадения («Лев  Толстой» и «лев
+    толстой» — один ключ): лишнее совпадение проверит запрос к базе,
+    а промахов, которых нет в базе, не появляется.
+    """
+    return " ".join(unicodedata.normalize("NFKC", value).casefold().split())
+
+
+def _key_hashes(keys: Sequence[str]) -> np.ndarray:
+    """64-битные хеши ключей (blake2b)."""
+    return np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+            for key in keys
+        ),
+        dtype=np.uint64,
+        count=len(keys)
+    )
+
+
+class BloomFilter:
+    """
+    Фильтр Блума на NumPy (двойное хеширование по 64-битному хешу ключа).
+
+    Attributes:
+        bits: Количество бит
+        hashes: Количество хеш-функций
+        count: Добавлено ключей
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Args:
+            capacity: Ожидаемое количество ключей
+            error_rate: Целевая доля ложных срабатываний при capacity ключах
+        """
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        capacity = max(capacity, 1)
+        self.bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.count = 0
+        self._array = np.zeros((self.bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.bits)
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Добавить ключи по их 64-битным хешам."""
+        positions = self._positions(hashes).ravel()
+        np.bitwise_or.at(
+            self._array,
+            (positions >> np.uint64(3)).astype(np.intp),
+            (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+        )
+        self.count += len(hashes)
+
+    def contains_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        """Маска «возможно есть» для хешей ключей."""
+        if not len(hashes):
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(hashes)
+        bytes_ = self._array[(positions >> np.uint64(3)).astype(np.intp)]
+        masks = np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)
+        return ((bytes_ & masks) != 0).all(axis=1)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._array.nbytes
+
+    @property
+    def expected_fp_rate(self) -> float:
+        """Теоретическая доля ложных срабатываний при текущем count."""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+
+class KeySet:
+    """
+    Множество ключей одного вида: фильтр Блума и (опционально) точный
+    отсортированный массив хешей.
+
+    Считает обращения: lookups (проверено ключей), misses (определённые
+    промахи, не ушедшие в базу), false_positives (ключи, которые индекс
+    пропустил, а база не нашла; сообщает confirm()).
+    """
+
+    def __init__(
+        self,
+        hashes: np.ndarray,
+        normalize: Callable[[str], str],
+        error_rate: float = 0.01,
+        exact: bool = True,
+        headroom: float = 0.2
+    ):
+        """
+        Args:
+            hashes: Хеши существующих ключей (см. from_keys)
+            normalize: Нормализация ключа
+            error_rate: Целевая доля ложных срабатываний фильтра Блума
+            exact: Хранить точный массив хешей (отсекает ложные срабатывания фильтра)
+            headroom: Запас ёмкости фильтра под ключи, добавленные при загрузке
+        """
+        self.normalize = normalize
+        self.bloom = BloomFilter(int(len(hashes) * (1 + headroom)), error_rate)
+        self.bloom.add_hashes(hashes)
+        self.exact: Optional[np.ndarray] = np.unique(hashes) if exact else None
+        self._added: set = set()
+        self.lookups = 0
+        self.misses = 0
+        self.false_positives = 0
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[str], normalize: Callable[[str], str], **options) -> "KeySet":
+        """Построить множество из ключей в исходном виде."""
+        return cls(cls._hashes(normalize, keys), normalize, **options)
+
+    @staticmethod
+    def _hashes(normalize: Callable[[str], str], keys: Iterable[str]) -> np.ndarray:
+        return _key_hashes([normalize(key) for key in keys])
+
+    def __len__(self) -> int:
+        return self.bloom.count
+
+    def _in_exact(self, hashes: np.ndarray) -> np.ndarray:
+        if len(self.exact):
+            at = np.searchsorted(self.exact, hashes).clip(max=len(self.exact) - 1)
+            hit = self.exact[at] == hashes
+        else:
+            hit = np.zeros(len(hashes), dtype=bool)
+        if self._added:
+            hit |= np.fromiter((h in self._added for h in hashes.tolist()), dtype=bool, count=len(hashes))
+        return hit
+
+    def add(self, keys: Iterable[str]) -> None:
+        """Добавить ключи, созданные во время загрузки."""
+        hashes = self._hashes(self.normalize, keys)
+        self.bloom.add_hashes(hashes)
+        if self.exact is not None:
+            self._added.update(hashes.tolist())
+
+    def filter(self, keys: Sequence[str]) -> List[str]:
+        """
+        Оставить ключи, которые могут быть в базе.
+
+        Args:
+            keys: Проверяемые ключи (в исходном виде)
+
+        Returns:
+            Ключи с положительным ответом индекса, в исходном порядке
+        """
+        if not keys:
+            return []
+        hashes = self._hashes(self.normalize, keys)
+        maybe = self.bloom.contains_hashes(hashes)
+        if self.exact is not None:
+            maybe &= self._in_exact(hashes)
+        positive = [key for key, hit in zip(keys, maybe.tolist()) if hit]
+        self.lookups += len(keys)
+        self.misses += len(keys) - len(positive)
+        return positive
+
+    def confirm(self, positive: int, found: int) -> None:
+        """Учесть результат проверки положительных ответов базой."""
+        self.false_positives += positive - found
+
+    def report(self) -> Dict[str, float]:
+        """Размер и точность индекса."""
+        exact_bytes = self.exact.nbytes + 8 * len(self._added) if self.exact is not None else 0
+        absent = self.misses + self.false_positives
+        return {
+            "keys": len(self),
+            "bloom_bytes": self.bloom.memory_bytes,
+            "exact_bytes": exact_bytes,
+            "memory_bytes": self.bloom.memory_bytes + exact_bytes,
+            "bloom_hashes": self.bloom.hashes,
+            "expected_fp_rate": self.bloom.expected_fp_rate,
+            "lookups": self.lookups,
+            "misses": self.misses,
+            "false_positives": self.false_positives,
+            # Доля отсутствующих в базе ключей, которые индекс не отсеял
+            "observed_fp_rate": self.false_positives / absent if absent else 0.0,
+        }
+
+
+class ImportKeyIndex:
+    """
+    Индекс ключей каталога для CatalogLoader(key_index=True).
+
+    Example:
+        >>> index = ImportKeyIndex.build(db)
+        >>> index.isbns.filter(["978-5-0001", "978-5-9999"])
+        ['978-5-0001']
+        >>> index.report()["isbns"]["memory_bytes"]
+        1198336
+    """
+
+    def __init__(self, isbns: KeySet, authors: KeySet, publishers: KeySet):
+        self.isbns = isbns
+        self.authors = authors
+        self.publishers = publishers
+
+    @classmethod
+    def build(cls, db: Session, error_rate: float = 0.01, exact: bool = True) -> "ImportKeyIndex":
+        """
+        Прочитать ключи из базы (потоково, порциями) и построить индекс.
+
+        Args:
+            db: Сессия базы данных
+            error_rate: Целевая доля ложных срабатываний фильтров Блума
+            exact: Хранить точные массивы хешей
+
+        Returns:
+            ImportKeyIndex
+        """
+        def keyset(attribute, normalize) -> KeySet:
+            # В памяти только хеши: ключи читаются и хешируются порциями
+            # Core-запрос: без обработки строк ORM
+            result = db.connection().execute(
+                select(attribute).where(attribute.is_not(None)).execution_options(yield_per=_BUILD_BATCH)
+            )
+            parts = [KeySet._hashes(normalize, part) for part in result.scalars().partitions()]
+            hashes = np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint64)
+            return KeySet(hashes, normalize, error_rate=error_rate, exact=exact)
+
+        return cls(
+            isbns=keyset(Book.isbn, normalize_isbn),
+            authors=keyset(Author.name, normalize_name),
+            publishers=keyset(Publisher.name, normalize_name),
+        )
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Отчёт по каждому виду ключей (см. KeySet.report)."""
+        return {
+            "isbns": self.isbns.report(),
+            "authors": self.authors.report(),
+            "publishers": self.publishers.report(),
+        }
@@ -0,0 +1,354 @@
+"""
+Parallel Catalog Loader
+=======================
+Многопроцессная загрузка каталога: фид делится на шарды по процессам
+"""
+
+import csv
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import DATABASE_URL, create_db_engine
+from app.ingest.loader import (
+    AUTHOR_FIELDS,
+    PUBLISHER_FIELDS,
+    CatalogLoader,
+    LookupTable,
+    detect_format,
+    normalize_record,
+)
+from app.models.author import Author
+from app.models.genre import Genre
+from app.models.publisher import Publisher
+
+
+# Фабрика сессий процесса-воркера; создаётся в _init_worker уже после fork
+_worker_session_factory: Optional[sessionmaker] = None
+
+
+def _init_worker(database_url: str, engine_options: dict) -> None:
+    """
+    Инициализатор процесса пула: собственный движок на каждый воркер.
+
+    Пул общего движка, унаследованный через fork, сбрасывается в
+    app.core.database автоматически (os.register_at_fork), а воркер
+    создаёт отдельный движок уже в своём процессе.
+    """
+    global _worker_session_factory
+
+    engine = create_db_engine(database_url, **engine_options)
+    _worker_session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+# ==================== ШАРДИРОВАНИЕ ====================
+
+def split_file(path: str, shards: int) -> List[Tuple[int, int]]:
+    """
+    Разбить файл на байтовые диапазоны, выровненные по границам строк.
+
+    Предполагается одна запись на строку (JSONL или CSV без переводов
+    строк внутри полей). Заголовок CSV в диапазоны не входит.
+
+    Args:
+        path: Путь к файлу
+        shards: Желаемое количество шардов
+
+    Returns:
+        Список непустых диапазонов (start, end)
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if detect_format(path) == "csv":
+            f.readline()
+        data_start = f.tell()
+
+        boundaries = [data_start]
+        for i in range(1, shards):
+            f.seek(max(data_start + (size - data_start) * i // shards - 1, boundaries[-1]))
+            f.readline()
+            boundaries.append(min(f.tell(), size))
+        boundaries.append(size)
+
+    return [
+        (start, end)
+        for start, end in zip(boundaries, boundaries[1:])
+        if end > start
+    ]
+
+
+def _csv_header(path: str) -> List[str]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f))
+
+
+def read_range(path: str, start: int, end: int, fmt: Optional[str] = None) -> Iterator[dict]:
+    """
+    Прочитать записи из байтового диапазона файла.
+
+    Args:
+        path: Путь к файлу
+        start: Начало диапазона (начало строки)
+        end: Конец диапазона (исключительно)
+        fmt: Формат (csv, jsonl)
+
+    Yields:
+        Словари с полями записи
+    """
+    fmt = fmt or detect_format(path)
+    fieldnames = _csv_header(path) if fmt == "csv" else None
+
+    def lines() -> Iterator[str]:
+        with open(path, "rb") as f:
+            f.seek(start)
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                yield line.decode("utf-8")
+
+    if fmt == "csv":
+        yield from csv.DictReader(lines(), fieldnames=fieldnames)
+    else:
+        for line in lines():
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+# ==================== ЗАДАЧИ ВОРКЕРОВ ====================
+
+def duplicate_isbns(shard_isbns: Sequence[set]) -> List[set]:
+    """
+    Распределить ISBN между шардами: книгу пишет первый шард, где она есть.
+
+    Так же поступает однопроцессный загрузчик с дублями внутри файла:
+    остаётся первая запись.
+
+    Args:
+        shard_isbns: ISBN каждого шарда в порядке шардов
+
+    Returns:
+        ISBN, которые каждый шард должен пропустить
+    """
+    seen: set = set()
+    skipped = []
+    for isbns in shard_isbns:
+        skipped.append(isbns & seen)
+        seen |= isbns
+    return skipped
+
+
+def _merge_details(target: Dict[str, dict], name: str, details: dict) -> None:
+    """Запомнить поля справочника: остаются первые непустые."""
+    if not target.get(name):
+        target[name] = details
+
+
+def _scan_shard(path: str, start: int, end: int, fmt: Optional[str]) -> dict:
+    """
+    Фаза 1: собрать авторов и издательства (с их полями из фида),
+    названия жанров и ISBN шарда.
+    """
+    names = {"authors": {}, "publishers": {}, "genres": set(), "isbns": set()}
+    for record in read_range(path, start, end, fmt):
+        try:
+            record = normalize_record(record)
+        except (ValueError, TypeError):
+            continue
+        _merge_details(names["authors"], record["author"], record["author_details"])
+        if record["isbn"]:
+            names["isbns"].add(record["isbn"])
+        if record["publisher"]:
+            _merge_details(names["publishers"], record["publisher"], record["publisher_details"])
+        names["genres"].update(record["genres"])
+    return names
+
+
+def _load_shard(
+    path: str,
+    start: int,
+    end: int,
+    fmt: Optional[str],
+    chunk_size: int,
+    checkpoint_path: Optional[str],
+    retries: int,
+    sync: bool,
+    key_index: bool,
+    skip_isbns: set
+) -> dict:
+    """Фаза 3: загрузить книги шарда собственной сессией воркера."""
+    db = _worker_session_factory()
+    try:
+        loader = CatalogLoader(
+            db,
+            chunk_size=chunk_size,
+            checkpoint_path=checkpoint_path,
+            retries=retries,
+            sync=sync,
+            key_index=key_index,
+            skip_isbns=skip_isbns
+        )
+        return loader.load_stream(
+            read_range(path, start, end, fmt),
+            source=f"{path}#{start}-{end}"
+        )
+    finally:
+        db.close()
+
+
+# ==================== ЗАГРУЗЧИК ====================
+
+class ParallelCatalogLoader:
+    """
+    Загрузка каталога пулом процессов.
+
+    Один процесс Python упирается в одно ядро на разборе фида, поэтому
+    файлы делятся на байтовые шарды, которые обрабатываются параллельно:
+
+    1. Сканирование (параллельно): воркеры собирают названия авторов,
+       издательств и жанров и ISBN своих шардов.
+    2. Согласование (в родителе): все общие сущности создаются один раз,
+       до загрузки книг, — воркеры их только читают и не конкурируют за
+       одни и те же уникальные ключи. ISBN, встречающийся в нескольких
+       шардах, закрепляется за первым из них (duplicate_isbns), остальные
+       шарды его пропускают — уникальность не зависит от ограничения базы
+       (на секционированной books в PostgreSQL его проверяет триггер).
+    3. Загрузка (параллельно): каждый воркер пишет книги своего шарда
+       через CatalogLoader со своим движком.
+
+    Example:
+        >>> loader = ParallelCatalogLoader(workers=8)
+        >>> loader.load(["feed-1.csv", "feed-2.jsonl"])
+        {'processed': 2000000, 'inserted': 1999420, ...}
+    """
+
+    def __init__(
+        self,
+        database_url: str = DATABASE_URL,
+        workers: Optional[int] = None,
+        chunk_size: int = 5000,
+        checkpoint_path: Optional[str] = None,
+        retries: int = 5,
+        engine_options: Optional[dict] = None,
+        mp_context: Optional[str] = None,
+        sync: bool = False,
+        key_index: bool = False
+    ):
+        """
+        Args:
+            database_url: URL базы данных для воркеров
+            workers: Количество процессов (по умолчанию — число ядер)
+            chunk_size: Количество записей в транзакции воркера
+            checkpoint_path: Префикс файлов контрольных точек (по одному на шард)
+            retries: Повторы порции при конфликте записи
+            engine_options: Дополнительные параметры create_engine воркеров
+            mp_context: Метод запуска процессов (fork, spawn, forkserver)
+            sync: Синхронизация фида (см. CatalogLoader)
+            key_index: Индекс ключей в каждом воркере (см. CatalogLoader)
+        """
+        self.database_url = database_url
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.checkpoint_path = checkpoint_path
+        self.retries = retries
+        self.engine_options = engine_options or {}
+        self.mp_context = mp_context
+        self.sync = sync
+        self.key_index = key_index
+
+    def _shards(self, paths: Sequence[str]) -> List[Tuple[str, int, int]]:
+        per_file = max(1, self.workers // max(len(paths), 1))
+        return [
+            (path, start, end)
+            for path in paths
+            for start, end in split_file(path, per_file)
+        ]
+
+    def _upsert_shared(self, names: dict) -> Dict[str, int]:
+        """
+        Создать недостающих авторов, издательства и жанры одной транзакцией.
+
+        Авторы и издательства создаются с полями фида и content_hash, как
+        в CatalogLoader; обновление существующих (sync) выполняют воркеры.
+        """
+        engine = create_db_engine(self.database_url, **self.engine_options)
+        db = sessionmaker(bind=engine)()
+        try:
+            created = {}
+            for key, lookup in (
+                ("authors", LookupTable(Author, AUTHOR_FIELDS.values())),
+                ("publishers", LookupTable(Publisher, PUBLISHER_FIELDS.values())),
+                ("genres", LookupTable(Genre)),
+            ):
+                details = names[key] if lookup.fields else {}
+                batch = sorted(names[key])
+                for i in range(0, len(batch), self.chunk_size):
+                    lookup.resolve(db, batch[i:i + self.chunk_size], details)
+                created[key] = lookup.created
+            db.commit()
+            return created
+        finally:
+            db.close()
+            engine.dispose()
+
+    def load(self, paths: Sequence[str], fmt: Optional[str] = None) -> dict:
+        """
+        Загрузить файлы фидов.
+
+        Args:
+            paths: Пути к CSV/JSONL файлам
+            fmt: Формат (по умолчанию — по расширению каждого файла)
+
+        Returns:
+            Суммарная статистика воркеров, а также shards и created
+            (количество созданных авторов, издательств и жанров)
+        """
+        shards = self._shards(paths)
+        context = multiprocessing.get_context(self.mp_context) if self.mp_context else None
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.database_url, self.engine_options)
+        ) as pool:
+            names = {"authors": {}, "publishers": {}, "genres": set()}
+            shard_isbns = []
+            scans = [pool.submit(_scan_shard, path, start, end, fmt) for path, start, end in shards]
+            for future in scans:
+                scan = future.result()
+                shard_isbns.append(scan["isbns"])
+                names["genres"].update(scan["genres"])
+                for key in ("authors", "publishers"):
+                    for name, details in scan[key].items():
+                        _merge_details(names[key], name, details)
+
+            created = self._upsert_shared(names)
+            skip_isbns = duplicate_isbns(shard_isbns)
+
+            loads = [
+                pool.submit(
+                    _load_shard,
+                    path, start, end, fmt,
+                    self.chunk_size,
+                    f"{self.checkpoint_path}.shard{i}" if self.checkpoint_path else None,
+                    self.retries,
+                    self.sync,
+                    self.key_index,
+                    skip_isbns[i]
+                )
+                for i, (path, start, end) in enumerate(shards)
+            ]
+            stats = CatalogLoader._empty_stats()
+            for future in loads:
+                for key, value in future.result().items():
+                    stats[key] += value
+
+        stats["shards"] = len(shards)
+        stats["created"] = created
+        return stats
@@ -0,0 +1,72 @@
+"""
+Synthetic Catalog
+=================
+Генерация случайного каталога для бенчмарков и проверки планов запросов
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.models import Author, Book, Genre, Publisher, book_genres
+
+LANGUAGES = ["Russian", "English", "German", "French", "Spanish"]
+
+
+def seed_catalog(
+    engine: Engine,
+    books: int = 20000,
+    authors: int = 1000,
+    publishers: int = 50,
+    genres: int = 30,
+    seed: int = 42
+) -> None:
+    """
+    Заполнить пустую базу случайным каталогом (Core executemany).
+
+    Args:
+        engine: Движок с созданной схемой
+        books: Количество книг
+        authors: Количество авторов
+        publishers: Количество издательств
+        genres: Количество жанров
+        seed: Зерно генератора
+    """
+    rnd = random.Random(seed)
+    now = datetime(2024, 1, 1)
+
+    def stamps(i: int) -> dict:
+        created = now - timedelta(minutes=i)
+        return {"created_at": created, "updated_at": created}
+
+    with engine.begin() as conn:
+        conn.execute(insert(Author), [
+            {"name": f"Автор {i}", **stamps(i)} for i in range(authors)
+        ])
+        conn.execute(insert(Publisher), [
+            {"name": f"Издательство {i}", **stamps(i)} for i in range(publishers)
+        ])
+        conn.execute(insert(Genre), [
+            {"name": f"Жанр {i}", **stamps(i)} for i in range(genres)
+        ])
+        conn.execute(insert(Book), [
+            {
+                "title": f"Книга {rnd.randrange(books * 10):07d}",
+                "isbn": f"978-{i:09d}",
+                "pages": rnd.randint(50, 1500),
+                "price": round(rnd.uniform(100, 3000), 2),
+                "publication_date": date(1900, 1, 1) + timedelta(days=rnd.randrange(45000)),
+                "language": rnd.choice(LANGUAGES),
+                "author_id": rnd.randint(1, authors),
+                "publisher_id": rnd.randint(1, publishers),
+                **stamps(rnd.randrange(books * 10)),
+            }
+            for i in range(books)
+        ])
+        conn.execute(insert(book_genres), [
+            {"book_id": book_id, "genre_id": genre_id}
+            for book_id in range(1, books + 1)
+            for genre_id in rnd.sample(range(1, genres + 1), 2)
+        ])
@@ -4,18 +4,24 @@ Models module - SQLAlchemy ORM models
 Модели данных для книжного каталога
 """
 
-from app.models.base import BaseModel
+from app.models.base import BaseModel, PagedQuery, paginate
 from app.models.author import Author
 from app.models.publisher import Publisher
 from app.models.genre import Genre
 from app.models.book import Book, book_genres
+from app.models.tombstone import Tombstone
+from app.models.sketch import StatisticsSketch
 
 __all__ = [
     "BaseModel",
+    "PagedQuery",
+    "paginate",
     "Author",
     "Publisher",
     "Genre",
     "Book",
-    "book_genres"
+    "book_genres",
+    "Tombstone",
+    "StatisticsSketch"
 ]
 
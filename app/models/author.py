@@ -4,12 +4,13 @@ Author Model
 Модель автора книг
 """
 
-from sqlalchemy import Column, String, Text, Date
-from sqlalchemy.orm import relationship
-from app.models.base import BaseModel
+from sqlalchemy import Column, String, Text, Date, func, select
+from sqlalchemy.orm import column_property, relationship
+from app.models.base import BaseModel, ContentHashMixin, updated_at_index
+from app.models.book import Book
 
 
-class Author(BaseModel):
+class Author(ContentHashMixin, BaseModel):
     """
     Модель автора.
 
@@ -21,9 +22,12 @@ class Author(BaseModel):
         bio: Биография
         birth_date: Дата рождения
         country: Страна
+        content_hash: Хеш записи фида (ContentHashMixin)
         books: Список книг автора (relationship)
+        books_count: Количество книг (подзапрос, загружается отложенно)
     """
     __tablename__ = "authors"
+    __table_args__ = (updated_at_index("authors"),)
 
     name = Column(String(255), nullable=False, index=True)
     bio = Column(Text, nullable=True)
@@ -36,14 +40,26 @@ class Author(BaseModel):
         "Book",
         back_populates="author",
         cascade="all, delete-orphan",  # При удалении автора удаляются его книги
+        # Незагруженные книги удаляет сама база (books.author_id ON DELETE CASCADE),
+        # ORM не загружает их ради удаления по одной
+        passive_deletes=True,
         lazy="selectin"  # Оптимизация: загрузка связанных объектов одним запросом
     )
 
     def __repr__(self):
         return f"<Author(id={self.id}, name='{self.name}')>"
 
-    @property
-    def books_count(self) -> int:
-        """Количество книг автора"""
-        return len(self.books) if self.books else 0
+
+# Количество книг коррелированным подзапросом, а не len(self.books):
+# значение не требует загрузки коллекции, годится для order_by/фильтров
+# и попадает в тот же SELECT, что и авторы, с undefer(Author.books_count).
+# Без undefer загружается отдельным SELECT count(*) при первом обращении.
+# Объявлено после класса: подзапросу нужна колонка Author.id.
+Author.books_count = column_property(
+    select(func.count(Book.id))
+    .where(Book.author_id == Author.id)
+    .correlate_except(Book)
+    .scalar_subquery(),
+    deferred=True
+)
 
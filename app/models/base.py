@@ -1,30 +1,159 @@
 """
-        return f"<{self.__class__.__name__}(id={self.id})>"
-    def __repr__(self):
+Base Model
+==========
+Базовая модель с общими полями для всех сущностей
+"""
 
-    )
-        nullable=False
-        onupdate=datetime.utcnow,
-        default=datetime.utcnow,
-        DateTime,
-    updated_at = Column(
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Sequence
+from sqlalchemy import Column, Integer, DateTime, Index, String, event, inspect
+from sqlalchemy.orm import Query
+from app.core.database import Base
 
-    __abstract__ = True
+
+class BaseModel(Base):
     """
-    Содержит общие поля: id, created_at, updated_at
     Абстрактная базовая модель.
+    Содержит общие поля: id, created_at, updated_at
     """
-class BaseModel(Base):
+    __abstract__ = True
 
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False
+    )
 
-from app.core.database import Base
-from sqlalchemy import Column, Integer, DateTime
-from datetime import datetime
+    def __repr__(self):
+        return f"<{self.__class__.__name__}(id={self.id})>"
 
-"""
-Базовая модель с общими полями для всех сущностей
-==========
-Base Model
 
+def updated_at_index(table_name: str) -> Index:
+    """Индекс (updated_at, id): keyset-обход ленты изменений (app.queries.changes)."""
+    return Index(f"ix_{table_name}_updated_at_id", "updated_at", "id")
+
+
+def json_default(value: Any) -> Any:
+    """json.dumps(default=...) для значений колонок: даты и Decimal."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ContentHashMixin:
+    """
+    Хеш содержимого строки из внешнего фида (app.ingest.loader).
+
+    content_hash — хеш записи фида, которой строка была записана в
+    последний раз; при следующей синхронизации записи с тем же хешем
+    пропускаются без UPDATE. Изменение строки через ORM сбрасывает хеш в
+    NULL (строка разошлась с фидом), и следующая синхронизация её
+    перезапишет. Массовые UPDATE в обход ORM должны сбрасывать хеш сами.
+    """
+    content_hash = Column(String(32), nullable=True)
+
+
+@event.listens_for(ContentHashMixin, "before_update", propagate=True)
+def _reset_content_hash(mapper, connection, target):
+    if not inspect(target).attrs.content_hash.history.has_changes():
+        target.content_hash = None
+
+
+def content_hash(values: Dict[str, Any]) -> str:
+    """
+    Хеш содержимого записи: blake2b (128 бит) канонического JSON.
+
+    Args:
+        values: Поля записи (порядок ключей не важен)
+
+    Returns:
+        32 шестнадцатеричных символа
+    """
+    payload = json.dumps(values, sort_keys=True, ensure_ascii=False, default=json_default)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def model_to_dict(obj: Any, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Значения колонок объекта (без связей).
+
+    Args:
+        obj: Объект модели
+        columns: Какие колонки взять (по умолчанию — все колонки таблицы)
+    """
+    if columns is None:
+        columns = [column.key for column in obj.__table__.columns]
+    return {column: getattr(obj, column) for column in columns}
+
+
+def paginate(
+    query,
+    entity,
+    *criteria,
+    order_by=None,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    **filters
+):
+    """
+    Применить к Query или Select фильтры, порядок и срез страницы.
+
+    Args:
+        query: Query или Select по entity
+        entity: Модель строк запроса
+        *criteria: SQL-условия
+        order_by: Колонка или список колонок (по умолчанию — entity.id)
+        skip: Пропустить записей
+        limit: Лимит записей
+        after_id: Keyset-страница: записи с id больше этого (вместо skip;
+            только при сортировке по id — глубокие страницы без OFFSET)
+        **filters: Условия равенства поле=значение
+
+    Returns:
+        Запрос того же типа
+
+    Raises:
+        ValueError: Если after_id задан вместе с order_by
+    """
+    query = query.filter(*criteria).filter_by(**filters)
+    if after_id is not None:
+        if order_by is not None:
+            raise ValueError("after_id pages by id and cannot be combined with order_by")
+        query = query.filter(entity.id > after_id)
+    if order_by is None:
+        order_by = entity.id
+    if not isinstance(order_by, (list, tuple)):
+        order_by = (order_by,)
+    return query.order_by(*order_by).offset(skip).limit(limit)
+
+
+class PagedQuery(Query):
+    """
+    Query для динамических коллекций (lazy="dynamic", query_class=PagedQuery).
+
+    Коллекция не загружается целиком: append()/remove() записывают
+    изменения без чтения, а чтение идёт запросами к базе.
+
+    Example:
+        >>> genre.books.append(book)  # без загрузки 400k книг жанра
+        >>> genre.books.page(Book.language == "Russian", order_by=Book.title, limit=20)
+    """
+
+    def page(self, *criteria, **options) -> list:
+        """
+        Страница коллекции (параметры как у paginate).
+
+        Returns:
+            Список объектов страницы
+        """
+        entity = self.column_descriptions[0]["entity"]
+        return paginate(self, entity, *criteria, **options).all()
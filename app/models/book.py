@@ -4,11 +4,20 @@ Book Model
 Модель книги - центральная сущность каталога
 """
 
-from sqlalchemy import Column, String, Text, Integer, Float, Date, ForeignKey, Table
-from sqlalchemy.orm import relationship
-from app.models.base import BaseModel
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import (
+    Column, String, Text, Integer, Float, Date, ForeignKey, Table, Index, desc, event, func, select, true
+)
+from sqlalchemy.sql import ColumnElement, Delete
+from sqlalchemy.orm import column_property, relationship
+from app.models.base import BaseModel, ContentHashMixin, updated_at_index
+from app.models.genre import Genre
 from app.core.database import Base
 
+# Разделитель в Book.genre_names_joined
+GENRE_NAMES_SEPARATOR = ", "
+
 
 # Ассоциативная таблица для Many-to-Many связи Book <-> Genre
 # Это не модель, а просто таблица для хранения связей
@@ -16,11 +25,14 @@ book_genres = Table(
     "book_genres",
     Base.metadata,
     Column("book_id", Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True),
-    Column("genre_id", Integer, ForeignKey("genres.id", ondelete="CASCADE"), primary_key=True)
+    Column("genre_id", Integer, ForeignKey("genres.id", ondelete="CASCADE"), primary_key=True),
+    # Первичный ключ (book_id, genre_id) обслуживает переход книга -> жанры;
+    # обратный переход жанр -> книги (get_by_genre, топ жанров) — этот индекс
+    Index("ix_book_genres_genre_id_book_id", "genre_id", "book_id")
 )
 
 
-class Book(BaseModel):
+class Book(ContentHashMixin, BaseModel):
     """
     Модель книги.
 
@@ -39,12 +51,31 @@ class Book(BaseModel):
         language: Язык книги
         author_id: ID автора (Foreign Key)
         publisher_id: ID издательства (Foreign Key)
+        content_hash: Хеш записи фида (ContentHashMixin)
         author: Автор (relationship)
         publisher: Издательство (relationship)
         genres: Жанры (relationship Many-to-Many)
+        genre_names_joined: Названия жанров одной строкой (подзапрос, отложенно)
     """
     __tablename__ = "books"
 
+    # Составные индексы под формы горячих запросов
+    __table_args__ = (
+        # get_by_author: фильтр по автору + сортировка по названию;
+        # заменяет одиночный индекс по author_id (его префикс)
+        Index("ix_books_author_id_title", "author_id", "title"),
+        # advanced_search: язык (равенство) + диапазон цены
+        Index("ix_books_language_price", "language", "price"),
+        # get_books_sorted: сортировка по цене и дате с LIMIT
+        Index("ix_books_price", "price"),
+        Index("ix_books_publication_date", "publication_date"),
+        # get_dashboard_data: последние добавленные книги;
+        # на PostgreSQL title в индексе даёт index-only scan
+        Index("ix_books_created_at", desc("created_at"), postgresql_include=["title"]),
+        # Лента изменений: keyset по (updated_at, id)
+        updated_at_index("books"),
+    )
+
     title = Column(String(500), nullable=False, index=True)
     isbn = Column(String(20), nullable=True, unique=True, index=True)
     description = Column(Text, nullable=True)
@@ -57,8 +88,7 @@ class Book(BaseModel):
     author_id = Column(
         Integer,
         ForeignKey("authors.id", ondelete="CASCADE"),
-        nullable=False,
-        index=True
+        nullable=False
     )
     publisher_id = Column(
         Integer,
@@ -79,6 +109,8 @@ class Book(BaseModel):
         "Genre",
         secondary=book_genres,
         back_populates="books",
+        # Строки book_genres удаляет каскад внешнего ключа
+        passive_deletes=True,
         lazy="selectin"
     )
 
@@ -100,3 +132,57 @@ class Book(BaseModel):
         if genre in self.genres:
             self.genres.remove(genre)
 
+
+@event.listens_for(Book.genres, "append")
+@event.listens_for(Book.genres, "remove")
+def _touch_book_on_genre_change(target, value, initiator):
+    """
+    Изменение жанров книги обновляет её updated_at.
+
+    Связи хранятся в book_genres, строка books при этом не меняется, и
+    лента изменений (app.queries.changes) иначе не увидела бы правку.
+    """
+    target.updated_at = datetime.utcnow()
+
+
+# Названия жанров, собранные базой (group_concat в SQLite, string_agg
+# в PostgreSQL) в коррелированном подзапросе. Opt-in для списков:
+# select(Book).options(undefer(Book.genre_names_joined)) получает строку
+# в том же SELECT, что и книги, без загрузки коллекции genres.
+# Порядок названий не определён; у книги без жанров значение None.
+Book.genre_names_joined = column_property(
+    select(func.aggregate_strings(Genre.name, GENRE_NAMES_SEPARATOR))
+    .select_from(book_genres.join(Genre, Genre.id == book_genres.c.genre_id))
+    .where(book_genres.c.book_id == Book.id)
+    .correlate_except(book_genres, Genre)
+    .scalar_subquery(),
+    deferred=True
+)
+
+
+def deleted_rows_condition(statement: Delete) -> ColumnElement:
+    """Условие DELETE на его собственную таблицу (без WHERE — все строки)."""
+    return statement.whereclause if statement.whereclause is not None else true()
+
+
+def books_deleted_by(statement: Delete) -> Optional[ColumnElement]:
+    """
+    Условие на books для книг, которые удалит массовый DELETE.
+
+    Массовые DELETE не проходят через unit of work (Session.deleted):
+    подписчики do_orm_execute выбирают по этому условию книги до
+    удаления. Книги удаляет как DELETE FROM books, так и DELETE авторов
+    (books.author_id ON DELETE CASCADE, см. AuthorCRUD.delete_author_tree).
+
+    Args:
+        statement: DELETE-выражение
+
+    Returns:
+        Условие на Book или None, если DELETE книги не удаляет
+    """
+    table = statement.table
+    if table.name == Book.__tablename__:
+        return deleted_rows_condition(statement)
+    if table.name == "authors":
+        return Book.author_id.in_(select(table.c.id).where(deleted_rows_condition(statement)))
+    return None
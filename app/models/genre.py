@@ -6,7 +6,7 @@ Genre Model
 
 from sqlalchemy import Column, String, Text
 from sqlalchemy.orm import relationship
-from app.models.base import BaseModel
+from app.models.base import BaseModel, PagedQuery, updated_at_index
 
 
 class Genre(BaseModel):
@@ -19,9 +19,11 @@ class Genre(BaseModel):
     Attributes:
         name: Название жанра
         description: Описание жанра
-        books: Список книг этого жанра (relationship через association table)
+        books: Книги этого жанра (динамическая коллекция через association table:
+            append без загрузки, чтение через books.page(...))
     """
     __tablename__ = "genres"
+    __table_args__ = (updated_at_index("genres"),)
 
     name = Column(String(100), nullable=False, unique=True, index=True)
     description = Column(Text, nullable=True)
@@ -32,7 +34,11 @@ class Genre(BaseModel):
         "Book",
         secondary="book_genres",  # Имя ассоциативной таблицы
         back_populates="genres",
-        lazy="selectin"
+        passive_deletes=True,  # Связи удаляет каскад book_genres.genre_id
+        # В жанре могут быть сотни тысяч книг: коллекция не загружается
+        # целиком, а читается запросами (PagedQuery.page)
+        lazy="dynamic",
+        query_class=PagedQuery
     )
 
     def __repr__(self):
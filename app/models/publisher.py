@@ -6,10 +6,10 @@ Publisher Model
 
 from sqlalchemy import Column, String, Text
 from sqlalchemy.orm import relationship
-from app.models.base import BaseModel
+from app.models.base import BaseModel, ContentHashMixin, PagedQuery, updated_at_index
 
 
-class Publisher(BaseModel):
+class Publisher(ContentHashMixin, BaseModel):
     """
     Модель издательства.
 
@@ -21,9 +21,11 @@ class Publisher(BaseModel):
         address: Адрес
         website: Веб-сайт
         description: Описание
-        books: Список книг издательства (relationship)
+        content_hash: Хеш записи фида (ContentHashMixin)
+        books: Книги издательства (динамическая коллекция, чтение через books.page(...))
     """
     __tablename__ = "publishers"
+    __table_args__ = (updated_at_index("publishers"),)
 
     name = Column(String(255), nullable=False, unique=True, index=True)
     address = Column(String(500), nullable=True)
@@ -34,7 +36,9 @@ class Publisher(BaseModel):
     books = relationship(
         "Book",
         back_populates="publisher",
-        lazy="selectin"
+        passive_deletes=True,  # publisher_id обнуляет база (ON DELETE SET NULL)
+        lazy="dynamic",
+        query_class=PagedQuery
     )
 
     def __repr__(self):
@@ -0,0 +1,33 @@
+"""
+Statistics Sketch Model
+=======================
+Сохранённое состояние скетчей статистики каталога
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String, Text
+
+from app.core.database import Base
+
+
+class StatisticsSketch(Base):
+    """
+    Сериализованные скетчи (app.queries.sketches.CatalogSketches).
+
+    Одна строка на набор скетчей; состояние — JSON (центроиды t-digest,
+    регистры HyperLogLog в base64, точные суммы).
+
+    Attributes:
+        name: Имя набора скетчей
+        state: Состояние (JSON)
+        updated_at: Время сохранения
+    """
+    __tablename__ = "statistics_sketches"
+
+    name = Column(String(100), primary_key=True)
+    state = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<StatisticsSketch(name='{self.name}', updated_at={self.updated_at})>"
@@ -0,0 +1,123 @@
+"""
+Tombstone Model
+===============
+Следы удалённых строк для ленты изменений
+"""
+
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, event, text
+from sqlalchemy.engine import Connection
+
+from app.core.database import Base
+from app.core.partitioning import MAINTENANCE_SETTING
+
+# Таблицы, удаления из которых записываются в tombstones
+TRACKED_TABLES = ("authors", "publishers", "genres", "books")
+
+_PG_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION record_tombstone() RETURNS trigger AS $$
+DECLARE
+    moved boolean;
+BEGIN
+    -- Перенос строк между секциями books — не удаление
+    IF current_setting('{MAINTENANCE_SETTING}', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    -- UPDATE ключа секционирования выполняется как DELETE + INSERT;
+    -- строка с тем же id на месте — значит, её перенесли, а не удалили
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE id = $1)', TG_ARGV[0])
+        INTO moved USING OLD.id;
+    IF moved THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO tombstones (table_name, row_id, deleted_at)
+    VALUES (TG_ARGV[0], OLD.id, clock_timestamp() AT TIME ZONE 'UTC');
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+class Tombstone(Base):
+    """
+    След удалённой строки.
+
+    Записывается триггером AFTER DELETE, а не событием ORM: так в ленту
+    попадают и массовые DELETE, и каскадные удаления внешних ключей
+    (книги удалённого автора).
+
+    Attributes:
+        table_name: Таблица удалённой строки
+        row_id: ID удалённой строки
+        deleted_at: Время удаления (UTC, сравнимо с updated_at)
+    """
+    __tablename__ = "tombstones"
+    __table_args__ = (Index("ix_tombstones_deleted_at_id", "deleted_at", "id"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(100), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<Tombstone(table='{self.table_name}', row_id={self.row_id})>"
+
+
+def _trigger_name(table_name: str) -> str:
+    return f"{table_name}_tombstone"
+
+
+def install_tombstone_triggers(connection: Connection, tables: Iterable[str] = TRACKED_TABLES) -> None:
+    """
+    Создать триггеры AFTER DELETE, записывающие tombstones.
+
+    SQLite и PostgreSQL; на других СУБД ничего не делает. На
+    секционированной books PostgreSQL сам создаёт триггер на секциях.
+
+    Args:
+        connection: Соединение
+        tables: Отслеживаемые таблицы
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text(_PG_FUNCTION))
+    for table in tables:
+        trigger = _trigger_name(table)
+        if dialect == "sqlite":
+            # Шесть знаков дробной части, как у DateTime SQLAlchemy: строки
+            # сравниваются лексикографически
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {trigger} AFTER DELETE ON {table} "
+                f"FOR EACH ROW BEGIN "
+                f"INSERT INTO tombstones (table_name, row_id, deleted_at) "
+                f"VALUES ('{table}', OLD.id, strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'); "
+                f"END"
+            ))
+        elif dialect == "postgresql":
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table}"))
+            connection.execute(text(
+                f"CREATE TRIGGER {trigger} AFTER DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION record_tombstone('{table}')"
+            ))
+
+
+def drop_tombstone_triggers(connection: Connection, tables: Iterable[str] = TRACKED_TABLES) -> None:
+    """Удалить триггеры tombstones (и функцию PostgreSQL)."""
+    dialect = connection.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        return
+    for table in tables:
+        on_table = f" ON {table}" if dialect == "postgresql" else ""
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {_trigger_name(table)}{on_table}"))
+    if dialect == "postgresql":
+        connection.execute(text("DROP FUNCTION IF EXISTS record_tombstone()"))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_triggers(target, connection, tables=(), **kw):
+    """create_all: триггеры для созданных отслеживаемых таблиц."""
+    install_tombstone_triggers(
+        connection, [table.name for table in tables if table.name in TRACKED_TABLES]
+    )
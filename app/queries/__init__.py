@@ -5,6 +5,20 @@ Queries module - Advanced SQLAlchemy queries
 """
 
 from app.queries.advanced import AdvancedQueries
+from app.queries.autocomplete import AutocompleteIndex
+from app.queries.changes import changes_since, export_ndjson
+from app.queries.facets import FacetIndex
+from app.queries.similarity import GenreMatrix
+from app.queries.sketches import CatalogSketches
+from app.queries.snapshot import BookSnapshot
 
-__all__ = ["AdvancedQueries"]
-
+__all__ = [
+    "AdvancedQueries",
+    "AutocompleteIndex",
+    "BookSnapshot",
+    "CatalogSketches",
+    "FacetIndex",
+    "GenreMatrix",
+    "changes_since",
+    "export_ndjson",
+]
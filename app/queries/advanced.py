@@ -4,16 +4,123 @@ Advanced Queries
 Демонстрация продвинутых SQL запросов с SQLAlchemy
 """
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Union
 from datetime import date
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, asc, case, and_, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import Select, func, desc, asc, case, and_, or_, select, text
 from sqlalchemy.sql import label
 
 from app.models.author import Author
 from app.models.book import Book, book_genres
 from app.models.genre import Genre
 from app.models.publisher import Publisher
+from app.queries.sketches import CatalogSketches
+
+
+# Границы ценовых категорий: (верхняя граница, название).
+# Последняя категория не ограничена сверху.
+PRICE_CATEGORY_BOUNDS = (
+    (300, "Бюджетная"),
+    (700, "Средняя"),
+    (1500, "Дорогая"),
+)
+PRICE_CATEGORY_TOP = "Премиум"
+
+# Колонки, которые top_n_per_group_statement добавляет к запросу
+GROUP_KEY = "group_key"
+GROUP_RANK = "group_rank"
+
+
+def _selects_entity(statement: Select) -> bool:
+    """Запрос выбирает одну модель целиком (select(Book)), а не колонки."""
+    descriptions = statement.column_descriptions
+    return len(descriptions) == 1 and isinstance(descriptions[0]["expr"], type)
+
+
+def top_n_per_group_statement(
+    statement: Select,
+    partition_by,
+    order_by: Union[Any, Sequence[Any]],
+    n: int
+) -> Select:
+    """
+    Первые n строк каждой группы одним запросом.
+
+    Номер строки в группе — ROW_NUMBER() OVER (PARTITION BY ... ORDER BY ...)
+    в подзапросе; внешний запрос оставляет номера <= n. Запрос может
+    содержать JOIN, WHERE и GROUP BY (окно считается после группировки).
+
+    Args:
+        statement: select(Model) или select колонок
+        partition_by: Выражение группы
+        order_by: Порядок внутри группы (выражение или список выражений)
+        n: Строк на группу
+
+    Returns:
+        select(group_key, модель | колонки запроса), по группе и номеру в ней
+
+    Example:
+        >>> stmt = top_n_per_group_statement(
+        ...     select(Book), Book.author_id, Book.price.desc(), 3
+        ... )
+    """
+    if not isinstance(order_by, (list, tuple)):
+        order_by = [order_by]
+    ranked = statement.add_columns(
+        partition_by.label(GROUP_KEY),
+        func.row_number().over(partition_by=partition_by, order_by=order_by).label(GROUP_RANK)
+    ).subquery("ranked")
+    if _selects_entity(statement):
+        items = [aliased(statement.column_descriptions[0]["entity"], ranked)]
+    else:
+        items = [ranked.c[description["name"]] for description in statement.column_descriptions]
+    return select(ranked.c[GROUP_KEY], *items).where(
+        ranked.c[GROUP_RANK] <= n
+    ).order_by(ranked.c[GROUP_KEY], ranked.c[GROUP_RANK])
+
+
+def _group_rows(rows, entity: bool) -> Dict[Any, list]:
+    """{группа: [объект | словарь колонок]} из строк top_n_per_group_statement."""
+    groups: Dict[Any, list] = {}
+    for row in rows:
+        if entity:
+            item = row[1]
+        else:
+            item = {key: value for key, value in row._mapping.items() if key != GROUP_KEY}
+        groups.setdefault(row[0], []).append(item)
+    return groups
+
+
+def _most_expensive_books_per_genre(n: int) -> Select:
+    return top_n_per_group_statement(
+        select(Book).join(
+            book_genres, Book.id == book_genres.c.book_id
+        ).join(
+            Genre, Genre.id == book_genres.c.genre_id
+        ).where(Book.price.is_not(None)),
+        Genre.name, (Book.price.desc(), Book.id), n
+    )
+
+
+def _latest_books_per_author(n: int) -> Select:
+    return top_n_per_group_statement(
+        select(Book), Book.author_id, (Book.created_at.desc(), Book.id.desc()), n
+    )
+
+
+def _top_publishers_per_language(n: int) -> Select:
+    book_count = func.count(Book.id)
+    return top_n_per_group_statement(
+        select(
+            Publisher.name.label("publisher"), book_count.label("books")
+        ).join(
+            Book, Book.publisher_id == Publisher.id
+        ).where(
+            Book.language.is_not(None)
+        ).group_by(Book.language, Publisher.id, Publisher.name),
+        Book.language, (book_count.desc(), Publisher.name), n
+    )
 
 
 class AdvancedQueries:
@@ -33,14 +140,31 @@ class AdvancedQueries:
     # ==================== АГРЕГАТНЫЕ ФУНКЦИИ ====================
 
     @staticmethod
-    def get_library_statistics(db: Session) -> dict:
+    def get_library_statistics(
+        db: Session,
+        approximate: bool = False,
+        sketches: Optional[CatalogSketches] = None
+    ) -> dict:
         """
         Получить общую статистику библиотеки.
         Демонстрирует использование агрегатных функций.
 
+        approximate=True — статистика по скетчам (app.queries.sketches)
+        без чтения books, с медианой и p90 цены и страниц; точность
+        описана там же. Скетчи — переданные, сохранённые в
+        statistics_sketches или, если их нет, построенные проходом по books.
+
+        Args:
+            approximate: Считать по скетчам
+            sketches: Скетчи для approximate=True
+
         Returns:
             Словарь со статистикой
         """
+        if approximate:
+            sketches = sketches or CatalogSketches.load(db) or CatalogSketches.build(db)
+            return sketches.statistics()
+
         stats = db.query(
             func.count(Book.id).label("total_books"),
             func.count(func.distinct(Book.author_id)).label("total_authors"),
@@ -216,11 +340,14 @@ class AdvancedQueries:
         """
         from sqlalchemy import exists
 
-        # Подзапрос: существует книга этого автора с ценой выше порога
+        # Подзапрос: существует книга этого автора с ценой выше порога.
+        # Внешний запрос тоже соединяет books, поэтому подзапросу нужен
+        # собственный алиас — иначе books скоррелирует с внешним FROM.
+        expensive_book = aliased(Book)
         expensive_book_exists = exists().where(
             and_(
-                Book.author_id == Author.id,
-                Book.price >= price_threshold
+                expensive_book.author_id == Author.id,
+                expensive_book.price >= price_threshold
             )
         )
 
@@ -243,10 +370,8 @@ class AdvancedQueries:
             Список словарей с книгами и категориями
         """
         price_category = case(
-            (Book.price < 300, "Бюджетная"),
-            (Book.price < 700, "Средняя"),
-            (Book.price < 1500, "Дорогая"),
-            else_="Премиум"
+            *[(Book.price < bound, name) for bound, name in PRICE_CATEGORY_BOUNDS],
+            else_=PRICE_CATEGORY_TOP
         ).label("price_category")
 
         results = db.query(
@@ -333,6 +458,74 @@ class AdvancedQueries:
             sort_field
         ).offset(skip).limit(limit).all()
 
+    # ==================== ТОП-N В ГРУППАХ (ОКОННЫЕ ФУНКЦИИ) ====================
+
+    @staticmethod
+    def get_top_n_per_group(
+        db: Session,
+        statement: Select,
+        partition_by,
+        order_by: Union[Any, Sequence[Any]],
+        n: int = 10
+    ) -> Dict[Any, list]:
+        """
+        Первые n записей каждой группы одним запросом (ROW_NUMBER() OVER).
+        Заменяет запрос на каждую группу и сортировку в Python.
+
+        Args:
+            statement: select(Model) (с JOIN/WHERE) или select колонок (можно с GROUP BY)
+            partition_by: Выражение группы
+            order_by: Порядок внутри группы
+            n: Записей на группу
+
+        Returns:
+            {группа: [объекты модели | словари колонок]} в порядке групп
+
+        Example:
+            >>> AdvancedQueries.get_top_n_per_group(
+            ...     db, select(Book), Book.publisher_id, Book.pages.desc(), n=3
+            ... )
+            {1: [<Book...>, <Book...>, <Book...>], 2: [...]}
+        """
+        return _group_rows(
+            db.execute(top_n_per_group_statement(statement, partition_by, order_by, n)),
+            _selects_entity(statement)
+        )
+
+    @staticmethod
+    def get_most_expensive_books_per_genre(db: Session, n: int = 10) -> Dict[str, List[Book]]:
+        """
+        Самые дорогие книги каждого жанра.
+
+        Returns:
+            {название жанра: [книги по убыванию цены]}; книги без цены не учитываются
+        """
+        return _group_rows(db.execute(_most_expensive_books_per_genre(n)), entity=True)
+
+    @staticmethod
+    def get_latest_books_per_author(db: Session, n: int = 5) -> Dict[int, List[Book]]:
+        """
+        Последние добавленные книги каждого автора.
+
+        Returns:
+            {id автора: [книги от новых к старым]}
+        """
+        return _group_rows(db.execute(_latest_books_per_author(n)), entity=True)
+
+    @staticmethod
+    def get_top_publishers_per_language(db: Session, n: int = 1) -> Dict[str, List[dict]]:
+        """
+        Издательства с наибольшим числом книг на каждом языке.
+        Демонстрирует оконную функцию поверх GROUP BY.
+
+        Продаж в схеме нет — «лучшее» издательство то, у которого
+        больше книг на языке.
+
+        Returns:
+            {язык: [{"publisher": название, "books": количество}, ...]}
+        """
+        return _group_rows(db.execute(_top_publishers_per_language(n)), entity=False)
+
     # ==================== RAW SQL ====================
 
     @staticmethod
@@ -406,3 +599,37 @@ class AdvancedQueries:
             "recent_books": [{"title": b.title, "added": str(b.created_at)} for b in recent_books]
         }
 
+
+class AsyncAdvancedQueries:
+    """
+    Асинхронные варианты запросов AdvancedQueries.
+
+    Запросы строятся теми же функциями, что и в AdvancedQueries.
+    """
+
+    @staticmethod
+    async def get_top_n_per_group(
+        db: AsyncSession,
+        statement: Select,
+        partition_by,
+        order_by: Union[Any, Sequence[Any]],
+        n: int = 10
+    ) -> Dict[Any, list]:
+        """См. AdvancedQueries.get_top_n_per_group."""
+        result = await db.execute(top_n_per_group_statement(statement, partition_by, order_by, n))
+        return _group_rows(result, _selects_entity(statement))
+
+    @staticmethod
+    async def get_most_expensive_books_per_genre(db: AsyncSession, n: int = 10) -> Dict[str, List[Book]]:
+        """См. AdvancedQueries.get_most_expensive_books_per_genre."""
+        return _group_rows(await db.execute(_most_expensive_books_per_genre(n)), entity=True)
+
+    @staticmethod
+    async def get_latest_books_per_author(db: AsyncSession, n: int = 5) -> Dict[int, List[Book]]:
+        """См. AdvancedQueries.get_latest_books_per_author."""
+        return _group_rows(await db.execute(_latest_books_per_author(n)), entity=True)
+
+    @staticmethod
+    async def get_top_publishers_per_language(db: AsyncSession, n: int = 1) -> Dict[str, List[dict]]:
+        """См. AdvancedQueries.get_top_publishers_per_language."""
+        return _group_rows(await db.execute(_top_publishers_per_language(n)), entity=False)
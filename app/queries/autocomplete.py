@@ -0,0 +1,381 @@
+"""
+Autocomplete Index
+==================
+Подсказки при вводе по названиям книг и именам авторов и издательств:
+отсортированный массив ключей в памяти вместо ILIKE на каждое нажатие
+
+Ключи свёрнуты по регистру и диакритике (fold): «Ёлка» и «елка»,
+«Émile» и «emile» совпадают, «й» остаётся «й». Префикс ищется с начала
+каждого слова: «толс» находит «Лев Толстой». Результат — id записей
+по убыванию популярности; объекты загружает BaseCRUD.get_by_ids.
+
+    >>> index = AutocompleteIndex.build(db).attach(SessionLocal)
+    >>> ids = index.complete("authors", "толс")
+    >>> author_crud.get_by_ids(db, ids)
+    [<Author(id=7, name='Лев Толстой')>, ...]
+
+После attach() индекс следует за изменениями через события ORM
+(after_flush копит изменения, after_commit применяет, откат сбрасывает).
+Массовые DELETE через Session.execute (author_crud.delete удаляет
+книги автора каскадом базы) учитываются событием do_orm_execute: книги
+и записи выбираются до удаления. Массовые вставки и изменения в обход
+ORM (CatalogLoader, update() Core) событий не порождают — после них
+индекс строится заново (build).
+"""
+
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.models.author import Author
+from app.models.book import Book, books_deleted_by, deleted_rows_condition
+from app.models.publisher import Publisher
+
+# Вид подсказок -> (модель, поле с текстом)
+AUTOCOMPLETE_FIELDS = {
+    "books": (Book, "title"),
+    "authors": (Author, "name"),
+    "publishers": (Publisher, "name"),
+}
+
+# Подсказок по умолчанию
+AUTOCOMPLETE_LIMIT = 10
+
+# Длина ключа в массиве: более длинный префикс проверяется по полному тексту
+_KEY_LENGTH = 32
+
+# Диапазон длиннее — верх префикса кешируется (до _TOP_CACHE подсказок):
+# короткие префиксы («к») иначе перебирали бы десятки тысяч ключей
+_SCAN_LIMIT = 2000
+_TOP_CACHE = 50
+
+# Верхняя граница диапазона ключей с данным префиксом
+_MAX_CHAR = "\U0010ffff"
+
+# Диакритика, которая в кириллице образует отдельную букву: й (и + бреве)
+_KEEP_MARKS = {("и", "\u0306")}
+
+
+def fold(text: str) -> str:
+    """
+    Ключ подсказки: casefold, без диакритики, слова через один пробел.
+
+    Знаки ударения, умлауты и т. п. отбрасываются (ё -> е, é -> e),
+    кроме бреве в «й». Всё, кроме букв и цифр, — разделитель слов.
+
+    Example:
+        >>> fold("Ёжик в «Тумане»")
+        'ежик в тумане'
+        >>> fold("Émile Zola; Йошкар-Ола")
+        'emile zola йошкар ола'
+    """
+    chars: List[str] = []
+    for char in unicodedata.normalize("NFD", text.casefold()):
+        if unicodedata.combining(char):
+            if chars and (chars[-1], char) in _KEEP_MARKS:
+                chars.append(char)
+        else:
+            chars.append(char if char.isalnum() else " ")
+    return " ".join(unicodedata.normalize("NFC", "".join(chars)).split())
+
+
+def _word_keys(folded: str) -> List[str]:
+    """Ключи для поиска с начала каждого слова (суффиксы от начала слов)."""
+    keys = [folded[:_KEY_LENGTH]] if folded else []
+    for at, char in enumerate(folded):
+        if char == " ":
+            keys.append(folded[at + 1:at + 1 + _KEY_LENGTH])
+    return keys
+
+
+class PrefixIndex:
+    """
+    Подсказки одного вида: отсортированный список (ключ, id) и популярность.
+
+    Вставка и удаление — bisect по списку; поиск — два bisect и выбор
+    top-K из диапазона (для длинных диапазонов — из кеша по префиксу).
+
+    Attributes:
+        popularity: {id: вес}; выше — раньше в подсказках
+    """
+
+    def __init__(self):
+        self.popularity: Dict[int, float] = {}
+        self._entries: List[Tuple[str, int]] = []
+        self._folded: Dict[int, str] = {}
+        self._top: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._folded)
+
+    def load(self, rows: List[Tuple[int, str]]) -> None:
+        """Заполнить индекс (id, текст) целиком, одной сортировкой."""
+        self._folded = {id: fold(text) for id, text in rows if text}
+        self._entries = sorted(
+            (key, id) for id, folded in self._folded.items() for key in _word_keys(folded)
+        )
+        self._top.clear()
+
+    def put(self, id: int, text: Optional[str]) -> None:
+        """Добавить запись или заменить её текст."""
+        self.remove(id)
+        folded = fold(text or "")
+        if not folded:
+            return
+        self._folded[id] = folded
+        for key in _word_keys(folded):
+            insort(self._entries, (key, id))
+        self._invalidate(folded)
+
+    def remove(self, id: int) -> None:
+        """Удалить запись (популярность сохраняется)."""
+        folded = self._folded.pop(id, None)
+        if folded is None:
+            return
+        for key in _word_keys(folded):
+            at = bisect_left(self._entries, (key, id))
+            if at < len(self._entries) and self._entries[at] == (key, id):
+                del self._entries[at]
+        self._invalidate(folded)
+
+    def bump(self, id: int, delta: float = 1) -> None:
+        """Изменить популярность записи."""
+        self.popularity[id] = self.popularity.get(id, 0) + delta
+        if id in self._folded:
+            self._invalidate(self._folded[id])
+
+    def _invalidate(self, folded: str) -> None:
+        """Сбросить кеш префиксов, которые могут включать эту запись."""
+        if not self._top:
+            return
+        for key in _word_keys(folded):
+            for end in range(1, len(key) + 1):
+                self._top.pop(key[:end], None)
+
+    def _rank(self, id: int) -> tuple:
+        return -self.popularity.get(id, 0), self._folded[id], id
+
+    def complete(self, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[int]:
+        """
+        Записи, у которых одно из слов начинается с prefix.
+
+        Args:
+            prefix: Введённый текст (сворачивается так же, как ключи)
+            limit: Максимум подсказок
+
+        Returns:
+            id по убыванию популярности, при равенстве — по алфавиту
+        """
+        query = fold(prefix)
+        if not query or limit <= 0:
+            return []
+        key = query[:_KEY_LENGTH]
+        cached = self._top.get(key)
+        if cached is not None and len(query) <= _KEY_LENGTH and limit <= len(cached):
+            return cached[:limit]
+
+        lo = bisect_left(self._entries, (key,))
+        hi = bisect_left(self._entries, (key + _MAX_CHAR,), lo)
+        ids = {id for _, id in self._entries[lo:hi]}
+        if len(query) > _KEY_LENGTH:
+            ids = {
+                id for id in ids
+                if self._folded[id].startswith(query) or f" {query}" in self._folded[id]
+            }
+        if hi - lo <= _SCAN_LIMIT or len(query) > _KEY_LENGTH:
+            return heapq.nsmallest(limit, ids, key=self._rank)
+
+        top = heapq.nsmallest(max(limit, _TOP_CACHE), ids, key=self._rank)
+        self._top[key] = top
+        return top[:limit]
+
+
+class AutocompleteIndex:
+    """
+    Подсказки по видам из AUTOCOMPLETE_FIELDS.
+
+    Популярность авторов и издательств — число их книг (поддерживается
+    событиями ORM); у книг сигнала популярности в схеме нет, её
+    накапливает record_selection() (выбор подсказки пользователем).
+
+    Attributes:
+        books, authors, publishers: PrefixIndex каждого вида
+    """
+
+    def __init__(self):
+        self.books = PrefixIndex()
+        self.authors = PrefixIndex()
+        self.publishers = PrefixIndex()
+        self._lock = threading.Lock()
+        self._targets: list = []
+        self._info_key = f"autocomplete_{id(self)}"
+
+    def __repr__(self):
+        sizes = ", ".join(f"{kind}={len(getattr(self, kind))}" for kind in AUTOCOMPLETE_FIELDS)
+        return f"<AutocompleteIndex({sizes})>"
+
+    # ==================== ЗАГРУЗКА И ПОИСК ====================
+
+    @classmethod
+    def build(cls, db: Session) -> "AutocompleteIndex":
+        """
+        Построить индекс по таблицам (Core, только нужные колонки).
+
+        Args:
+            db: Сессия базы данных
+
+        Returns:
+            Новый индекс
+        """
+        index = cls()
+        connection = db.connection()
+        for kind, (model, field) in AUTOCOMPLETE_FIELDS.items():
+            rows = connection.execute(select(model.id, getattr(model, field))).tuples().all()
+            getattr(index, kind).load(rows)
+        for kind, column in (("authors", Book.author_id), ("publishers", Book.publisher_id)):
+            counts = connection.execute(
+                select(column, func.count()).where(column.is_not(None)).group_by(column)
+            ).tuples().all()
+            getattr(index, kind).popularity = {id: count for id, count in counts}
+        return index
+
+    def complete(self, kind: str, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[int]:
+        """
+        Подсказки для введённого текста.
+
+        Args:
+            kind: "books", "authors" или "publishers"
+            prefix: Введённый текст
+            limit: Максимум подсказок
+
+        Returns:
+            id записей (загрузка — BaseCRUD.get_by_ids, порядок сохраняется)
+
+        Raises:
+            ValueError: Если вид неизвестен
+        """
+        if kind not in AUTOCOMPLETE_FIELDS:
+            raise ValueError(f"Unknown autocomplete kind '{kind}'")
+        with self._lock:
+            return getattr(self, kind).complete(prefix, limit)
+
+    def record_selection(self, kind: str, id: int, weight: float = 1) -> None:
+        """Учесть выбор подсказки: запись поднимается выше в подсказках."""
+        with self._lock:
+            getattr(self, kind).bump(id, weight)
+
+    # ==================== СОБЫТИЯ ORM ====================
+
+    def attach(self, target=Session) -> "AutocompleteIndex":
+        """
+        Следить за изменениями через события сессий.
+
+        Args:
+            target: Класс Session, sessionmaker или отдельная сессия
+
+        Returns:
+            self
+        """
+        for name, handler in (
+            ("after_flush", self._after_flush),
+            ("do_orm_execute", self._do_orm_execute),
+            ("after_commit", self._after_commit),
+            ("after_rollback", self._after_rollback),
+        ):
+            event.listen(target, name, handler)
+            self._targets.append((target, name, handler))
+        return self
+
+    def detach(self) -> None:
+        """Отключить события, подключённые attach()."""
+        for target, name, handler in self._targets:
+            event.remove(target, name, handler)
+        self._targets.clear()
+
+    def _after_flush(self, session: Session, flush_context) -> None:
+        """Записать изменения flush; применятся после коммита."""
+        pending = session.info.setdefault(self._info_key, [])
+        for obj in session.new:
+            pending += self._changes(obj, created=True)
+        for obj in session.dirty:
+            pending += self._changes(obj)
+        for obj in session.deleted:
+            pending += self._changes(obj, deleted=True)
+
+    def _do_orm_execute(self, orm_execute_state: ORMExecuteState) -> None:
+        """Записать записи и книги, которые удалит массовый DELETE."""
+        if not orm_execute_state.is_delete:
+            return
+        session, statement = orm_execute_state.session, orm_execute_state.statement
+        changes = []
+        for kind in ("authors", "publishers"):
+            model = AUTOCOMPLETE_FIELDS[kind][0]
+            if statement.table.name == model.__tablename__:
+                ids = session.scalars(select(model.id).where(deleted_rows_condition(statement)))
+                changes += [("remove", kind, id, None) for id in ids]
+
+        condition = books_deleted_by(statement)
+        if condition is not None:
+            books = session.execute(select(Book.id, Book.author_id, Book.publisher_id).where(condition))
+            for id, author_id, publisher_id in books:
+                changes.append(("remove", "books", id, None))
+                changes.append(("bump", "authors", author_id, -1))
+                if publisher_id is not None:
+                    changes.append(("bump", "publishers", publisher_id, -1))
+        if changes:
+            session.info.setdefault(self._info_key, []).extend(changes)
+
+    def _after_commit(self, session: Session) -> None:
+        pending = session.info.pop(self._info_key, None)
+        if not pending:
+            return
+        with self._lock:
+            for op, kind, id, value in pending:
+                prefix_index = getattr(self, kind)
+                if op == "put":
+                    prefix_index.put(id, value)
+                elif op == "remove":
+                    prefix_index.remove(id)
+                else:
+                    prefix_index.bump(id, value)
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(self._info_key, None)
+
+    @staticmethod
+    def _changes(obj, created: bool = False, deleted: bool = False) -> List[tuple]:
+        """Операции над индексом для объекта из flush."""
+        for kind, (model, field) in AUTOCOMPLETE_FIELDS.items():
+            if isinstance(obj, model):
+                break
+        else:
+            return []
+
+        state = inspect(obj)
+        if deleted:
+            changes = [("remove", kind, obj.id, None)]
+        elif created or state.attrs[field].history.has_changes():
+            changes = [("put", kind, obj.id, getattr(obj, field))]
+        else:
+            changes = []
+
+        if isinstance(obj, Book):
+            # Популярность автора и издательства — число их книг
+            for kind, column in (("authors", "author_id"), ("publishers", "publisher_id")):
+                if created or deleted:
+                    before, after = (obj.__dict__.get(column),), ()
+                    if created:
+                        before, after = after, before
+                else:
+                    history = state.attrs[column].history
+                    if not history.has_changes():
+                        continue
+                    before, after = history.deleted, history.added
+                changes += [("bump", kind, id, -1) for id in before if id is not None]
+                changes += [("bump", kind, id, 1) for id in after if id is not None]
+        return changes
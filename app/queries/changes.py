@@ -0,0 +1,257 @@
+"""
+Change Feed
+===========
+Лента изменений каталога и инкрементальный экспорт NDJSON
+
+Вместо ночной выгрузки всего каталога потребители (поиск, рекомендации)
+запрашивают изменения с момента своего курсора:
+
+    >>> feed = changes_since(db, cursor)
+    >>> apply(feed["changes"]); cursor = feed["cursor"]
+
+Изменения строк читаются по индексам (updated_at, id) каждой таблицы,
+удаления — из tombstones (их пишут триггеры, см. app.models.tombstone).
+Курсор хранит позицию (время, id) отдельно по каждому источнику, поэтому
+строки с одинаковым updated_at не теряются и не повторяются.
+"""
+
+import base64
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple, Type
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.models import Author, Book, Genre, Publisher, Tombstone
+from app.models.base import BaseModel, json_default, model_to_dict
+
+# Модели ленты изменений
+CHANGE_FEED_MODELS: Tuple[Type[BaseModel], ...] = (Author, Publisher, Genre, Book)
+
+# Строки моложе этого интервала не отдаются: updated_at ставится до
+# коммита, и транзакция, зафиксированная позже, могла бы оказаться за
+# уже выданным курсором
+CHANGE_FEED_SETTLE = timedelta(seconds=float(os.getenv("CHANGE_FEED_SETTLE_SECONDS", "5")))
+
+# Дополнительные поля записи ленты (связи, которых нет в колонках)
+CHANGE_FEED_EXTRAS: Dict[Type[BaseModel], Callable[[BaseModel], Dict[str, Any]]] = {
+    Book: lambda book: {"genre_ids": sorted(genre.id for genre in book.genres)},
+}
+
+_TOMBSTONES = "tombstones"
+
+Position = Tuple[datetime, int]
+
+
+# ==================== КУРСОР ====================
+
+def encode_cursor(positions: Dict[str, Position]) -> str:
+    """Непрозрачный курсор: позиции источников в base64(JSON)."""
+    payload = {source: [moment.isoformat(), id] for source, (moment, id) in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload, sort_keys=True).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Dict[str, Position]:
+    """
+    Разобрать курсор encode_cursor.
+
+    Raises:
+        ValueError: Если курсор повреждён
+    """
+    if not cursor:
+        return {}
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {
+            source: (datetime.fromisoformat(moment), int(id))
+            for source, (moment, id) in payload.items()
+        }
+    except (ValueError, TypeError) as error:
+        raise ValueError(f"Invalid change feed cursor: {cursor!r}") from error
+
+
+def cursor_at(moment: datetime, models: Sequence[Type[BaseModel]] = CHANGE_FEED_MODELS) -> str:
+    """
+    Курсор, с которого лента отдаёт изменения начиная с момента moment.
+
+    Нужен потребителям, которые строят начальное состояние прямым чтением
+    таблиц: курсор на момент начала чтения минус settle подхватит всё,
+    что зафиксировано после (повторно отданные строки применяются
+    идемпотентно).
+    """
+    position = (moment, 0)
+    positions = {model.__tablename__: position for model in models}
+    positions[_TOMBSTONES] = position
+    return encode_cursor(positions)
+
+
+# ==================== ЛЕНТА ====================
+
+def _after(moment_column, id_column, position: Optional[Position]):
+    if position is None:
+        return True
+    moment, id = position
+    return or_(moment_column > moment, and_(moment_column == moment, id_column > id))
+
+
+def _upsert(model: Type[BaseModel], obj: BaseModel) -> Dict[str, Any]:
+    data = model_to_dict(obj)
+    extras = CHANGE_FEED_EXTRAS.get(model)
+    if extras is not None:
+        data.update(extras(obj))
+    return {
+        "op": "upsert",
+        "table": model.__tablename__,
+        "id": obj.id,
+        "at": obj.updated_at,
+        "data": data,
+    }
+
+
+def changes_since(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 1000,
+    models: Sequence[Type[BaseModel]] = CHANGE_FEED_MODELS,
+    settle: timedelta = CHANGE_FEED_SETTLE,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Изменения после курсора, упорядоченные по времени.
+
+    Из каждого источника (таблицы моделей и tombstones) читается не больше
+    limit строк keyset-запросом по (время, id); записи сливаются по
+    (время, источник, id) — внутри источника в том же порядке, что и его
+    курсор, — и курсор каждого источника сдвигается только до последней
+    отданной записи этого источника.
+
+    Записи: {"op": "upsert", "table", "id", "at", "data"} с колонками
+    строки или {"op": "delete", "table", "id", "at"}. Строка, изменённая
+    несколько раз между запросами, приходит один раз в последнем
+    состоянии; удалённая — только как delete.
+
+    Args:
+        db: Сессия базы данных
+        cursor: Курсор предыдущего ответа (None — с начала, полный экспорт)
+        limit: Максимум записей в ответе
+        models: Модели ленты
+        settle: Не отдавать изменения моложе этого интервала
+        now: Текущее время UTC (для тестов)
+
+    Returns:
+        {"changes": [...], "cursor": str, "has_more": bool}
+
+    Raises:
+        ValueError: Если курсор повреждён
+    """
+    positions = decode_cursor(cursor)
+    horizon = (now or datetime.utcnow()) - settle
+    candidates: List[Tuple[Tuple[datetime, str, int], str, Dict[str, Any]]] = []
+    exhausted = True
+
+    for model in models:
+        table = model.__tablename__
+        rows = db.query(model).filter(
+            _after(model.updated_at, model.id, positions.get(table)),
+            model.updated_at <= horizon
+        ).order_by(model.updated_at, model.id).limit(limit).all()
+        exhausted = exhausted and len(rows) < limit
+        candidates += [((row.updated_at, table, row.id), table, _upsert(model, row)) for row in rows]
+
+    tables = [model.__tablename__ for model in models]
+    tombstones = db.query(Tombstone).filter(
+        Tombstone.table_name.in_(tables),
+        _after(Tombstone.deleted_at, Tombstone.id, positions.get(_TOMBSTONES)),
+        Tombstone.deleted_at <= horizon
+    ).order_by(Tombstone.deleted_at, Tombstone.id).limit(limit).all()
+    exhausted = exhausted and len(tombstones) < limit
+    candidates += [
+        (
+            # Ключ совпадает с позицией курсора: при обрезке страницы
+            # посреди удалений с одним deleted_at не пропускаются меньшие id
+            (tombstone.deleted_at, _TOMBSTONES, tombstone.id),
+            _TOMBSTONES,
+            {
+                "op": "delete",
+                "table": tombstone.table_name,
+                "id": tombstone.row_id,
+                "at": tombstone.deleted_at,
+                "_position": (tombstone.deleted_at, tombstone.id),
+            },
+        )
+        for tombstone in tombstones
+    ]
+
+    candidates.sort(key=lambda candidate: candidate[0])
+    changes = []
+    for _, source, change in candidates[:limit]:
+        position = change.pop("_position", None) or (change["at"], change["id"])
+        positions[source] = position
+        changes.append(change)
+
+    return {
+        "changes": changes,
+        "cursor": encode_cursor(positions),
+        "has_more": len(candidates) > limit or not exhausted,
+    }
+
+
+def iter_feed(
+    db: Session,
+    cursor: Optional[str] = None,
+    batch_size: int = 1000,
+    **options
+) -> Iterator[Dict[str, Any]]:
+    """
+    Ответы changes_since подряд, пока изменения не закончатся.
+
+    Объекты каждой порции удаляются из сессии, поэтому память не растёт
+    с размером экспорта. Курсор любого ответа можно сохранить и
+    продолжить с него.
+
+    Yields:
+        Ответы changes_since
+    """
+    while True:
+        feed = changes_since(db, cursor, limit=batch_size, **options)
+        db.expunge_all()
+        yield feed
+        cursor = feed["cursor"]
+        if not feed["has_more"]:
+            return
+
+
+def export_ndjson(
+    db: Session,
+    out: TextIO,
+    cursor: Optional[str] = None,
+    batch_size: int = 1000,
+    **options
+) -> Dict[str, Any]:
+    """
+    Записать изменения после курсора в NDJSON (одна запись на строку).
+
+    Example:
+        >>> with open("changes.ndjson", "w") as out:
+        ...     state = export_ndjson(db, out, cursor=saved_cursor)
+        >>> saved_cursor = state["cursor"]
+
+    Args:
+        db: Сессия базы данных
+        out: Текстовый поток (файл, sys.stdout)
+        cursor: Курсор прошлого экспорта (None — полный экспорт)
+        batch_size: Записей за один запрос к каждому источнику
+        **options: Параметры changes_since (models, settle)
+
+    Returns:
+        {"exported": количество записей, "cursor": курсор следующего экспорта}
+    """
+    exported = 0
+    for feed in iter_feed(db, cursor, batch_size, **options):
+        for change in feed["changes"]:
+            out.write(json.dumps(change, ensure_ascii=False, default=json_default) + "\n")
+        exported += len(feed["changes"])
+        cursor = feed["cursor"]
+    return {"exported": exported, "cursor": cursor}
@@ -0,0 +1,360 @@
+"""
+Query Plans
+===========
+Снятие планов запросов (EXPLAIN) и проверка регрессий планировщика
+
+Каждый метод AdvancedQueries и каждый поисковый метод BookCRUD
+выполняется на заполненной базе, перехваченные SELECT-запросы
+прогоняются через EXPLAIN, а нормализованные планы (без стоимостей
+и времени) сохраняются как снимки. Регрессией считаются:
+- новое полное сканирование таблицы (SCAN без индекса / Seq Scan);
+- изменённая стратегия соединения (порядок и способ доступа к таблицам
+  в SQLite, узлы Nested Loop / Hash Join / Merge Join в PostgreSQL).
+
+Запуск:
+    python -m app.queries.explain --update tests/plan_snapshots/sqlite.json
+    python -m app.queries.explain --url postgresql://... --check tests/plan_snapshots/postgresql.json
+"""
+
+import argparse
+import json
+import sys
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.crud.book import BookCRUD, book_crud
+from app.models.book import Book
+from app.queries.advanced import AdvancedQueries
+
+# План одного запроса — список узлов; отступ (два пробела на уровень) — глубина
+Plan = List[str]
+
+JOIN_NODES = ("Nested Loop", "Hash Join", "Merge Join")
+
+# Вызовы для снятия планов на данных app.ingest.synthetic.seed_catalog
+PLAN_TARGETS: Dict[str, Callable[[Session], Any]] = {
+    "AdvancedQueries.get_library_statistics": AdvancedQueries.get_library_statistics,
+    "AdvancedQueries.get_books_count_by_language": AdvancedQueries.get_books_count_by_language,
+    "AdvancedQueries.get_prolific_authors": AdvancedQueries.get_prolific_authors,
+    "AdvancedQueries.get_genre_statistics": AdvancedQueries.get_genre_statistics,
+    "AdvancedQueries.get_books_with_author_and_publisher":
+        AdvancedQueries.get_books_with_author_and_publisher,
+    "AdvancedQueries.get_authors_without_books": AdvancedQueries.get_authors_without_books,
+    "AdvancedQueries.get_books_above_average_price": AdvancedQueries.get_books_above_average_price,
+    "AdvancedQueries.get_authors_with_expensive_books":
+        AdvancedQueries.get_authors_with_expensive_books,
+    "AdvancedQueries.get_books_with_price_category": AdvancedQueries.get_books_with_price_category,
+    "AdvancedQueries.get_author_rating_by_books": AdvancedQueries.get_author_rating_by_books,
+    "AdvancedQueries.get_books_sorted": lambda db: AdvancedQueries.get_books_sorted(db, "price", "desc"),
+    "AdvancedQueries.execute_raw_sql": lambda db: AdvancedQueries.execute_raw_sql(
+        db, "SELECT id, title FROM books WHERE price > :price", {"price": 2900}
+    ),
+    "AdvancedQueries.get_dashboard_data": AdvancedQueries.get_dashboard_data,
+    "AdvancedQueries.get_top_n_per_group": lambda db: AdvancedQueries.get_top_n_per_group(
+        db, select(Book), Book.publisher_id, Book.pages.desc(), n=3
+    ),
+    "AdvancedQueries.get_most_expensive_books_per_genre": AdvancedQueries.get_most_expensive_books_per_genre,
+    "AdvancedQueries.get_latest_books_per_author": AdvancedQueries.get_latest_books_per_author,
+    "AdvancedQueries.get_top_publishers_per_language": AdvancedQueries.get_top_publishers_per_language,
+    "BookCRUD.get_multi_with_genre_names": lambda db: book_crud.get_multi_with_genre_names(db, limit=20),
+    "BookCRUD.get_by_isbn": lambda db: book_crud.get_by_isbn(db, "978-000000007"),
+    "BookCRUD.search_by_title": lambda db: book_crud.search_by_title(db, "0001"),
+    "BookCRUD.get_by_author": lambda db: book_crud.get_by_author(db, 7),
+    "BookCRUD.get_by_genre": lambda db: book_crud.get_by_genre(db, 3),
+    "BookCRUD.get_by_price_range": lambda db: book_crud.get_by_price_range(db, 500, 510),
+    "BookCRUD.get_published_between": lambda db: book_crud.get_published_between(
+        db, date(2001, 1, 1), date(2001, 12, 31)
+    ),
+    "BookCRUD.get_with_relations": lambda db: book_crud.get_with_relations(db, 7),
+    "BookCRUD.advanced_search": lambda db: book_crud.advanced_search(
+        db, language="German", min_price=500, max_price=520
+    ),
+    "BookCRUD.get_by_ids": lambda db: book_crud.get_by_ids(db, [3, 7, 11]),
+    # SQL-путь (без facet_index): страница, COUNT и GROUP BY фасетов
+    "BookCRUD.faceted_search": lambda db: book_crud.faceted_search(
+        db, genre_name="Жанр 3", language="German", max_price=520
+    ),
+}
+
+
+def uncovered_methods() -> List[str]:
+    """Методы AdvancedQueries и поисковые методы BookCRUD без записи в PLAN_TARGETS."""
+    methods = [
+        f"AdvancedQueries.{name}" for name in vars(AdvancedQueries) if not name.startswith("_")
+    ] + [
+        f"BookCRUD.{name}" for name in vars(BookCRUD)
+        if name.startswith(("get_", "search_", "advanced_search"))
+    ]
+    return [name for name in methods if name not in PLAN_TARGETS]
+
+
+# ==================== СНЯТИЕ ПЛАНОВ ====================
+
+@contextmanager
+def capture_statements(engine: Engine) -> Iterator[List[Tuple[str, Any]]]:
+    """
+    Перехватить SELECT-запросы, выполненные движком в блоке.
+
+    Yields:
+        Список (SQL, параметры DBAPI), заполняемый по мере выполнения
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def _sqlite_plan(connection: Connection, sql: str, parameters) -> Plan:
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    depth = {0: -1}
+    plan = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        plan.append("  " * depth[node_id] + detail)
+    return plan
+
+
+def _postgresql_node(node: dict, depth: int, plan: Plan) -> None:
+    label = node["Node Type"]
+    if "Join Type" in node and label in JOIN_NODES:
+        label += f" ({node['Join Type']})"
+    if "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    plan.append("  " * depth + label)
+    for child in node.get("Plans", []):
+        _postgresql_node(child, depth + 1, plan)
+
+
+def _postgresql_plan(connection: Connection, sql: str, parameters, analyze: bool) -> Plan:
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    result = connection.exec_driver_sql(f"EXPLAIN ({options}) {sql}", parameters).scalar()
+    document = json.loads(result) if isinstance(result, str) else result
+    plan = []
+    _postgresql_node(document[0]["Plan"], 0, plan)
+    return plan
+
+
+def explain(engine: Engine, sql: str, parameters=(), analyze: bool = True) -> Plan:
+    """
+    Нормализованный план запроса.
+
+    SQLite: EXPLAIN QUERY PLAN. PostgreSQL: EXPLAIN (ANALYZE, BUFFERS,
+    FORMAT JSON) — запрос выполняется в транзакции, которая откатывается;
+    из плана берутся тип узла, таблица и индекс, без стоимостей и времени.
+
+    Args:
+        engine: Движок
+        sql: SQL-запрос в формате драйвера
+        parameters: Параметры DBAPI
+        analyze: Выполнять ли запрос (только PostgreSQL)
+
+    Returns:
+        Список узлов плана
+    """
+    with engine.connect() as connection:
+        try:
+            if engine.dialect.name == "sqlite":
+                return _sqlite_plan(connection, sql, parameters)
+            if engine.dialect.name == "postgresql":
+                return _postgresql_plan(connection, sql, parameters, analyze)
+            raise ValueError(f"EXPLAIN is not supported for {engine.dialect.name}")
+        finally:
+            connection.rollback()
+
+
+def capture_plans(
+    engine: Engine,
+    targets: Dict[str, Callable[[Session], Any]] = PLAN_TARGETS,
+    analyze: bool = True
+) -> Dict[str, List[Plan]]:
+    """
+    Снять планы всех запросов каждого вызова.
+
+    Args:
+        engine: Движок заполненной базы
+        targets: Вызовы по именам
+        analyze: EXPLAIN ANALYZE на PostgreSQL
+
+    Returns:
+        {имя: [план каждого SELECT]}: первый — основной запрос, остальные
+        упорядочены по тексту SQL (selectinload догружает связи в
+        недетерминированном порядке)
+    """
+    session_factory = sessionmaker(bind=engine)
+    plans = {}
+    for name, target in targets.items():
+        with session_factory() as db:
+            with capture_statements(engine) as statements:
+                target(db)
+        statements[1:] = sorted(statements[1:], key=lambda statement: statement[0])
+        plans[name] = [explain(engine, sql, parameters, analyze) for sql, parameters in statements]
+    return plans
+
+
+# ==================== ПРОВЕРКА РЕГРЕССИЙ ====================
+
+def full_scans(plan: Plan) -> List[str]:
+    """
+    Узлы полного сканирования таблиц.
+
+    В SQLite это и «SCAN t USING INDEX ...»: обход всей таблицы в порядке
+    индекса. Такие обходы законны для сортировки с LIMIT или агрегатов
+    по всей таблице — они остаются в снимке и регрессией не считаются.
+    """
+    scans = []
+    for node in (line.strip() for line in plan):
+        if node.startswith("Seq Scan on "):
+            scans.append(node)
+        elif node.startswith("SCAN ") and not node.startswith(("SCAN CONSTANT ROW", "SCAN (")):
+            scans.append(node)
+    return scans
+
+
+def join_strategy(plan: Plan) -> List[str]:
+    """
+    Стратегия соединения.
+
+    PostgreSQL — узлы соединений; SQLite (всегда вложенные циклы) —
+    порядок и способ доступа (SCAN/SEARCH) к таблицам.
+    """
+    strategy = []
+    for node in (line.strip() for line in plan):
+        if node.startswith(JOIN_NODES):
+            strategy.append(node)
+        elif node.startswith(("SCAN ", "SEARCH ")) and not node.startswith("SCAN CONSTANT ROW"):
+            operation, table = node.split(" ")[:2]
+            strategy.append(f"{operation} {table}")
+    return strategy
+
+
+def compare_plans(expected: Dict[str, List[Plan]], actual: Dict[str, List[Plan]]) -> List[str]:
+    """
+    Сравнить планы со снимком.
+
+    Args:
+        expected: Снимок
+        actual: Текущие планы
+
+    Returns:
+        Описания регрессий (пустой список — регрессий нет)
+    """
+    problems = []
+    for name, plans in actual.items():
+        if name not in expected:
+            problems.append(f"{name}: no snapshot")
+            continue
+        if len(plans) != len(expected[name]):
+            problems.append(
+                f"{name}: {len(plans)} statements instead of {len(expected[name])}"
+            )
+            continue
+        for number, (old, new) in enumerate(zip(expected[name], plans), 1):
+            for scan in full_scans(new):
+                if scan not in full_scans(old):
+                    problems.append(f"{name} #{number}: new full scan: {scan}")
+            if join_strategy(old) != join_strategy(new):
+                problems.append(
+                    f"{name} #{number}: join strategy changed: "
+                    f"{join_strategy(old)} -> {join_strategy(new)}"
+                )
+    return problems
+
+
+def server_version(engine: Engine) -> str:
+    """Версия СУБД: планы разных версий могут законно отличаться."""
+    with engine.connect():
+        version = engine.dialect.server_version_info or ()
+    return f"{engine.dialect.name} {'.'.join(map(str, version))}"
+
+
+def load_snapshot(path: str) -> dict:
+    """
+    Прочитать снимок планов.
+
+    Returns:
+        Словарь version (версия СУБД) и plans ({имя: [план, ...]})
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_snapshot(path: str, plans: Dict[str, List[Plan]], version: str) -> None:
+    """Записать снимок планов вместе с версией СУБД."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "plans": plans}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def seeded_engine(url: str = "sqlite://", books: int = 2000) -> Engine:
+    """
+    Движок с пересозданной схемой, заполненный seed_catalog, со статистикой ANALYZE.
+
+    Args:
+        url: URL пустой базы (по умолчанию — SQLite в памяти)
+        books: Количество книг
+    """
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import StaticPool
+    from app.core.database import Base
+    from app.ingest.synthetic import seed_catalog
+
+    options = {}
+    if url.startswith("sqlite"):
+        # Кэш выражений pysqlite отдаёт планы, снятые до изменения индексов
+        options["connect_args"] = {"cached_statements": 0}
+    if url == "sqlite://":
+        options["poolclass"] = StaticPool
+    engine = create_engine(url, **options)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    seed_catalog(engine, books=books, authors=max(books // 20, 1))
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+    return engine
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Снимки планов запросов")
+    parser.add_argument("--url", default="sqlite://", help="URL пустой базы (схема пересоздаётся)")
+    parser.add_argument("--books", type=int, default=2000)
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--update", metavar="PATH", help="записать снимок")
+    mode.add_argument("--check", metavar="PATH", help="сравнить со снимком")
+    args = parser.parse_args(argv)
+
+    engine = seeded_engine(args.url, args.books)
+    try:
+        plans = capture_plans(engine)
+        version = server_version(engine)
+    finally:
+        engine.dispose()
+
+    if args.update:
+        save_snapshot(args.update, plans, version)
+        print(f"Saved {len(plans)} plans to {args.update}")
+        return 0
+
+    snapshot = load_snapshot(args.check)
+    if snapshot["version"] != version:
+        print(f"Warning: snapshot taken on {snapshot['version']}, running {version}")
+    problems = compare_plans(snapshot["plans"], plans)
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
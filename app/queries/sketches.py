@@ -0,0 +1,567 @@
+"""
+Statistics Sketches
+===================
+Приближённая статистика каталога по потоковым скетчам: t-digest для
+перцентилей цены и страниц, HyperLogLog для числа разных авторов
+
+Скетчи строятся одним проходом по books, обновляются событиями ORM
+(как app.queries.autocomplete) и сохраняются в statistics_sketches;
+statistics() не обращается к таблице books. Скетчи объединяемы
+(merge): наборы, построенные по частям каталога, складываются.
+
+    >>> sketches = CatalogSketches.build(db).attach(SessionLocal)
+    >>> sketches.save(db)
+    >>> AdvancedQueries.get_library_statistics(db, approximate=True)
+    {'total_books': 100000, 'median_price': 1549.6, 'p90_price': 2740.1, ...}
+
+Точность (проверяется в tests/test_sketches.py на точных значениях):
+- перцентили t-digest (compression=200, ~100 центроидов): ошибка по
+  рангу < 0.5%, на хвостах (p1, p99) < 0.2%;
+- HyperLogLog (precision=14, 16 КБ): относительная ошибка в среднем
+  1.04/√2¹⁴ ≈ 0.8%, в тестах < 3%;
+- total_books, avg_price, total_pages — точные суммы.
+
+t-digest и HyperLogLog не умеют удалять значения: после удалений и
+изменений старые значения остаются в скетчах (stale), min/max цены и
+число авторов могут быть завышены. needs_rebuild сообщает, что доля
+таких изменений превысила SKETCH_REBUILD_RATIO. Учитываются и массовые
+операции через Session.execute: DELETE (книги удалённого через
+author_crud.delete автора) и UPDATE книг, в т.ч. ORM bulk UPDATE по
+первичному ключу из WriteBehindBuffer. Событие do_orm_execute выбирает
+затронутые книги до выполнения (для UPDATE — и после).
+"""
+
+import base64
+import json
+import math
+import threading
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import event, inspect, select, true
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.models.book import Book, books_deleted_by
+from app.models.sketch import StatisticsSketch
+
+# Имя набора скетчей каталога в statistics_sketches
+SKETCH_NAME = "library"
+
+# Параметры точности по умолчанию
+TDIGEST_COMPRESSION = 200
+HLL_PRECISION = 14
+
+# Доля удалённых и изменённых книг, после которой скетчи стоит построить заново
+SKETCH_REBUILD_RATIO = 0.1
+
+# Строк за одну выборку при построении
+_BUILD_BATCH = 50000
+
+# Поля книги, которые отслеживают скетчи
+_TRACKED_FIELDS = ("price", "pages", "author_id")
+
+
+def hash_ints(values) -> np.ndarray:
+    """64-битные хеши целых чисел (splitmix64, векторно)."""
+    x = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class TDigest:
+    """
+    Объединяемый t-digest (вариант со слиянием буфера) на NumPy.
+
+    Значения копятся в буфере и сжимаются в центроиды: размер центроида
+    ограничен функцией масштаба k₁(q) = δ/2π · asin(2q − 1), поэтому у
+    хвостов центроиды мелкие, а перцентили p1/p99 точнее медианы.
+
+    Attributes:
+        compression: δ; центроидов порядка δ/2, точность растёт с δ
+        means: Средние центроидов (по возрастанию)
+        weights: Веса центроидов
+        min, max: Наименьшее и наибольшее добавленное значение
+    """
+
+    def __init__(self, compression: float = TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: List[np.ndarray] = []
+        self._buffered = 0
+
+    def __len__(self) -> int:
+        return int(self.weights.sum()) + self._buffered
+
+    def add(self, values) -> None:
+        """Добавить значения (NaN и None пропускаются)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._buffer.append(values)
+        self._buffered += len(values)
+        if self._buffered >= 50 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        """Добавить все значения другого t-digest."""
+        other._compress()
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(other.means, other.weights)
+
+    def _compress(self, means: np.ndarray = None, weights: np.ndarray = None) -> None:
+        """Слить буфер (и переданные центроиды) с центроидами."""
+        if not self._buffered and means is None:
+            return
+        means = np.concatenate([self.means, *self._buffer, *([] if means is None else [means])])
+        weights = np.concatenate([
+            self.weights, np.ones(self._buffered), *([] if weights is None else [weights])
+        ])
+        self._buffer, self._buffered = [], 0
+        if not len(means):
+            return
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        # Точка попадает в центроид по k₁ левой границы своего ранга:
+        # внутри центроида k₁ меняется меньше чем на 1
+        q = (np.cumsum(weights) - weights) / weights.sum()
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        cluster = np.floor(k - k[0]).astype(np.int64)
+        cluster_weights = np.bincount(cluster, weights=weights)
+        cluster_sums = np.bincount(cluster, weights=weights * means)
+        used = cluster_weights > 0
+        self.weights = cluster_weights[used]
+        self.means = cluster_sums[used] / self.weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Оценка квантиля.
+
+        Args:
+            q: Уровень от 0 до 1
+
+        Returns:
+            Значение или None для пустого t-digest
+        """
+        self._compress()
+        if not len(self.means):
+            return None
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(
+            q * total,
+            np.concatenate([[0], centers, [total]]),
+            np.concatenate([[self.min], self.means, [self.max]])
+        ))
+
+    def to_dict(self) -> dict:
+        self._compress()
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.min if self.means.size else None,
+            "max": self.max if self.means.size else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TDigest":
+        digest = cls(data["compression"])
+        digest.means = np.asarray(data["means"], dtype=np.float64)
+        digest.weights = np.asarray(data["weights"], dtype=np.float64)
+        if data["min"] is not None:
+            digest.min, digest.max = data["min"], data["max"]
+        return digest
+
+
+class HyperLogLog:
+    """
+    HyperLogLog на NumPy: число различных значений по 2^precision
+    регистрам (по байту), относительная ошибка ≈ 1.04/√(2^precision).
+
+    Attributes:
+        precision: Битов хеша на номер регистра (11..18)
+        registers: Регистры (максимальный ранг хеша)
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        # Остаток хеша (64 - precision бит) должен точно помещаться в float64
+        if not 11 <= precision <= 18:
+            raise ValueError("precision must be between 11 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values) -> None:
+        """Добавить целые значения (например, id)."""
+        self.add_hashes(hash_ints(values))
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Добавить значения по их 64-битным хешам."""
+        if not len(hashes):
+            return
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Ранг — позиция первой единицы остатка; frexp даёт длину в битах точно
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        np.maximum.at(self.registers, index, (rest_bits - bit_length + 1).astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Объединить с другим HyperLogLog той же точности."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        """Оценка числа различных значений."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Малые мощности: линейный подсчёт по пустым регистрам
+            estimate = m * math.log(m / zeros)
+        return float(estimate)
+
+    @property
+    def relative_error(self) -> float:
+        """Стандартная относительная ошибка оценки."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def to_dict(self) -> dict:
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(self.registers.tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HyperLogLog":
+        hll = cls(data["precision"])
+        hll.registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return hll
+
+
+class CatalogSketches:
+    """
+    Скетчи статистики книг для get_library_statistics(approximate=True).
+
+    Attributes:
+        prices: t-digest цен
+        pages: t-digest количества страниц
+        authors: HyperLogLog id авторов книг
+        books: Книг (точно)
+        price_count, price_sum: Книг с ценой и сумма цен (точно)
+        pages_sum: Сумма страниц (точно)
+        stale: Удалённых и изменённых книг с момента построения
+    """
+
+    def __init__(self, compression: float = TDIGEST_COMPRESSION, precision: int = HLL_PRECISION):
+        self.prices = TDigest(compression)
+        self.pages = TDigest(compression)
+        self.authors = HyperLogLog(precision)
+        self.books = 0
+        self.price_count = 0
+        self.price_sum = 0.0
+        self.pages_sum = 0
+        self.stale = 0
+        self._lock = threading.Lock()
+        self._targets: list = []
+        self._info_key = f"sketches_{id(self)}"
+
+    def __repr__(self):
+        return f"<CatalogSketches(books={self.books}, stale={self.stale})>"
+
+    # ==================== ПОСТРОЕНИЕ И ОБЪЕДИНЕНИЕ ====================
+
+    @classmethod
+    def build(cls, db: Session, **options) -> "CatalogSketches":
+        """
+        Построить скетчи одним проходом по books (Core, порциями).
+
+        Args:
+            db: Сессия базы данных
+            **options: compression, precision
+
+        Returns:
+            Новый набор скетчей
+        """
+        sketches = cls(**options)
+        result = db.connection().execute(
+            select(Book.price, Book.pages, Book.author_id).execution_options(yield_per=_BUILD_BATCH)
+        )
+        for part in result.partitions():
+            # Row -> tuple: у Row numpy ищет атрибуты протокола массива (медленно)
+            columns = np.array([tuple(row) for row in part], dtype=np.float64)
+            sketches.add_books(columns[:, 0], columns[:, 1], columns[:, 2])
+        return sketches
+
+    def add_books(self, prices, pages, author_ids) -> None:
+        """
+        Учесть новые книги (массивы одной длины; NaN — нет значения).
+
+        Args:
+            prices: Цены
+            pages: Количество страниц
+            author_ids: id авторов
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        pages = np.asarray(pages, dtype=np.float64)
+        author_ids = np.asarray(author_ids, dtype=np.float64)
+        self.books += len(prices)
+        self.prices.add(prices)
+        self.pages.add(pages)
+        self.authors.add(author_ids[~np.isnan(author_ids)].astype(np.int64))
+        self.price_count += int(np.count_nonzero(~np.isnan(prices)))
+        self.price_sum += float(np.nansum(prices))
+        self.pages_sum += int(np.nansum(pages))
+
+    def merge(self, other: "CatalogSketches") -> None:
+        """Добавить скетчи другой части каталога."""
+        self.prices.merge(other.prices)
+        self.pages.merge(other.pages)
+        self.authors.merge(other.authors)
+        self.books += other.books
+        self.price_count += other.price_count
+        self.price_sum += other.price_sum
+        self.pages_sum += other.pages_sum
+        self.stale += other.stale
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """Доля удалённых и изменённых книг превысила SKETCH_REBUILD_RATIO."""
+        return self.stale > SKETCH_REBUILD_RATIO * max(self.books, 1)
+
+    # ==================== СТАТИСТИКА ====================
+
+    def statistics(self) -> dict:
+        """
+        Статистика в формате AdvancedQueries.get_library_statistics
+        и перцентили цены и страниц.
+
+        Returns:
+            Словарь со статистикой
+        """
+        def rounded(value: Optional[float]) -> float:
+            return round(value, 2) if value is not None else 0.0
+
+        with self._lock:
+            return {
+                "total_books": self.books,
+                "total_authors": round(self.authors.estimate()) if self.books else 0,
+                "avg_price": round(self.price_sum / self.price_count, 2) if self.price_count else 0.0,
+                "max_price": rounded(self.prices.quantile(1)),
+                "min_price": rounded(self.prices.quantile(0)),
+                "total_pages": self.pages_sum,
+                "median_price": rounded(self.prices.quantile(0.5)),
+                "p90_price": rounded(self.prices.quantile(0.9)),
+                "median_pages": rounded(self.pages.quantile(0.5)),
+                "p90_pages": rounded(self.pages.quantile(0.9)),
+            }
+
+    # ==================== СОХРАНЕНИЕ ====================
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "prices": self.prices.to_dict(),
+                "pages": self.pages.to_dict(),
+                "authors": self.authors.to_dict(),
+                "books": self.books,
+                "price_count": self.price_count,
+                "price_sum": self.price_sum,
+                "pages_sum": self.pages_sum,
+                "stale": self.stale,
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CatalogSketches":
+        sketches = cls()
+        sketches.prices = TDigest.from_dict(data["prices"])
+        sketches.pages = TDigest.from_dict(data["pages"])
+        sketches.authors = HyperLogLog.from_dict(data["authors"])
+        for key in ("books", "price_count", "price_sum", "pages_sum", "stale"):
+            setattr(sketches, key, data[key])
+        return sketches
+
+    def save(self, db: Session, name: str = SKETCH_NAME) -> None:
+        """Сохранить скетчи в statistics_sketches (и закоммитить)."""
+        db.merge(StatisticsSketch(name=name, state=json.dumps(self.to_dict())))
+        db.commit()
+
+    @classmethod
+    def load(cls, db: Session, name: str = SKETCH_NAME) -> Optional["CatalogSketches"]:
+        """
+        Прочитать сохранённые скетчи.
+
+        Returns:
+            CatalogSketches или None, если скетчи не сохранялись
+        """
+        state = db.scalar(select(StatisticsSketch.state).where(StatisticsSketch.name == name))
+        return cls.from_dict(json.loads(state)) if state is not None else None
+
+    # ==================== СОБЫТИЯ ORM ====================
+
+    def attach(self, target=Session) -> "CatalogSketches":
+        """
+        Обновлять скетчи по изменениям книг через события сессий.
+
+        Изменения flush копятся в Session.info и применяются после
+        коммита; откат их сбрасывает.
+
+        Args:
+            target: Класс Session, sessionmaker или отдельная сессия
+
+        Returns:
+            self
+        """
+        for name, handler in (
+            ("before_flush", self._before_flush),
+            ("after_flush", self._after_flush),
+            ("do_orm_execute", self._do_orm_execute),
+            ("after_commit", self._after_commit),
+            ("after_rollback", self._after_rollback),
+        ):
+            event.listen(target, name, handler)
+            self._targets.append((target, name, handler))
+        return self
+
+    def detach(self) -> None:
+        """Отключить события, подключённые attach()."""
+        for target, name, handler in self._targets:
+            event.remove(target, name, handler)
+        self._targets.clear()
+
+    def _before_flush(self, session: Session, flush_context, instances) -> None:
+        """
+        Загрузить из базы прежние значения книг, которых нет в памяти.
+
+        После коммита атрибуты истекают: присваивание не загружает старое
+        значение (history.deleted пуст), у удаляемой книги полей нет в
+        __dict__. После flush в базе уже новые значения — читаем до него.
+        """
+        ids = []
+        for obj in session.deleted:
+            if isinstance(obj, Book) and any(field not in obj.__dict__ for field in _TRACKED_FIELDS):
+                ids.append(inspect(obj).identity[0])
+        for obj in session.dirty:
+            if not isinstance(obj, Book) or inspect(obj).identity is None:
+                continue
+            histories = [inspect(obj).attrs[field].history for field in _TRACKED_FIELDS]
+            if any(history.added and not history.deleted for history in histories):
+                ids.append(inspect(obj).identity[0])
+        if not ids:
+            return
+        columns = [getattr(Book, field) for field in _TRACKED_FIELDS]
+        rows = session.connection().execute(select(Book.id, *columns).where(Book.id.in_(ids)))
+        pending = session.info.setdefault(self._info_key, {"added": [], "removed": []})
+        pending.setdefault("loaded", {}).update((row[0], tuple(row[1:])) for row in rows)
+
+    def _after_flush(self, session: Session, flush_context) -> None:
+        pending = session.info.setdefault(self._info_key, {"added": [], "removed": []})
+        loaded = pending.pop("loaded", {})
+        for obj in session.new:
+            if isinstance(obj, Book):
+                pending["added"].append(tuple(getattr(obj, field) for field in _TRACKED_FIELDS))
+        for obj in session.deleted:
+            if not isinstance(obj, Book):
+                continue
+            old = loaded.get(inspect(obj).identity[0])
+            if old is None:
+                old = tuple(obj.__dict__.get(field) for field in _TRACKED_FIELDS)
+            pending["removed"].append(old)
+        for obj in session.dirty:
+            if not isinstance(obj, Book):
+                continue
+            state = inspect(obj)
+            histories = [state.attrs[field].history for field in _TRACKED_FIELDS]
+            if not any(history.has_changes() for history in histories):
+                continue
+            # Изменение — удаление старых значений и добавление новых
+            # (неизменные поля — None с обеих сторон, сумма не меняется)
+            committed = loaded.get(state.identity[0])
+            old = tuple(
+                history.deleted[0] if history.deleted
+                else committed[i] if committed is not None and history.added
+                else None
+                for i, history in enumerate(histories)
+            )
+            new = tuple(history.added[0] if history.added else None for history in histories)
+            pending["removed"].append(old)
+            pending["added"].append(new)
+
+    def _do_orm_execute(self, orm_execute_state: ORMExecuteState):
+        """Записать книги, которые удалит массовый DELETE (в т.ч. каскадом от автора) или изменит UPDATE."""
+        if orm_execute_state.is_update:
+            return self._record_update(orm_execute_state)
+        if not orm_execute_state.is_delete:
+            return
+        condition = books_deleted_by(orm_execute_state.statement)
+        if condition is None:
+            return
+        session = orm_execute_state.session
+        columns = [getattr(Book, field) for field in _TRACKED_FIELDS]
+        removed = session.execute(select(*columns).where(condition)).tuples().all()
+        if removed:
+            pending = session.info.setdefault(self._info_key, {"added": [], "removed": []})
+            pending["removed"].extend(removed)
+
+    def _record_update(self, orm_execute_state: ORMExecuteState):
+        """
+        Выполнить массовый UPDATE книг, записав прежние и новые значения.
+
+        ORM bulk UPDATE по первичному ключу (update(Book) со списком строк,
+        как в WriteBehindBuffer.flush) затрагивает книги из параметров, а
+        UPDATE ... WHERE — книги по условию. Значения выбираются до и после
+        выполнения; учитываются только книги, у которых они изменились.
+        """
+        statement = orm_execute_state.statement
+        if statement.table.name != Book.__tablename__:
+            return None
+        if orm_execute_state.is_executemany:
+            params = orm_execute_state.parameters
+            if not any(field in row for row in params for field in _TRACKED_FIELDS):
+                return None
+            condition = Book.id.in_([row["id"] for row in params])
+        else:
+            condition = statement.whereclause if statement.whereclause is not None else true()
+
+        session = orm_execute_state.session
+        columns = [getattr(Book, field) for field in _TRACKED_FIELDS]
+        connection = session.connection()
+        rows = connection.execute(select(Book.id, *columns).where(condition))
+        before = {row[0]: tuple(row[1:]) for row in rows}
+        if not before:
+            return None
+        result = orm_execute_state.invoke_statement()
+        after = connection.execute(select(Book.id, *columns).where(Book.id.in_(list(before))))
+        changed = [(before[row[0]], tuple(row[1:])) for row in after if tuple(row[1:]) != before[row[0]]]
+        if changed:
+            pending = session.info.setdefault(self._info_key, {"added": [], "removed": []})
+            pending["removed"].extend(old for old, _ in changed)
+            pending["added"].extend(new for _, new in changed)
+        return result
+
+    def _after_commit(self, session: Session) -> None:
+        pending = session.info.pop(self._info_key, None)
+        if not pending:
+            return
+        added = np.array(pending["added"] or np.empty((0, 3)), dtype=np.float64).reshape(-1, 3)
+        removed = np.array(pending["removed"] or np.empty((0, 3)), dtype=np.float64).reshape(-1, 3)
+        with self._lock:
+            self.add_books(added[:, 0], added[:, 1], added[:, 2])
+            self.books -= len(removed)
+            self.price_count -= int(np.count_nonzero(~np.isnan(removed[:, 0])))
+            self.price_sum -= float(np.nansum(removed[:, 0]))
+            self.pages_sum -= int(np.nansum(removed[:, 1]))
+            self.stale += len(removed)
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(self._info_key, None)
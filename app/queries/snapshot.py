@@ -0,0 +1,348 @@
+"""
+Book Snapshot
+=============
+Колоночный снимок таблицы книг в памяти (NumPy) для векторных расчётов
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.book import Book
+from app.queries.advanced import PRICE_CATEGORY_BOUNDS, PRICE_CATEGORY_TOP
+
+
+# Колонки, которые выгружаются из таблицы books
+_SNAPSHOT_COLUMNS = (
+    Book.id,
+    Book.price,
+    Book.pages,
+    Book.language,
+    Book.author_id,
+    Book.updated_at,
+)
+
+# Числовые колонки, доступные для агрегатов, гистограмм и перцентилей
+NUMERIC_COLUMNS = ("price", "pages")
+
+# Ключи группировки для aggregate_by
+GROUP_KEYS = ("author_id", "language")
+
+
+class BookSnapshot:
+    """
+    Колоночный снимок книг: по одному массиву NumPy на колонку.
+
+    Используется для симуляций переоценки и аналитики, где построчные
+    SQL-запросы (CASE на каждую книгу, повторные MIN/MAX/AVG) слишком дороги.
+    Все массивы выровнены по позиции и отсортированы по id книги.
+
+    NULL в price/pages хранится как NaN, NULL в language — как код -1.
+
+    Attributes:
+        ids: ID книг (int64, по возрастанию)
+        price: Цены (float64)
+        pages: Количество страниц (float64)
+        language_codes: Коды языков (int32), см. languages
+        author_ids: ID авторов (int64)
+        languages: Справочник языков; код — индекс в этом списке
+        synced_at: Максимальный updated_at среди загруженных строк
+
+    Example:
+        >>> snapshot = BookSnapshot.load(db)
+        >>> snapshot.price_category_counts()
+        {'Бюджетная': 12, 'Средняя': 40, 'Дорогая': 31, 'Премиум': 5}
+        >>> snapshot.refresh(db)  # подтянуть изменения по updated_at
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.price = np.empty(0, dtype=np.float64)
+        self.pages = np.empty(0, dtype=np.float64)
+        self.language_codes = np.empty(0, dtype=np.int32)
+        self.author_ids = np.empty(0, dtype=np.int64)
+        self.languages: List[str] = []
+        self.synced_at: Optional[datetime] = None
+        self._language_index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __repr__(self):
+        return f"<BookSnapshot(books={len(self)}, synced_at={self.synced_at})>"
+
+    # ==================== ЗАГРУЗКА ====================
+
+    @classmethod
+    def load(cls, db: Session, chunk_size: int = 10_000) -> "BookSnapshot":
+        """
+        Построить снимок по всей таблице книг.
+
+        Строки читаются порциями (yield_per) только по нужным колонкам,
+        без создания ORM-объектов.
+
+        Args:
+            db: Сессия базы данных
+            chunk_size: Размер порции при чтении
+
+        Returns:
+            Новый снимок
+        """
+        snapshot = cls()
+        rows = db.query(*_SNAPSHOT_COLUMNS).order_by(Book.id).yield_per(chunk_size)
+        snapshot._upsert_rows(rows)
+        return snapshot
+
+    def refresh(self, db: Session, chunk_size: int = 10_000) -> int:
+        """
+        Инкрементально обновить снимок по updated_at.
+
+        Загружаются только строки, изменённые с момента последней
+        синхронизации; новые книги добавляются, изменённые — перезаписываются.
+        Удалённые книги этим методом не обнаруживаются — для них нужен
+        полный load().
+
+        Args:
+            db: Сессия базы данных
+            chunk_size: Размер порции при чтении
+
+        Returns:
+            Количество применённых строк
+        """
+        if self.synced_at is None:
+            fresh = self.load(db, chunk_size=chunk_size)
+            self.__dict__.update(fresh.__dict__)
+            return len(self)
+
+        # >= а не >, чтобы не потерять строки с тем же updated_at;
+        # повторное применение строки идемпотентно
+        rows = db.query(*_SNAPSHOT_COLUMNS).filter(
+            Book.updated_at >= self.synced_at
+        ).order_by(Book.id).yield_per(chunk_size)
+        return self._upsert_rows(rows)
+
+    def _language_code(self, language: Optional[str]) -> int:
+        """Получить код языка, регистрируя новые значения."""
+        if language is None:
+            return -1
+        code = self._language_index.get(language)
+        if code is None:
+            code = len(self.languages)
+            self.languages.append(language)
+            self._language_index[language] = code
+        return code
+
+    def _upsert_rows(self, rows: Iterable[tuple]) -> int:
+        """Вставить или перезаписать строки (id, price, pages, language, author_id, updated_at)."""
+        ids, price, pages, codes, author_ids = [], [], [], [], []
+        synced_at = self.synced_at
+
+        for row in rows:
+            ids.append(row.id)
+            price.append(np.nan if row.price is None else row.price)
+            pages.append(np.nan if row.pages is None else row.pages)
+            codes.append(self._language_code(row.language))
+            author_ids.append(row.author_id)
+            if row.updated_at is not None and (synced_at is None or row.updated_at > synced_at):
+                synced_at = row.updated_at
+
+        if not ids:
+            return 0
+
+        new_ids = np.asarray(ids, dtype=np.int64)
+        new_columns = (
+            np.asarray(price, dtype=np.float64),
+            np.asarray(pages, dtype=np.float64),
+            np.asarray(codes, dtype=np.int32),
+            np.asarray(author_ids, dtype=np.int64),
+        )
+
+        # Позиции уже известных id в отсортированном массиве
+        if len(self.ids):
+            positions = np.minimum(np.searchsorted(self.ids, new_ids), len(self.ids) - 1)
+            known = self.ids[positions] == new_ids
+        else:
+            positions = np.zeros(len(new_ids), dtype=np.intp)
+            known = np.zeros(len(new_ids), dtype=bool)
+
+        columns = [self.price, self.pages, self.language_codes, self.author_ids]
+        for column, values in zip(columns, new_columns):
+            column[positions[known]] = values[known]
+
+        added = ~known
+        if added.any():
+            merged_ids = np.concatenate([self.ids, new_ids[added]])
+            order = np.argsort(merged_ids, kind="stable")
+            self.ids = merged_ids[order]
+            self.price, self.pages, self.language_codes, self.author_ids = (
+                np.concatenate([column, values[added]])[order]
+                for column, values in zip(columns, new_columns)
+            )
+
+        self.synced_at = synced_at
+        return len(new_ids)
+
+    # ==================== ЦЕНОВЫЕ КАТЕГОРИИ ====================
+
+    @staticmethod
+    def category_labels() -> Tuple[str, ...]:
+        """Названия ценовых категорий в порядке их кодов."""
+        return tuple(name for _, name in PRICE_CATEGORY_BOUNDS) + (PRICE_CATEGORY_TOP,)
+
+    def price_categories(self, price: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Векторная категоризация цен — аналог CASE из
+        AdvancedQueries.get_books_with_price_category.
+
+        Args:
+            price: Массив цен для симуляции (по умолчанию — текущие цены)
+
+        Returns:
+            Массив кодов категорий (индексы в category_labels())
+        """
+        price = self.price if price is None else np.asarray(price, dtype=np.float64)
+        bounds = np.array([bound for bound, _ in PRICE_CATEGORY_BOUNDS], dtype=np.float64)
+        # side="right": цена, равная границе, попадает в следующую категорию (price < bound).
+        # NaN сортируется в конец и, как и в SQL CASE, попадает в последнюю категорию.
+        return np.searchsorted(bounds, price, side="right")
+
+    def price_category_counts(self, price: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """
+        Количество книг в каждой ценовой категории.
+
+        Args:
+            price: Массив цен для симуляции (по умолчанию — текущие цены)
+
+        Returns:
+            Словарь {категория: количество}
+        """
+        labels = self.category_labels()
+        counts = np.bincount(self.price_categories(price), minlength=len(labels))
+        return {label: int(count) for label, count in zip(labels, counts)}
+
+    def reprice(self, multiplier: float = 1.0, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Смоделировать изменение цен без записи в базу.
+
+        Args:
+            multiplier: Множитель цены
+            mask: Булев массив книг, к которым применяется множитель
+                (по умолчанию — ко всем)
+
+        Returns:
+            Новый массив цен (снимок не изменяется)
+        """
+        if mask is None:
+            return self.price * multiplier
+        return np.where(mask, self.price * multiplier, self.price)
+
+    # ==================== СТАТИСТИКА ====================
+
+    def _column(self, column: str) -> np.ndarray:
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"Column '{column}' is not a numeric snapshot column")
+        return getattr(self, column)
+
+    def statistics(self) -> dict:
+        """
+        Общая статистика в формате AdvancedQueries.get_library_statistics.
+
+        Returns:
+            Словарь со статистикой
+        """
+        price = self.price[~np.isnan(self.price)]
+        has_price = len(price) > 0
+        return {
+            "total_books": len(self),
+            "total_authors": int(len(np.unique(self.author_ids))),
+            "avg_price": round(float(price.mean()), 2) if has_price else 0.0,
+            "max_price": float(price.max()) if has_price else 0.0,
+            "min_price": float(price.min()) if has_price else 0.0,
+            "total_pages": int(np.nansum(self.pages)),
+        }
+
+    def histogram(
+        self,
+        column: str = "price",
+        bins: Union[int, Sequence[float]] = 10
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Гистограмма числовой колонки (NULL игнорируются).
+
+        Args:
+            column: Колонка (price, pages)
+            bins: Количество корзин или их границы
+
+        Returns:
+            Кортеж (counts, edges) как в numpy.histogram
+        """
+        values = self._column(column)
+        return np.histogram(values[~np.isnan(values)], bins=bins)
+
+    def percentiles(
+        self,
+        column: str = "price",
+        q: Sequence[float] = (50, 90, 99)
+    ) -> Dict[float, float]:
+        """
+        Перцентили числовой колонки (NULL игнорируются).
+
+        Args:
+            column: Колонка (price, pages)
+            q: Перцентили в диапазоне 0..100
+
+        Returns:
+            Словарь {перцентиль: значение}
+        """
+        values = self._column(column)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return {p: 0.0 for p in q}
+        return {p: float(v) for p, v in zip(q, np.percentile(values, q))}
+
+    def aggregate_by(self, key: str = "author_id", column: str = "price") -> Dict[object, dict]:
+        """
+        Агрегаты числовой колонки по группам — аналог GROUP BY.
+
+        Args:
+            key: Ключ группировки (author_id, language)
+            column: Агрегируемая колонка (price, pages)
+
+        Returns:
+            Словарь {ключ: {"count", "sum", "avg", "min", "max"}};
+            count — число книг в группе, остальные агрегаты считаются без NULL
+        """
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Cannot group snapshot by '{key}'")
+
+        values = self._column(column)
+        groups = self.author_ids if key == "author_id" else self.language_codes
+        keys, inverse, counts = np.unique(groups, return_inverse=True, return_counts=True)
+
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        sums = np.bincount(inverse, weights=filled, minlength=len(keys))
+        non_null = np.bincount(inverse, weights=present, minlength=len(keys))
+
+        mins = np.full(len(keys), np.inf)
+        maxs = np.full(len(keys), -np.inf)
+        np.minimum.at(mins, inverse[present], values[present])
+        np.maximum.at(maxs, inverse[present], values[present])
+
+        result = {}
+        for i, group in enumerate(keys):
+            if key == "language":
+                group = self.languages[group] if group >= 0 else None
+            else:
+                group = int(group)
+            has_values = non_null[i] > 0
+            result[group] = {
+                "count": int(counts[i]),
+                "sum": float(sums[i]),
+                "avg": round(float(sums[i] / non_null[i]), 2) if has_values else 0.0,
+                "min": float(mins[i]) if has_values else 0.0,
+                "max": float(maxs[i]) if has_values else 0.0,
+            }
+        return result
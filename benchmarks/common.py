@@ -0,0 +1,56 @@
+"""
+Benchmark Helpers
+=================
+Общие функции бенчмарков: замер времени, планы запросов
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def measure(fn: Callable[[], object], repeat: int = 20) -> float:
+    """Медианное время вызова, миллисекунды."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+@contextmanager
+def captured_sql(engine: Engine) -> Iterator[List[Tuple[str, object]]]:
+    """Собрать (SQL, параметры) запросов, выполненных в блоке."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def explain(engine: Engine, statement: str, parameters=()) -> str:
+    """План запроса: EXPLAIN QUERY PLAN на SQLite, EXPLAIN на PostgreSQL."""
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+    return "\n".join(str(row[-1]) if engine.dialect.name == "sqlite" else row[0] for row in rows)
+
+
+def print_table(rows: List[Tuple], headers: Tuple) -> None:
+    """Напечатать простую текстовую таблицу."""
+    widths = [max(len(str(v)) for v in column) for column in zip(headers, *rows)]
+    line = "  ".join(f"{{:<{w}}}" for w in widths)
+    print(line.format(*headers))
+    print(line.format(*("-" * w for w in widths)))
+    for row in rows:
+        print(line.format(*row))
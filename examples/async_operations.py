@@ -6,6 +6,7 @@ Example: Async Operations
 
 import sys
 import asyncio
+from functools import partial
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -16,7 +17,8 @@ from app.crud.async_crud import (
     async_author_crud,
     async_book_crud,
     async_genre_crud,
-    async_publisher_crud
+    async_publisher_crud,
+    run_concurrently
 )
 
 
@@ -116,18 +118,21 @@ async def run_example():
         print("⚡ Параллельные асинхронные операции")
         print("-" * 40)
 
-        # Создаём несколько авторов параллельно
-        tasks = [
-            async_author_crud.create(db, name=f"Автор {i}", country="Россия")
-            for i in range(1, 4)
-        ]
-
-        # Ждём завершения всех задач
-        # Примечание: в реальном приложении лучше использовать отдельные сессии
-        # для параллельных операций
-        for task in tasks:
-            new_author = await task
-            print(f"  ✓ Создан: {new_author.name}")
+        # Создаём несколько авторов параллельно: каждая операция получает
+        # собственную сессию (одну AsyncSession нельзя делить между задачами),
+        # число одновременных операций ограничено размером пула
+        report = await run_concurrently(
+            [
+                partial(async_author_crud.create, name=f"Автор {i}", country="Россия")
+                for i in range(1, 4)
+            ],
+            timeout=5
+        )
+        for new_author in report["results"]:
+            if new_author is not None:
+                print(f"  ✓ Создан: {new_author.name}")
+        for index, error in report["errors"].items():
+            print(f"  ✗ Операция {index}: {error}")
 
         # ==================== COUNT ====================
         print("\n📊 Статистика")
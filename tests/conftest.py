@@ -1,116 +1,200 @@
 """
-    )
-        language="Russian"
-        publisher_id=sample_publisher.id,
-        author_id=sample_author.id,
-        publication_date=date(2023, 1, 1),
-        price=500.0,
-        pages=300,
-        description="Описание тестовой книги",
-        isbn="978-5-00000-000-0",
-        title="Тестовая Книга",
-        db,
-    return book_crud.create(
-    
-    from datetime import date
-    from app.crud import book_crud
-    """Фикстура для создания тестовой книги."""
-def sample_book(db, sample_author, sample_publisher):
-@pytest.fixture
+Tests Configuration
+===================
+Настройка pytest для тестов
+"""
 
+import sys
+from pathlib import Path
 
-    )
-        description="Описание тестового жанра"
-        name="Тестовый Жанр",
-        db,
-    return genre_crud.create(
-    
-    from app.crud import genre_crud
-    """Фикстура для создания тестового жанра."""
-def sample_genre(db):
-@pytest.fixture
+# Добавляем корень проекта в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base, enable_sqlite_foreign_keys
 
-    )
-        website="https://test.com"
-        address="Москва",
-        name="Тестовое Издательство",
-        db,
-    return publisher_crud.create(
-    
-    from app.crud import publisher_crud
-    """Фикстура для создания тестового издательства."""
-def sample_publisher(db):
-@pytest.fixture
 
+# Тестовая база данных в памяти
+TEST_DATABASE_URL = "sqlite:///:memory:"
 
-    )
-        country="Россия"
-        birth_date=date(1990, 1, 1),
-        bio="Биография тестового автора",
-        name="Тестовый Автор",
-        db,
-    return author_crud.create(
-    
-    from datetime import date
-    from app.crud import author_crud
-    """Фикстура для создания тестового автора."""
-def sample_author(db):
-@pytest.fixture
+test_engine = create_engine(
+    TEST_DATABASE_URL,
+    connect_args={"check_same_thread": False}
+)
+enable_sqlite_foreign_keys(test_engine)
 
+TestSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=test_engine
+)
 
-        Base.metadata.drop_all(bind=test_engine)
-        # Удаляем таблицы после теста
-        session.close()
-    finally:
-        yield session
-    try:
-    
-    session = TestSessionLocal()
-    # Создаём сессию
+
+@pytest.fixture(scope="function")
+def db():
+    """
+    Фикстура для создания тестовой сессии базы данных.
+
+    Создаёт все таблицы перед тестом и удаляет после.
+    """
+    # Импортируем модели, чтобы они зарегистрировались
+    from app.models import Author, Book, Genre, Publisher  # noqa: F401
     
-    Base.metadata.create_all(bind=test_engine)
     # Создаём таблицы
+    Base.metadata.create_all(bind=test_engine)
     
-    from app.models import Author, Book, Genre, Publisher  # noqa: F401
-    # Импортируем модели, чтобы они зарегистрировались
+    # Создаём сессию
+    session = TestSessionLocal()
+    
+    try:
+        yield session
+    finally:
+        session.close()
+        # Удаляем таблицы после теста
+        Base.metadata.drop_all(bind=test_engine)
+
+
+@pytest_asyncio.fixture
+async def async_engine(tmp_path):
     """
-    Создаёт все таблицы перед тестом и удаляет после.
+    Асинхронный движок над временным файлом SQLite.
 
-    Фикстура для создания тестовой сессии базы данных.
+    Файл, а не :memory:, чтобы несколько сессий видели одну базу.
     """
-def db():
-@pytest.fixture(scope="function")
+    from app.models import Author, Book, Genre, Publisher  # noqa: F401
 
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async_test.db'}")
+    enable_sqlite_foreign_keys(engine.sync_engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
 
-)
-    bind=test_engine
-    autoflush=False,
-    autocommit=False,
-TestSessionLocal = sessionmaker(
 
-)
-    connect_args={"check_same_thread": False}
-    TEST_DATABASE_URL,
-test_engine = create_engine(
+@pytest.fixture
+def async_session_factory(async_engine):
+    """Фабрика асинхронных сессий тестовой базы."""
+    return async_sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False
+    )
 
-TEST_DATABASE_URL = "sqlite:///:memory:"
-# Тестовая база данных в памяти
 
+@pytest_asyncio.fixture
+async def async_db(async_session_factory):
+    """Асинхронная сессия тестовой базы."""
+    async with async_session_factory() as session:
+        yield session
 
-from app.core.database import Base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
-import pytest
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-# Добавляем корень проекта в PYTHONPATH
+@pytest.fixture
+def sample_author(db):
+    """Фикстура для создания тестового автора."""
+    from app.crud import author_crud
+    from datetime import date
+    
+    return author_crud.create(
+        db,
+        name="Тестовый Автор",
+        bio="Биография тестового автора",
+        birth_date=date(1990, 1, 1),
+        country="Россия"
+    )
 
-from pathlib import Path
-import sys
 
-"""
-Настройка pytest для тестов
-===================
-Tests Configuration
+@pytest.fixture
+def sample_publisher(db):
+    """Фикстура для создания тестового издательства."""
+    from app.crud import publisher_crud
+    
+    return publisher_crud.create(
+        db,
+        name="Тестовое Издательство",
+        address="Москва",
+        website="https://test.com"
+    )
+
+
+@pytest.fixture
+def sample_genre(db):
+    """Фикстура для создания тестового жанра."""
+    from app.crud import genre_crud
+    
+    return genre_crud.create(
+        db,
+        name="Тестовый Жанр",
+        description="Описание тестового жанра"
+    )
+
+
+@pytest.fixture
+def sample_book(db, sample_author, sample_publisher):
+    """Фикстура для создания тестовой книги."""
+    from app.crud import book_crud
+    from datetime import date
+    
+    return book_crud.create(
+        db,
+        title="Тестовая Книга",
+        isbn="978-5-00000-000-0",
+        description="Описание тестовой книги",
+        pages=300,
+        price=500.0,
+        publication_date=date(2023, 1, 1),
+        author_id=sample_author.id,
+        publisher_id=sample_publisher.id,
+        language="Russian"
+    )
+
+
+@pytest.fixture
+def populated_db(db):
+    """Фикстура с заполненной базой данных."""
+    from app.crud import author_crud, book_crud, genre_crud, publisher_crud
+
+    # Издательства
+    pub1 = publisher_crud.create(db, name="Издательство 1")
+    pub2 = publisher_crud.create(db, name="Издательство 2")
+
+    # Жанры
+    novel = genre_crud.create(db, name="Роман")
+    detective = genre_crud.create(db, name="Детектив")
+
+    # Авторы и книги
+    author1 = author_crud.create(db, name="Автор 1", country="Россия")
+    author2 = author_crud.create(db, name="Автор 2", country="США")
+    author3 = author_crud.create(db, name="Автор без книг", country="Россия")
+
+    # Книги для author1
+    book1 = book_crud.create(
+        db, title="Книга 1", price=500, pages=300,
+        author_id=author1.id, publisher_id=pub1.id, language="Russian"
+    )
+    book2 = book_crud.create(
+        db, title="Книга 2", price=800, pages=400,
+        author_id=author1.id, publisher_id=pub1.id, language="Russian"
+    )
+
+    # Книги для author2
+    book3 = book_crud.create(
+        db, title="Книга 3", price=1200, pages=500,
+        author_id=author2.id, publisher_id=pub2.id, language="English"
+    )
 
+    # Добавляем жанры
+    book_crud.add_genre_to_book(db, book1.id, novel.id)
+    book_crud.add_genre_to_book(db, book2.id, novel.id)
+    book_crud.add_genre_to_book(db, book3.id, detective.id)
+
+    return {
+        "authors": [author1, author2, author3],
+        "books": [book1, book2, book3],
+        "genres": [novel, detective],
+        "publishers": [pub1, pub2]
+    }
@@ -0,0 +1,189 @@
+"""
+Test Autocomplete Index
+=======================
+Тесты для индекса подсказок при вводе
+"""
+
+import pytest
+
+
+class TestFold:
+    """Тесты для свёртки ключей."""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("Лев ТОЛСТОЙ", "лев толстой"),
+        ("Ёлки-палки", "елки палки"),
+        ("Йошкар-Ола", "йошкар ола"),
+        ("Émile  Zola", "emile zola"),
+        ("«Мастер и Маргарита»", "мастер и маргарита"),
+        ("Straße", "strasse"),
+    ])
+    def test_fold(self, text, expected):
+        """Регистр и диакритика свёрнуты, й сохраняется, пунктуация — разделитель."""
+        from app.queries.autocomplete import fold
+
+        assert fold(text) == expected
+
+
+class TestPrefixIndex:
+    """Тесты для PrefixIndex."""
+
+    def test_word_prefixes_and_ranking(self):
+        """Префикс ищется с начала слов; порядок — популярность, затем алфавит."""
+        from app.queries.autocomplete import PrefixIndex
+
+        index = PrefixIndex()
+        index.load([(1, "Лев Толстой"), (2, "Алексей Толстой"), (3, "Тургенев"), (4, "Ёж")])
+
+        assert index.complete("толс") == [2, 1]
+        assert index.complete("т") == [2, 1, 3]
+        assert index.complete("ЕЖ") == [4]
+        assert index.complete("лев тол") == [1]
+        assert index.complete("олстой") == []
+
+        index.bump(1, 5)
+        assert index.complete("толс") == [1, 2]
+        assert index.complete("т", limit=1) == [1]
+
+    def test_put_and_remove(self):
+        """put заменяет текст, remove удаляет все ключи записи."""
+        from app.queries.autocomplete import PrefixIndex
+
+        index = PrefixIndex()
+        index.put(1, "Война и мир")
+        index.put(1, "Анна Каренина")
+
+        assert index.complete("вой") == []
+        assert index.complete("карен") == [1]
+
+        index.remove(1)
+        assert index.complete("анна") == []
+        assert index._entries == []
+
+    def test_top_cache_invalidated(self, monkeypatch):
+        """Кеш длинных диапазонов сбрасывается при изменениях."""
+        from app.queries import autocomplete
+        from app.queries.autocomplete import PrefixIndex
+
+        monkeypatch.setattr(autocomplete, "_SCAN_LIMIT", 2)
+        index = PrefixIndex()
+        index.load([(i, f"Книга {i}") for i in range(10)])
+
+        assert index.complete("кн", limit=3) == [0, 1, 2]
+        assert "кн" in index._top
+
+        index.bump(7, 1)
+        assert index.complete("кн", limit=3) == [7, 0, 1]
+        index.remove(7)
+        index.put(20, "Кн")
+        assert index.complete("кн", limit=3) == [20, 0, 1]
+
+    def test_long_prefix(self):
+        """Префикс длиннее ключа проверяется по полному тексту."""
+        from app.queries.autocomplete import PrefixIndex
+
+        index = PrefixIndex()
+        title = "Очень длинное название книги, которое не помещается в ключ"
+        index.load([(1, title), (2, title.replace("ключ", "замок"))])
+
+        assert index.complete(title) == [1]
+        assert index.complete("которое не помещается в") == [2, 1]
+
+
+class TestAutocompleteIndex:
+    """Тесты для AutocompleteIndex."""
+
+    def test_build(self, db, populated_db):
+        """Индекс по таблицам; популярность авторов — число книг."""
+        from app.crud import author_crud
+        from app.queries.autocomplete import AutocompleteIndex
+
+        index = AutocompleteIndex.build(db)
+        author1, author2, author3 = populated_db["authors"]
+        ids = index.complete("authors", "авт")
+
+        assert ids == [author1.id, author2.id, author3.id]
+        assert author_crud.get_by_ids(db, ids) == [author1, author2, author3]
+        assert len(index.complete("books", "книга")) == 3
+        assert index.complete("publishers", "изд", limit=1) == [populated_db["publishers"][0].id]
+
+    def test_unknown_kind(self, db):
+        """Неизвестный вид — ValueError."""
+        from app.queries.autocomplete import AutocompleteIndex
+
+        with pytest.raises(ValueError):
+            AutocompleteIndex().complete("genres", "р")
+
+    def test_orm_events(self, db, populated_db):
+        """Создание, переименование, удаление и смена автора через ORM."""
+        from app.crud import author_crud, book_crud
+        from app.queries.autocomplete import AutocompleteIndex
+
+        index = AutocompleteIndex.build(db).attach(db)
+        try:
+            author1, author2, author3 = populated_db["authors"]
+            book1, book2, book3 = populated_db["books"]
+
+            new = book_crud.create(db, title="Идиот", author_id=author3.id)
+            book_crud.update(db, id=book1.id, title="Бесы")
+            book_crud.update(db, id=book2.id, author_id=author3.id)
+            book_crud.delete(db, id=book3.id)
+
+            assert index.complete("books", "ид") == [new.id]
+            assert index.complete("books", "бесы") == [book1.id]
+            assert index.complete("books", "книга") == [book2.id]
+            # Книги: author1 — 1, author2 — 0, author3 — 2
+            assert index.complete("authors", "авт") == [author3.id, author1.id, author2.id]
+
+            author_crud.update(db, id=author2.id, name="Фёдор Достоевский")
+            assert index.complete("authors", "федор") == [author2.id]
+        finally:
+            index.detach()
+
+    @pytest.mark.parametrize("cascades", [True, False])
+    def test_author_delete(self, db, populated_db, monkeypatch, cascades):
+        """author_crud.delete (массовый DELETE, книги — каскадом) убирает автора и его книги."""
+        from app.crud import author_crud
+        from app.queries.autocomplete import AutocompleteIndex
+
+        monkeypatch.setattr("app.crud.author.foreign_keys_enforced", lambda connection: cascades)
+        index = AutocompleteIndex.build(db).attach(db)
+        try:
+            author1, author2, _ = populated_db["authors"]
+            _, _, book3 = populated_db["books"]
+            pub1, pub2 = populated_db["publishers"]
+
+            assert author_crud.delete(db, id=author1.id)
+
+            assert index.complete("books", "книга") == [book3.id]
+            assert author1.id not in index.complete("authors", "авт")
+            # У издательства 1 книг не осталось
+            assert index.complete("publishers", "изд") == [pub2.id, pub1.id]
+            assert index.publishers.popularity[pub1.id] == 0
+        finally:
+            index.detach()
+
+    def test_rollback_discarded(self, db, populated_db):
+        """Изменения откаченной транзакции в индекс не попадают."""
+        from app.models import Book
+        from app.queries.autocomplete import AutocompleteIndex
+
+        index = AutocompleteIndex.build(db).attach(db)
+        try:
+            db.add(Book(title="Черновик", author_id=populated_db["authors"][0].id))
+            db.flush()
+            db.rollback()
+
+            assert index.complete("books", "черн") == []
+        finally:
+            index.detach()
+
+    def test_record_selection(self, db, populated_db):
+        """Выбранная подсказка поднимается выше."""
+        from app.queries.autocomplete import AutocompleteIndex
+
+        index = AutocompleteIndex.build(db)
+        book3 = populated_db["books"][2]
+        index.record_selection("books", book3.id)
+
+        assert index.complete("books", "кни")[0] == book3.id
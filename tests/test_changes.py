@@ -0,0 +1,157 @@
+"""
+Test Change Feed
+================
+Тесты для ленты изменений и экспорта NDJSON
+"""
+
+import json
+from datetime import datetime, timedelta
+from io import StringIO
+
+import pytest
+
+NO_SETTLE = {"settle": timedelta(0)}
+
+
+def _keys(changes):
+    return [(change["op"], change["table"], change["id"]) for change in changes]
+
+
+class TestChangeFeed:
+    """Тесты для changes_since."""
+
+    def test_full_export(self, db, populated_db):
+        """Без курсора отдаются все строки в порядке updated_at."""
+        from app.queries.changes import changes_since
+
+        feed = changes_since(db, **NO_SETTLE)
+
+        assert len(feed["changes"]) == 10
+        assert not feed["has_more"]
+        moments = [change["at"] for change in feed["changes"]]
+        assert moments == sorted(moments)
+        book = next(c for c in feed["changes"] if c["table"] == "books")
+        assert book["op"] == "upsert"
+        assert book["data"]["genre_ids"]
+
+        assert changes_since(db, feed["cursor"], **NO_SETTLE)["changes"] == []
+
+    def test_pages_with_equal_timestamps(self, db, populated_db):
+        """Строки с одинаковым updated_at не теряются и не повторяются."""
+        from app.models import Author, Book
+        from app.queries.changes import changes_since
+
+        moment = datetime(2026, 1, 1)
+        db.query(Book).update({Book.updated_at: moment}, synchronize_session=False)
+        db.query(Author).update({Author.updated_at: moment}, synchronize_session=False)
+        db.commit()
+
+        seen, cursor = [], None
+        while True:
+            feed = changes_since(db, cursor, limit=2, **NO_SETTLE)
+            seen += _keys(feed["changes"])
+            cursor = feed["cursor"]
+            if not feed["has_more"]:
+                break
+
+        assert len(seen) == len(set(seen)) == 10
+
+    def test_updates_after_cursor(self, db, populated_db):
+        """Изменённая строка приходит снова; смена жанров обновляет книгу."""
+        from app.crud import book_crud
+        from app.queries.changes import changes_since
+
+        cursor = changes_since(db, **NO_SETTLE)["cursor"]
+        book, genre = populated_db["books"][0], populated_db["genres"][1]
+        book_crud.add_genre_to_book(db, book.id, genre.id)
+
+        feed = changes_since(db, cursor, **NO_SETTLE)
+
+        assert _keys(feed["changes"]) == [("upsert", "books", book.id)]
+        assert genre.id in feed["changes"][0]["data"]["genre_ids"]
+
+    def test_cascade_deletes_recorded(self, db, populated_db):
+        """Каскадное удаление книг автора попадает в ленту как delete."""
+        from app.crud import author_crud
+        from app.queries.changes import changes_since
+
+        cursor = changes_since(db, **NO_SETTLE)["cursor"]
+        author = populated_db["authors"][0]
+        book_ids = {book.id for book in populated_db["books"] if book.author_id == author.id}
+        author_crud.delete_author_tree(db, author.id)
+
+        feed = changes_since(db, cursor, **NO_SETTLE)
+
+        assert set(_keys(feed["changes"])) == (
+            {("delete", "authors", author.id)} | {("delete", "books", id) for id in book_ids}
+        )
+
+    @pytest.mark.parametrize("limit", [1, 2, 3, 4])
+    def test_pages_through_cascade_delete(self, db, populated_db, limit):
+        """Страница, обрезанная посреди удалений с одним deleted_at, не теряет остальные."""
+        from app.crud import author_crud, publisher_crud
+        from app.models import Tombstone
+        from app.queries.changes import changes_since
+
+        cursor = changes_since(db, **NO_SETTLE)["cursor"]
+        for publisher in populated_db["publishers"]:
+            publisher_crud.update(db, id=publisher.id, website="https://example.com")
+        new = publisher_crud.create(db, name="Издательство 3")
+        author = populated_db["authors"][0]
+        book_ids = {book.id for book in populated_db["books"] if book.author_id == author.id}
+        author_crud.delete(db, id=author.id)
+        # Как у каскада SQLite: автор и его книги удалены в один момент
+        db.query(Tombstone).update({Tombstone.deleted_at: datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+
+        seen = []
+        while True:
+            feed = changes_since(db, cursor, limit=limit, **NO_SETTLE)
+            seen += _keys(feed["changes"])
+            cursor = feed["cursor"]
+            if not feed["has_more"]:
+                break
+
+        publishers = [("upsert", "publishers", p.id) for p in populated_db["publishers"] + [new]]
+        deletes = {("delete", "authors", author.id)} | {("delete", "books", id) for id in book_ids}
+        assert seen[:3] == publishers
+        assert len(seen) == 6 and set(seen[3:]) == deletes
+
+    def test_settle_window(self, db, populated_db):
+        """Свежие изменения ждут окончания интервала."""
+        from app.queries.changes import changes_since
+
+        assert changes_since(db, settle=timedelta(minutes=5))["changes"] == []
+        later = datetime.utcnow() + timedelta(minutes=10)
+        assert len(changes_since(db, settle=timedelta(minutes=5), now=later)["changes"]) == 10
+
+    def test_invalid_cursor(self, db):
+        """Повреждённый курсор — ValueError."""
+        from app.queries.changes import changes_since
+
+        with pytest.raises(ValueError):
+            changes_since(db, "not-a-cursor")
+
+
+class TestExportNdjson:
+    """Тесты для export_ndjson."""
+
+    def test_incremental_export(self, db, populated_db):
+        """Полный экспорт порциями, затем только новые изменения."""
+        from app.crud import genre_crud
+        from app.queries.changes import export_ndjson
+
+        out = StringIO()
+        state = export_ndjson(db, out, batch_size=3, **NO_SETTLE)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+
+        assert state["exported"] == len(records) == 10
+        assert len({(r["table"], r["id"]) for r in records}) == 10
+
+        genre = genre_crud.create(db, name="Поэзия")
+        out = StringIO()
+        state = export_ndjson(db, out, cursor=state["cursor"], **NO_SETTLE)
+        record = json.loads(out.getvalue())
+
+        assert state["exported"] == 1
+        assert (record["table"], record["id"], record["data"]["name"]) == ("genres", genre.id, "Поэзия")
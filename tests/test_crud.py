@@ -6,6 +6,7 @@ Test CRUD Operations
 
 from datetime import date
 import pytest
+import pytest_asyncio
 
 
 class TestBaseCRUD:
@@ -97,6 +98,46 @@ class TestBaseCRUD:
         assert author_crud.exists(db, sample_author.id) is True
         assert author_crud.exists(db, 99999) is False
 
+    def test_exists_does_not_load_objects(self, db, sample_book, sample_author):
+        """exists не загружает объект и его связи в сессию."""
+        from app.crud import author_crud
+
+        author_id = sample_author.id
+        db.expunge_all()
+
+        assert author_crud.exists(db, author_id) is True
+        assert len(db.identity_map) == 0
+
+    def test_count_with_filters(self, db):
+        """Тест подсчёта с условиями."""
+        from app.crud import author_crud
+        from app.models import Author
+
+        for i in range(4):
+            author_crud.create(db, name=f"Автор {i}", country="Россия" if i % 2 else "США")
+
+        assert author_crud.count(db, country="Россия") == 2
+        assert author_crud.count(db, Author.name.like("Автор%"), country="США") == 2
+        with pytest.raises(ValueError):
+            author_crud.count(db, unknown="x")
+
+    def test_estimate_count(self, db):
+        """Оценка берётся из статистики, без неё — точный подсчёт."""
+        from sqlalchemy import text
+        from app.crud import author_crud
+
+        for i in range(5):
+            author_crud.create(db, name=f"Автор {i}")
+
+        assert author_crud.estimate_count(db) == 5
+
+        db.execute(text("ANALYZE"))
+        author_crud.create(db, name="Автор после ANALYZE")
+
+        # Статистика не пересчитана — оценка отстаёт от точного значения
+        assert author_crud.estimate_count(db) == 5
+        assert author_crud.count(db) == 6
+
 
 class TestAuthorCRUD:
     """Тесты для AuthorCRUD."""
@@ -137,6 +178,102 @@ class TestAuthorCRUD:
         assert author.books[0].title == sample_book.title
 
 
+class TestDeleteAuthorTree:
+    """Тесты для удаления автора каскадом базы."""
+
+    def test_deletes_books_without_loading(self, populated_db, db):
+        """Книги и связи с жанрами удаляет каскад, книги не выбираются."""
+        from sqlalchemy import event, select
+        from app.crud import author_crud
+        from app.models import Book, book_genres
+
+        author_id = populated_db["authors"][0].id
+        db.expunge_all()
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            deleted = author_crud.delete_author_tree(db, author_id)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert deleted == 2
+        assert not any("FROM books" in s and "count" not in s for s in statements)
+        assert [b.title for b in db.scalars(select(Book))] == ["Книга 3"]
+        assert len(db.execute(select(book_genres)).all()) == 1
+        assert author_crud.delete_author_tree(db, author_id) is None
+
+    def test_without_foreign_keys(self, tmp_path):
+        """Без PRAGMA foreign_keys книги и связи удаляются явно."""
+        from sqlalchemy import create_engine, select
+        from sqlalchemy.orm import Session
+        from app.core.database import Base
+        from app.crud import author_crud, book_crud, genre_crud
+        from app.models import Book, book_genres
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'no_fk.db'}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            author = author_crud.create(session, name="Автор")
+            genre = genre_crud.create(session, name="Жанр")
+            book = book_crud.create(session, title="Книга", author_id=author.id)
+            book_crud.add_genre_to_book(session, book.id, genre.id)
+
+            assert author_crud.delete(session, id=author.id) is True
+            assert session.scalars(select(Book)).all() == []
+            assert session.execute(select(book_genres)).all() == []
+        engine.dispose()
+
+    def test_book_delete_relies_on_cascade(self, populated_db, db):
+        """Удаление книги через ORM: связи с жанрами удаляет база."""
+        from sqlalchemy import select
+        from app.crud import book_crud
+        from app.models import book_genres
+
+        assert book_crud.delete(db, id=populated_db["books"][0].id)
+        assert len(db.execute(select(book_genres)).all()) == 2
+
+    @pytest.mark.asyncio
+    async def test_async_delete_author_tree(self, async_db):
+        """Асинхронная версия."""
+        from sqlalchemy import select
+        from app.crud.async_crud import async_author_crud, async_book_crud
+        from app.models import Book
+
+        author = await async_author_crud.create(async_db, name="Автор")
+        for i in range(3):
+            await async_book_crud.create(async_db, title=f"Книга {i}", author_id=author.id)
+
+        assert await async_author_crud.delete_author_tree(async_db, author.id) == 3
+        assert (await async_db.scalars(select(Book))).all() == []
+        assert await async_author_crud.delete(async_db, id=author.id) is False
+
+
+class TestAsyncListAggregates:
+    """Тесты для списков с агрегатами в том же SELECT."""
+
+    @pytest.mark.asyncio
+    async def test_async_list_aggregates(self, async_db):
+        """Асинхронные списки с books_count и genre_names_joined."""
+        from app.crud.async_crud import async_author_crud, async_book_crud, async_genre_crud
+        from app.models import book_genres
+
+        author = await async_author_crud.create(async_db, name="Автор")
+        genre = await async_genre_crud.create(async_db, name="Роман")
+        book = await async_book_crud.create(async_db, title="Книга", author_id=author.id)
+        await async_db.execute(
+            book_genres.insert().values(book_id=book.id, genre_id=genre.id)
+        )
+        await async_db.commit()
+        async_db.expunge_all()
+
+        authors = await async_author_crud.get_multi_with_books_count(async_db)
+        books = await async_book_crud.get_multi_with_genre_names(async_db)
+
+        assert [a.books_count for a in authors] == [1]
+        assert [b.genre_names_joined for b in books] == ["Роман"]
+
+
 class TestBookCRUD:
     """Тесты для BookCRUD."""
 
@@ -219,3 +356,364 @@ class TestGenreCRUD:
         assert result.id is not None
         assert result.name == "Новый Жанр"
 
+
+
+class TestPagedCollections:
+    """Тесты для динамических коллекций Genre.books и Publisher.books."""
+
+    @pytest.fixture
+    def catalog(self, db):
+        from app.crud import author_crud, book_crud, genre_crud, publisher_crud
+
+        author = author_crud.create(db, name="Автор")
+        publisher = publisher_crud.create(db, name="Издательство")
+        genre = genre_crud.create(db, name="Роман")
+        books = [
+            book_crud.create(
+                db, title=f"Книга {i:02d}", price=100 + i, author_id=author.id,
+                publisher_id=publisher.id, language="Russian" if i % 2 else "English"
+            )
+            for i in range(12)
+        ]
+        return {"genre": genre, "publisher": publisher, "books": books}
+
+    def test_add_books_without_loading(self, db, catalog):
+        """append в жанр не читает его книги; повторы пропускаются."""
+        from sqlalchemy import event
+        from app.crud import genre_crud
+
+        genre_id = catalog["genre"].id
+        ids = [book.id for book in catalog["books"]]
+        assert genre_crud.add_books(db, genre_id, ids[:10]) == 10
+        db.expunge_all()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            added = genre_crud.add_books(db, genre_id, ids)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert added == 2
+        # Жанр, уже связанные id, две новые книги с их жанрами, UPDATE
+        # updated_at книг (лента изменений) и INSERT — без выборки книг жанра
+        assert len(statements) == 6
+        assert not any("book_genres.genre_id = ?" in s and "FROM books" in s for s in statements)
+        assert genre_crud.get(db, genre_id).books.count() == 12
+        assert genre_crud.add_books(db, 99999, ids) is None
+
+    def test_genre_page(self, db, catalog):
+        """Срез, порядок, фильтры и keyset-страницы."""
+        from app.crud import genre_crud
+        from app.models import Book
+
+        genre_id = catalog["genre"].id
+        genre_crud.add_books(db, genre_id, [book.id for book in catalog["books"]])
+
+        genre, page = genre_crud.get_with_books(
+            db, genre_id, Book.price > 101, order_by=Book.price.desc(), skip=1, limit=3,
+            language="Russian"
+        )
+        first, = genre_crud.get_with_books(db, genre_id, limit=5)[1:]
+        after, = genre_crud.get_with_books(db, genre_id, after_id=first[-1].id, limit=5)[1:]
+
+        assert genre.id == genre_id
+        assert [b.title for b in page] == ["Книга 09", "Книга 07", "Книга 05"]
+        assert [b.id for b in first + after] == sorted(b.id for b in catalog["books"])[:10]
+        with pytest.raises(ValueError):
+            genre.books.page(order_by=Book.title, after_id=1)
+        assert genre_crud.get_with_books(db, 99999) is None
+
+    def test_publisher_books_page(self, db, catalog):
+        """Издательство и страница книг; get_with_books возвращает издательство."""
+        from app.crud import publisher_crud
+        from app.models import Book
+
+        publisher, books = publisher_crud.get_books_page(
+            db, catalog["publisher"].id, order_by=Book.title.desc(), limit=2
+        )
+
+        assert publisher.name == "Издательство"
+        assert [b.title for b in books] == ["Книга 11", "Книга 10"]
+        assert publisher_crud.get_with_books(db, catalog["publisher"].id).name == "Издательство"
+        assert publisher_crud.get_with_books(db, catalog["publisher"].id).books.count() == 12
+        assert publisher_crud.get_with_books(db, 99999) is None
+        assert publisher_crud.get_books_page(db, 99999) is None
+
+    @pytest.mark.asyncio
+    async def test_async_get_with_books(self, async_db):
+        """Асинхронные страницы через with_parent."""
+        from app.crud.async_crud import (
+            async_author_crud, async_book_crud, async_genre_crud, async_publisher_crud
+        )
+        from app.models import Book, book_genres
+
+        author = await async_author_crud.create(async_db, name="Автор")
+        publisher = await async_publisher_crud.create(async_db, name="Издательство")
+        genre = await async_genre_crud.create(async_db, name="Роман")
+        for i in range(5):
+            book = await async_book_crud.create(
+                async_db, title=f"Книга {i}", author_id=author.id, publisher_id=publisher.id
+            )
+            if i % 2 == 0:
+                await async_db.execute(book_genres.insert().values(book_id=book.id, genre_id=genre.id))
+        await async_db.commit()
+
+        _, genre_books = await async_genre_crud.get_with_books(async_db, genre.id, order_by=Book.title)
+        _, publisher_books = await async_publisher_crud.get_books_page(
+            async_db, publisher.id, skip=3
+        )
+
+        assert [b.title for b in genre_books] == ["Книга 0", "Книга 2", "Книга 4"]
+        assert [b.title for b in publisher_books] == ["Книга 3", "Книга 4"]
+        assert await async_genre_crud.get_with_books(async_db, 99999) is None
+
+
+class TestUnitOfWork:
+    """Тесты для пакетного режима unit_of_work."""
+
+    @staticmethod
+    def _count_commits(db):
+        from sqlalchemy import event
+
+        commits = []
+        event.listen(db, "after_commit", lambda session: commits.append(1))
+        return commits
+
+    def test_single_commit(self, db):
+        """Все операции блока фиксируются одним коммитом."""
+        from app.crud import author_crud, book_crud, genre_crud, unit_of_work
+
+        commits = self._count_commits(db)
+
+        with unit_of_work(db):
+            author = author_crud.create(db, name="Автор")
+            genre = genre_crud.get_or_create(db, "Роман")
+            assert author.id is not None
+            for i in range(5):
+                book = book_crud.create(db, title=f"Книга {i}", author_id=author.id)
+                book_crud.add_genre_to_book(db, book.id, genre.id)
+            book_crud.update(db, id=book.id, price=100)
+            assert genre_crud.get_or_create(db, "Роман").id == genre.id
+
+        assert len(commits) == 1
+        assert book_crud.count(db) == 5
+        assert book_crud.get(db, book.id).price == 100
+
+    def test_rollback_on_error(self, db):
+        """Исключение откатывает всю работу блока."""
+        from app.crud import author_crud, unit_of_work
+
+        with pytest.raises(RuntimeError):
+            with unit_of_work(db):
+                author_crud.create(db, name="Автор")
+                raise RuntimeError("boom")
+
+        assert author_crud.count(db) == 0
+
+    def test_nested(self, db):
+        """Вложенный блок не коммитит, коммитит внешний."""
+        from app.crud import author_crud, unit_of_work
+
+        commits = self._count_commits(db)
+
+        with unit_of_work(db):
+            with unit_of_work(db):
+                author_crud.create(db, name="Автор 1")
+            author_crud.delete(db, id=author_crud.create(db, name="Автор 2").id)
+            assert len(commits) == 0
+
+        assert len(commits) == 1
+        assert author_crud.count(db) == 1
+
+    def test_commits_outside_block(self, db):
+        """Вне блока каждая операция коммитится сама."""
+        from app.crud import author_crud
+
+        commits = self._count_commits(db)
+
+        author_crud.create(db, name="Автор 1")
+        author_crud.create(db, name="Автор 2")
+
+        assert len(commits) == 2
+
+    @pytest.mark.asyncio
+    async def test_async_unit_of_work(self, async_db, async_session_factory):
+        """Асинхронный пакетный режим."""
+        from app.crud.async_crud import (
+            async_author_crud, async_book_crud, async_genre_crud, async_unit_of_work
+        )
+
+        async with async_unit_of_work(async_db):
+            author = await async_author_crud.create(async_db, name="Автор")
+            genre = await async_genre_crud.get_or_create(async_db, "Роман")
+            book = await async_book_crud.create(async_db, title="Книга", author_id=author.id)
+            await async_book_crud.add_genre(async_db, book.id, genre.id)
+
+            # До коммита другая сессия ничего не видит
+            async with async_session_factory() as other:
+                assert await async_book_crud.count(other) == 0
+
+        async with async_session_factory() as other:
+            assert await async_book_crud.count(other) == 1
+
+
+class TestRunConcurrently:
+    """Тесты для параллельного выполнения асинхронных операций."""
+
+    @pytest.mark.asyncio
+    async def test_each_operation_gets_own_session(self, async_session_factory):
+        """Операции выполняются параллельно в отдельных сессиях."""
+        from functools import partial
+        from app.crud.async_crud import async_author_crud, run_concurrently
+
+        sessions = []
+
+        async def create(db, name):
+            sessions.append(db)
+            return await async_author_crud.create(db, name=name)
+
+        report = await run_concurrently(
+            [partial(create, name=f"Автор {i}") for i in range(5)],
+            session_factory=async_session_factory,
+            concurrency=3
+        )
+
+        assert report["succeeded"] == 5
+        assert report["errors"] == {}
+        assert [a.name for a in report["results"]] == [f"Автор {i}" for i in range(5)]
+        assert len({id(db) for db in sessions}) == 5
+        async with async_session_factory() as db:
+            assert await async_author_crud.count(db) == 5
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit(self, async_session_factory):
+        """Одновременно выполняется не больше concurrency операций."""
+        import asyncio
+        from app.crud.async_crud import run_concurrently
+
+        running, peak = 0, 0
+
+        async def operation(db):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await run_concurrently([operation] * 8, session_factory=async_session_factory, concurrency=2)
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_retries_and_errors(self, async_session_factory):
+        """Временные ошибки повторяются, остальные и таймауты попадают в errors."""
+        import asyncio
+        from sqlalchemy.exc import OperationalError
+        from app.crud.async_crud import async_author_crud, run_concurrently
+
+        attempts = 0
+
+        async def flaky(db):
+            nonlocal attempts
+            attempts += 1
+            author = await async_author_crud.create(db, name=f"Попытка {attempts}")
+            if attempts == 1:
+                raise OperationalError("UPDATE", {}, Exception("database is locked"))
+            return author
+
+        async def broken(db):
+            raise ValueError("bad input")
+
+        async def slow(db):
+            await asyncio.sleep(1)
+
+        report = await run_concurrently(
+            [flaky, broken, slow],
+            session_factory=async_session_factory,
+            timeout=0.1,
+            backoff=0
+        )
+
+        assert report["succeeded"] == 1
+        assert report["retried"] == 1
+        assert report["results"][0].name == "Попытка 2"
+        assert isinstance(report["errors"][1], ValueError)
+        assert isinstance(report["errors"][2], asyncio.TimeoutError)
+        # Неудачная попытка откатилась целиком
+        async with async_session_factory() as db:
+            assert await async_author_crud.count(db) == 1
+
+
+class TestAsyncStreaming:
+    """Тесты для потокового чтения."""
+
+    @pytest_asyncio.fixture
+    async def catalog(self, async_db):
+        from app.crud.async_crud import async_author_crud, async_book_crud
+
+        tolstoy = await async_author_crud.create(async_db, name="Лев Толстой")
+        other = await async_author_crud.create(async_db, name="Фёдор Достоевский")
+        for i in range(7):
+            await async_book_crud.create(
+                async_db, title=f"Книга {i}", price=100 + i,
+                publication_date=date(1860 + i, 1, 1),
+                author_id=tolstoy.id if i % 2 == 0 else other.id
+            )
+        return tolstoy
+
+    @pytest.mark.asyncio
+    async def test_stream_multi(self, async_db, catalog):
+        """Все строки по порядку, порциями меньше результата."""
+        from app.crud.async_crud import async_book_crud
+
+        titles = [b.title async for b in async_book_crud.stream_multi(async_db, chunk_size=2)]
+        cheap = [b.price async for b in async_book_crud.stream_multi(
+            async_db, async_book_crud.model.price < 103, chunk_size=2
+        )]
+
+        assert titles == [f"Книга {i}" for i in range(7)]
+        assert cheap == [100, 101, 102]
+
+    @pytest.mark.asyncio
+    async def test_stream_by_author_and_search(self, async_db, catalog):
+        """Специализированные потоковые методы."""
+        from app.crud.async_crud import async_author_crud, async_book_crud
+
+        books = [b.title async for b in async_book_crud.stream_by_author(async_db, catalog.id)]
+        authors = [a.name async for a in async_author_crud.stream_search_by_name(async_db, "Толст")]
+
+        assert books == ["Книга 0", "Книга 2", "Книга 4", "Книга 6"]
+        assert authors == ["Лев Толстой"]
+
+    @pytest.mark.asyncio
+    async def test_early_exit_releases_cursor(self, async_db, catalog):
+        """После досрочного выхода сессия снова пригодна для запросов."""
+        from contextlib import aclosing
+        from app.crud.async_crud import async_book_crud
+
+        async with aclosing(async_book_crud.stream_multi(async_db, chunk_size=2)) as stream:
+            async for book in stream:
+                break
+
+        assert await async_book_crud.count(async_db) == 7
+
+    @pytest.mark.asyncio
+    async def test_stream_ndjson(self, async_db, catalog):
+        """NDJSON: одна JSON-запись на строку, даты в ISO."""
+        import json
+        from app.crud.async_crud import async_book_crud, stream_ndjson
+
+        lines = [
+            line async for line in stream_ndjson(
+                async_book_crud.stream_by_author(async_db, catalog.id),
+                columns=["title", "price", "publication_date"]
+            )
+        ]
+
+        assert all(line.endswith("\n") for line in lines)
+        assert json.loads(lines[0]) == {
+            "title": "Книга 0", "price": 100, "publication_date": "1860-01-01"
+        }
+        assert len(lines) == 4
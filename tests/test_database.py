@@ -0,0 +1,243 @@
+"""
+Test Database Lifecycle
+=======================
+Тесты для ленивого создания движков и поведения после fork
+"""
+
+import multiprocessing
+import os
+
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture
+def lazy_engine(tmp_path, monkeypatch):
+    """Сбросить ленивый движок и направить его во временную базу."""
+    from app.core import database
+
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'lazy.db'}")
+    monkeypatch.setattr(database, "_engine", None)
+    monkeypatch.setattr(database, "_engine_pid", None)
+    yield database
+    if database._engine is not None:
+        database._engine.dispose()
+
+
+@pytest.fixture
+def lazy_async_engine(tmp_path, monkeypatch):
+    """Сбросить ленивый асинхронный движок и направить его во временную базу."""
+    from app.core import database_async
+
+    monkeypatch.setattr(
+        database_async, "ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'lazy_async.db'}"
+    )
+    monkeypatch.setattr(database_async, "_async_engine", None)
+    monkeypatch.setattr(database_async, "_async_engine_pid", None)
+    return database_async
+
+
+def _child_query(queue):
+    """Выполняется в дочернем процессе после fork."""
+    from app.core import database
+
+    with database.SessionLocal() as session:
+        value = session.execute(text("SELECT 1")).scalar()
+    queue.put((database._engine_pid == os.getpid(), value))
+
+
+class TestLazyEngine:
+    """Тесты для ленивого синхронного движка."""
+
+    def test_engine_created_on_first_use(self, lazy_engine):
+        """Движок не создаётся до первого обращения и затем переиспользуется."""
+        assert lazy_engine._engine is None
+
+        engine = lazy_engine.get_engine()
+
+        assert engine is lazy_engine.get_engine()
+        assert lazy_engine.engine is engine
+
+    def test_session_binds_lazily(self, lazy_engine):
+        """SessionLocal работает без явного создания движка."""
+        with lazy_engine.SessionLocal() as session:
+            assert session.execute(text("SELECT 1")).scalar() == 1
+
+        assert lazy_engine._engine is not None
+
+    def test_pid_change_resets_pool(self, lazy_engine, monkeypatch):
+        """Смена PID сбрасывает унаследованный пул без закрытия соединений."""
+        engine = lazy_engine.get_engine()
+        old_pool = engine.pool
+        monkeypatch.setattr(lazy_engine, "_engine_pid", -1)
+
+        assert lazy_engine.get_engine() is engine
+        assert engine.pool is not old_pool
+        assert lazy_engine._engine_pid == os.getpid()
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="fork недоступен")
+    def test_usable_after_fork(self, lazy_engine):
+        """Дочерний процесс получает собственный пул."""
+        lazy_engine.prewarm_pool(2)
+
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        process = context.Process(target=_child_query, args=(queue,))
+        process.start()
+        result = queue.get(timeout=30)
+        process.join(timeout=30)
+
+        assert result == (True, 1)
+        # Соединения родителя не пострадали
+        with lazy_engine.SessionLocal() as session:
+            assert session.execute(text("SELECT 1")).scalar() == 1
+
+    def test_prewarm_pool(self, lazy_engine):
+        """Прогрев открывает соединения и оставляет их в пуле."""
+        opened = lazy_engine.prewarm_pool(3)
+
+        assert opened == 3
+        assert lazy_engine.get_engine().pool.checkedin() == 3
+
+
+class TestLazyAsyncEngine:
+    """Тесты для ленивого асинхронного движка."""
+
+    @pytest.mark.asyncio
+    async def test_async_session_binds_lazily(self, lazy_async_engine):
+        """AsyncSessionLocal работает без явного создания движка."""
+        async with lazy_async_engine.AsyncSessionLocal() as session:
+            assert (await session.execute(text("SELECT 1"))).scalar() == 1
+
+        await lazy_async_engine.get_async_engine().dispose()
+
+    @pytest.mark.asyncio
+    async def test_prewarm_async_pool(self, lazy_async_engine, monkeypatch):
+        """Прогрев асинхронного пула."""
+        from sqlalchemy.ext.asyncio import create_async_engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+        # aiosqlite по умолчанию использует NullPool, прогревать нечего
+        assert await lazy_async_engine.prewarm_async_pool() == 0
+        await lazy_async_engine.get_async_engine().dispose()
+
+        engine = create_async_engine(
+            lazy_async_engine.ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=2
+        )
+        monkeypatch.setattr(lazy_async_engine, "_async_engine", engine)
+        monkeypatch.setattr(lazy_async_engine, "_async_engine_pid", os.getpid())
+
+        opened = await lazy_async_engine.prewarm_async_pool()
+
+        assert opened == 2
+        assert engine.sync_engine.pool.checkedin() == 2
+        await engine.dispose()
+
+
+class _FakePrepared:
+    def get_attributes(self):
+        return ()
+
+
+class _FakeAsyncpgConnection:
+    """Минимальная замена asyncpg.Connection для _prepare."""
+
+    def __init__(self):
+        self.prepared = []
+
+    async def prepare(self, operation, name=None):
+        self.prepared.append((operation, name))
+        return _FakePrepared()
+
+    async def reload_schema_state(self):
+        pass
+
+
+class TestStatementCache:
+    """Тесты для настроек и счётчиков кэша подготовленных выражений asyncpg."""
+
+    def test_connect_args(self):
+        """Размер кэша, стратегия имён и режим pgbouncer."""
+        from app.core.database_async import _unique_statement_name, asyncpg_connect_args
+
+        assert asyncpg_connect_args(500, "sequential", False) == {
+            "prepared_statement_cache_size": 500
+        }
+        assert asyncpg_connect_args(500, "unique", False)["prepared_statement_name_func"] \
+            is _unique_statement_name
+        assert asyncpg_connect_args(500, "sequential", True) == {
+            "prepared_statement_cache_size": 0,
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": _unique_statement_name,
+        }
+        with pytest.raises(ValueError):
+            asyncpg_connect_args(100, "random", False)
+
+    def test_unique_names(self):
+        """Уникальные имена выражений не повторяются."""
+        from app.core.database_async import _unique_statement_name
+
+        assert _unique_statement_name() != _unique_statement_name()
+
+    @pytest.mark.asyncio
+    async def test_metrics_count_hits_and_misses(self):
+        """Повтор запроса на том же соединении — попадание, новый запрос — промах."""
+        import time
+        from sqlalchemy.dialects.postgresql.asyncpg import AsyncAdapt_asyncpg_connection
+        from app.core.database_async import StatementCacheMetrics, wrap_statement_cache
+
+        metrics = StatementCacheMetrics()
+        driver = _FakeAsyncpgConnection()
+        connection = AsyncAdapt_asyncpg_connection(None, driver, prepared_statement_cache_size=10)
+        assert wrap_statement_cache(connection, metrics)
+
+        by_isbn = "SELECT books.id FROM books WHERE books.isbn = $1::VARCHAR"
+        asof = time.time() - 60
+        for _ in range(3):
+            await connection._prepare(by_isbn, asof)
+        await connection._prepare("SELECT 1", asof)
+
+        assert len(driver.prepared) == 2
+        assert metrics.hits == 2
+        assert metrics.misses == 2
+        assert metrics.statement(by_isbn) == {"hits": 2, "misses": 1}
+        assert metrics.snapshot()["hit_ratio"] == 0.5
+
+        # DDL инвалидирует кэш: выражение готовится заново
+        await connection._prepare(by_isbn, time.time() + 60)
+        assert metrics.statement(by_isbn) == {"hits": 2, "misses": 2}
+
+    def test_disabled_cache_not_wrapped(self):
+        """Без кэша (pgbouncer) и у других драйверов счётчики не подключаются."""
+        from sqlalchemy.dialects.postgresql.asyncpg import AsyncAdapt_asyncpg_connection
+        from app.core.database_async import wrap_statement_cache
+
+        connection = AsyncAdapt_asyncpg_connection(
+            None, _FakeAsyncpgConnection(), prepared_statement_cache_size=0
+        )
+
+        assert not wrap_statement_cache(connection)
+        assert connection._prepared_statement_cache is None
+        assert not wrap_statement_cache(object())
+
+
+class TestPoolCapacity:
+    """Тесты для async_pool_capacity."""
+
+    @pytest.mark.asyncio
+    async def test_capacity(self):
+        """Ёмкость пула — pool_size + max_overflow, для NullPool — значение по умолчанию."""
+        from sqlalchemy.ext.asyncio import create_async_engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+        from app.core.database_async import async_pool_capacity
+
+        queued = create_async_engine(
+            "sqlite+aiosqlite://", poolclass=AsyncAdaptedQueuePool, pool_size=4, max_overflow=3
+        )
+        unpooled = create_async_engine("sqlite+aiosqlite://", poolclass=NullPool)
+
+        assert async_pool_capacity(queued) == 7
+        assert async_pool_capacity(unpooled, default=5) == 5
+
+        await queued.dispose()
+        await unpooled.dispose()
@@ -0,0 +1,120 @@
+"""
+Test Query Plans
+================
+Регрессии планов запросов: снимки в tests/plan_snapshots
+
+Обновить снимок после осознанного изменения запросов или индексов:
+    python -m app.queries.explain --update tests/plan_snapshots/sqlite.json
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+
+SNAPSHOTS = Path(__file__).parent / "plan_snapshots"
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+@pytest.fixture(scope="module")
+def seeded_engine():
+    """SQLite в памяти с синтетическим каталогом."""
+    from app.queries.explain import seeded_engine
+
+    engine = seeded_engine()
+    yield engine
+    engine.dispose()
+
+
+def _check_snapshot(engine, path: Path) -> None:
+    from app.queries.explain import capture_plans, compare_plans, load_snapshot, server_version
+
+    snapshot = load_snapshot(str(path))
+    if snapshot["version"] != server_version(engine):
+        pytest.skip(f"Снимок снят на {snapshot['version']}, обновите его через --update")
+
+    problems = compare_plans(snapshot["plans"], capture_plans(engine))
+
+    assert problems == []
+
+
+class TestPlanSnapshots:
+    """Сравнение планов со снимками."""
+
+    def test_all_methods_covered(self):
+        """Каждый метод AdvancedQueries и поисковый метод BookCRUD имеет план."""
+        from app.queries.explain import uncovered_methods
+
+        assert uncovered_methods() == []
+
+    def test_sqlite_plans(self, seeded_engine):
+        """Планы SQLite совпадают со снимком."""
+        _check_snapshot(seeded_engine, SNAPSHOTS / "sqlite.json")
+
+    @pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL не задан")
+    def test_postgresql_plans(self):
+        """Планы PostgreSQL (EXPLAIN ANALYZE) совпадают со снимком."""
+        from app.queries.explain import seeded_engine
+
+        path = SNAPSHOTS / "postgresql.json"
+        if not path.exists():
+            pytest.skip("Снимок PostgreSQL не создан: python -m app.queries.explain --url ... --update")
+
+        engine = seeded_engine(TEST_POSTGRES_URL)
+        try:
+            _check_snapshot(engine, path)
+        finally:
+            engine.dispose()
+
+
+class TestRegressionDetection:
+    """Тесты для обнаружения регрессий."""
+
+    def test_detects_new_full_scan(self, seeded_engine):
+        """Пропавший индекс даёт полное сканирование."""
+        from sqlalchemy import text
+        from app.queries.explain import PLAN_TARGETS, capture_plans, compare_plans
+
+        targets = {"BookCRUD.get_by_author": PLAN_TARGETS["BookCRUD.get_by_author"]}
+        expected = capture_plans(seeded_engine, targets)
+
+        with seeded_engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_books_author_id_title"))
+        try:
+            problems = compare_plans(expected, capture_plans(seeded_engine, targets))
+        finally:
+            with seeded_engine.begin() as conn:
+                conn.execute(text("CREATE INDEX ix_books_author_id_title ON books (author_id, title)"))
+
+        assert problems == [
+            "BookCRUD.get_by_author #1: new full scan: SCAN books USING INDEX ix_books_title",
+            "BookCRUD.get_by_author #1: join strategy changed: ['SEARCH books'] -> ['SCAN books']",
+        ]
+
+    def test_detects_join_strategy_change(self):
+        """Смена узла соединения и порядка доступа к таблицам."""
+        from app.queries.explain import compare_plans, full_scans, join_strategy
+
+        hash_join = [["Hash Join (Inner)", "  Seq Scan on books", "  Hash", "    Seq Scan on authors"]]
+        nested = [["Nested Loop (Inner)", "  Seq Scan on books", "  Index Scan on authors using authors_pkey"]]
+
+        assert join_strategy(hash_join[0]) == ["Hash Join (Inner)"]
+        assert full_scans(hash_join[0]) == ["Seq Scan on books", "Seq Scan on authors"]
+        assert compare_plans({"q": hash_join}, {"q": nested}) == [
+            "q #1: join strategy changed: ['Hash Join (Inner)'] -> ['Nested Loop (Inner)']"
+        ]
+
+        sqlite_old = [["SCAN authors", "SEARCH books USING INDEX ix_books_author_id_title (author_id=?)"]]
+        sqlite_new = [["SCAN books", "SEARCH authors USING INTEGER PRIMARY KEY (rowid=?)"]]
+        problems = compare_plans({"q": sqlite_old}, {"q": sqlite_new})
+
+        assert problems[0] == "q #1: new full scan: SCAN books"
+        assert "join strategy changed" in problems[1]
+
+    def test_missing_snapshot_and_statement_count(self):
+        """Нет снимка или изменилось число запросов."""
+        from app.queries.explain import compare_plans
+
+        assert compare_plans({}, {"q": [["SCAN books"]]}) == ["q: no snapshot"]
+        assert compare_plans({"q": [[]]}, {"q": [[], []]}) == ["q: 2 statements instead of 1"]
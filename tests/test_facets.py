@@ -0,0 +1,161 @@
+"""
+Test Facet Index
+================
+Тесты для фасетного индекса и фасетного поиска
+"""
+
+from datetime import timedelta
+
+import pytest
+
+NO_SETTLE = {"settle": timedelta(0)}
+
+FILTERS = [
+    {},
+    {"genre_name": "Роман"},
+    {"language": "Russian"},
+    {"min_price": 600},
+    {"genre_name": "Роман", "max_price": 600},
+    {"language": "English", "min_price": 1000, "max_price": 1200},
+    {"genre_name": "Нет такого"},
+]
+
+
+def _state(index):
+    from app.queries.facets import ids_from_bits
+
+    return (
+        ids_from_bits(index.all_bits).tolist(),
+        {g: ids_from_bits(b).tolist() for g, b in index.genre_bits.items()},
+        {l: ids_from_bits(b).tolist() for l, b in index.language_bits.items() if b},
+        index.facets(),
+    )
+
+
+class TestFacetIndex:
+    """Тесты для FacetIndex."""
+
+    def test_bits_roundtrip(self):
+        """Преобразование id <-> битовое множество."""
+        import numpy as np
+        from app.queries.facets import bits_from_ids, ids_from_bits
+
+        ids = np.array([0, 3, 64, 1000])
+
+        assert bits_from_ids(ids, 1001) == sum(1 << int(i) for i in ids)
+        assert ids_from_bits(bits_from_ids(ids, 1001)).tolist() == ids.tolist()
+        assert ids_from_bits(0).tolist() == []
+
+    @pytest.mark.parametrize("filters", FILTERS)
+    def test_matches_sql(self, db, populated_db, filters):
+        """Результаты и счётчики фасетов совпадают с SQL."""
+        from app.models import Book
+        from app.queries.facets import FacetIndex, facet_counts_sql, ids_from_bits, search_criteria
+
+        index = FacetIndex.load(db, **NO_SETTLE)
+        expected = sorted(id for (id,) in db.query(Book.id).filter(*search_criteria(**filters)))
+
+        assert ids_from_bits(index.search(**filters)).tolist() == expected
+        assert index.facets(**filters) == facet_counts_sql(db, **filters)
+
+    def test_facet_counts_exclude_own_filter(self, db, populated_db):
+        """Выбранный язык не обнуляет счётчики других языков."""
+        from app.queries.facets import FacetIndex
+
+        facets = FacetIndex.load(db, **NO_SETTLE).facets(language="English")
+
+        assert facets["languages"] == {"Russian": 2, "English": 1}
+        assert facets["genres"] == {"Детектив": 1}
+
+    def test_refresh(self, db, populated_db):
+        """refresh применяет вставки, смену жанров, удаления и новые жанры."""
+        from app.crud import book_crud, genre_crud
+        from app.queries.facets import FacetIndex
+
+        index = FacetIndex.load(db, **NO_SETTLE)
+        book1, book2, book3 = populated_db["books"]
+        poetry = genre_crud.create(db, name="Поэзия")
+        new = book_crud.create(
+            db, title="Новая", price=300, language="German",
+            author_id=populated_db["authors"][0].id
+        )
+        book_crud.add_genre_to_book(db, new.id, poetry.id)
+        book_crud.remove_genre_from_book(db, book1.id, populated_db["genres"][0].id)
+        book_crud.update(db, id=book2.id, language="English", price=1500)
+        book_crud.delete(db, id=book3.id)
+
+        assert index.refresh(db, **NO_SETTLE) > 0
+        assert _state(index) == _state(FacetIndex.load(db, **NO_SETTLE))
+        assert index.facets()["languages"] == {"Russian": 1, "English": 1, "German": 1}
+
+    def test_bulk_refresh_rebuilds(self, db, populated_db, monkeypatch):
+        """Много изменений — полная перестройка с тем же результатом."""
+        from app.crud import book_crud
+        from app.queries import facets
+        from app.queries.facets import FacetIndex
+
+        monkeypatch.setattr(facets, "FACET_REBUILD_THRESHOLD", 0)
+        index = FacetIndex.load(db, **NO_SETTLE)
+        book_crud.update(db, id=populated_db["books"][0].id, language="French")
+
+        index.refresh(db, **NO_SETTLE)
+
+        assert _state(index) == _state(FacetIndex.load(db, **NO_SETTLE))
+
+
+class TestFacetedSearch:
+    """Тесты для BookCRUD с фасетным индексом."""
+
+    @pytest.mark.parametrize("filters", FILTERS)
+    def test_index_and_sql_agree(self, db, populated_db, filters, monkeypatch):
+        """faceted_search и advanced_search дают одно и то же с индексом и без."""
+        from app.crud import book_crud
+        from app.queries.facets import FacetIndex
+
+        without = book_crud.faceted_search(db, **filters)
+        sql_books = {book.id for book in book_crud.advanced_search(db, **filters)}
+        monkeypatch.setattr(book_crud, "facet_index", FacetIndex.load(db, **NO_SETTLE))
+        with_index = book_crud.faceted_search(db, **filters)
+
+        assert with_index["total"] == without["total"]
+        assert [b.id for b in with_index["items"]] == [b.id for b in without["items"]]
+        assert with_index["facets"] == without["facets"]
+        assert {book.id for book in book_crud.advanced_search(db, **filters)} == sql_books
+
+    def test_advanced_search_skips_join(self, db, populated_db, monkeypatch):
+        """С индексом advanced_search не фильтрует жанры в SQL; с title — SQL."""
+        from sqlalchemy import event
+        from app.crud import book_crud
+        from app.queries.facets import FacetIndex
+
+        monkeypatch.setattr(book_crud, "facet_index", FacetIndex.load(db, **NO_SETTLE))
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            books = book_crud.advanced_search(db, genre_name="Роман", language="Russian")
+            assert not any("genres.name) LIKE" in s for s in statements)
+            assert len(books) == 2
+
+            statements.clear()
+            assert len(book_crud.advanced_search(db, title="Книга 1", genre_name="Роман")) == 1
+            assert any("genres.name) LIKE" in s for s in statements)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    def test_sql_total_without_subquery(self, db, populated_db):
+        """Без индекса total считается прямым COUNT, без подзапроса над выборкой."""
+        from sqlalchemy import event
+        from app.crud import book_crud
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            result = book_crud.faceted_search(db, genre_name="Роман", max_price=10_000)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        count, = [s for s in statements if "count(*)" in s]
+        assert result["total"] == 2
+        assert "FROM (SELECT" not in count
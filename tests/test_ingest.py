@@ -0,0 +1,387 @@
+"""
+Test Catalog Ingest
+===================
+Тесты для массовой загрузки каталога
+"""
+
+import csv
+import json
+from datetime import date
+
+import pytest
+
+
+FEED = [
+    {
+        "title": "Война и мир", "isbn": "978-5-0001", "pages": "1408", "price": "899",
+        "publication_date": "1869-01-01", "language": "Russian",
+        "author": "Лев Толстой", "publisher": "Эксмо", "genres": "Роман|Классика",
+    },
+    {
+        "title": "Анна Каренина", "isbn": "978-5-0002", "pages": "864", "price": "699",
+        "publication_date": "", "language": "",
+        "author": "Лев Толстой", "publisher": "АСТ", "genres": "Роман",
+    },
+    {
+        "title": "Идиот", "isbn": "978-5-0003", "pages": "", "price": "549",
+        "publication_date": "1869-01-01", "language": "Russian",
+        "author": "Фёдор Достоевский", "publisher": "", "genres": "Роман;Классика",
+    },
+    # Дубль ISBN внутри файла
+    {
+        "title": "Война и мир (дубль)", "isbn": "978-5-0001", "pages": "", "price": "",
+        "publication_date": "", "language": "", "author": "Лев Толстой",
+        "publisher": "", "genres": "",
+    },
+    # Запись без автора
+    {
+        "title": "Без автора", "isbn": "978-5-0004", "pages": "", "price": "",
+        "publication_date": "", "language": "", "author": "",
+        "publisher": "", "genres": "",
+    },
+]
+
+
+@pytest.fixture
+def csv_feed(tmp_path):
+    path = tmp_path / "feed.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(FEED[0]))
+        writer.writeheader()
+        writer.writerows(FEED)
+    return str(path)
+
+
+@pytest.fixture
+def jsonl_feed(tmp_path):
+    path = tmp_path / "feed.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for record in FEED:
+            record = dict(record, genres=[g for g in record["genres"].replace(";", "|").split("|") if g])
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return str(path)
+
+
+class TestCatalogLoader:
+    """Тесты для CatalogLoader."""
+
+    @pytest.mark.parametrize("feed", ["csv_feed", "jsonl_feed"])
+    def test_load(self, db, feed, request):
+        """Загрузка CSV и JSONL создаёт книги, справочники и связи."""
+        from app.crud import author_crud, book_crud, genre_crud
+        from app.ingest import CatalogLoader
+
+        stats = CatalogLoader(db, chunk_size=2).load(request.getfixturevalue(feed))
+
+        assert stats == {
+            "processed": 5, "inserted": 3, "updated": 0, "unchanged": 0, "skipped": 1,
+            "errors": 1, "genre_links": 5, "update_seconds": 0.0, "saved_seconds": 0.0
+        }
+        assert book_crud.count(db) == 3
+        assert author_crud.count(db) == 2
+        assert genre_crud.count(db) == 2
+
+        book = book_crud.get_by_isbn(db, "978-5-0001")
+        assert book.author.name == "Лев Толстой"
+        assert book.publisher.name == "Эксмо"
+        assert sorted(book.genre_names) == ["Классика", "Роман"]
+        assert book_crud.get_by_isbn(db, "978-5-0002").language == "Russian"
+        assert book_crud.get_by_isbn(db, "978-5-0003").publisher_id is None
+
+    def test_reuses_existing_entities(self, db, csv_feed):
+        """Существующие авторы и книги не дублируются."""
+        from app.crud import author_crud, book_crud
+        from app.ingest import CatalogLoader
+
+        author = author_crud.create(db, name="Лев Толстой")
+        book_crud.create(db, title="Война и мир", isbn="978-5-0001", author_id=author.id)
+
+        loader = CatalogLoader(db)
+        stats = loader.load(csv_feed)
+
+        assert stats["inserted"] == 2
+        assert stats["skipped"] == 2
+        assert author_crud.count(db) == 2
+        assert loader.authors.created == 1
+
+    def test_resume_from_checkpoint(self, db, csv_feed, tmp_path):
+        """Повторный запуск с контрольной точкой не загружает записи заново."""
+        from app.crud import book_crud
+        from app.ingest import CatalogLoader
+
+        checkpoint = str(tmp_path / "feed.ckpt")
+        progress = []
+        CatalogLoader(db, chunk_size=2, checkpoint_path=checkpoint,
+                      progress=progress.append).load(csv_feed)
+
+        with open(checkpoint, encoding="utf-8") as f:
+            assert json.load(f)["offset"] == 5
+        assert [p["processed"] for p in progress] == [2, 4, 5]
+
+        stats = CatalogLoader(db, checkpoint_path=checkpoint).load(csv_feed)
+
+        assert stats["inserted"] == 3
+        assert book_crud.count(db) == 3
+
+    def test_sync_updates_only_changed(self, db, csv_feed, tmp_path):
+        """sync: UPDATE только для изменившихся записей, остальные не пишутся."""
+        from app.crud import book_crud
+        from app.ingest import CatalogLoader
+
+        CatalogLoader(db).load(csv_feed)
+        before = {b.isbn: b.updated_at for b in book_crud.get_multi(db)}
+
+        feed = [dict(record) for record in FEED]
+        feed[1].update(price="750", genres="Роман|Классика")
+        path = tmp_path / "daily.jsonl"
+        path.write_text(
+            "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in feed), encoding="utf-8"
+        )
+
+        db.expire_all()
+        stats = CatalogLoader(db, sync=True).load(str(path))
+
+        assert (stats["inserted"], stats["updated"], stats["unchanged"]) == (0, 1, 2)
+        assert (stats["skipped"], stats["errors"]) == (1, 1)
+        assert stats["saved_seconds"] > 0
+        book = book_crud.get_by_isbn(db, "978-5-0002")
+        assert book.price == 750
+        assert sorted(book.genre_names) == ["Классика", "Роман"]
+        assert book.updated_at > before["978-5-0002"]
+        assert book_crud.get_by_isbn(db, "978-5-0001").updated_at == before["978-5-0001"]
+
+    def test_orm_update_resets_hash(self, db, csv_feed):
+        """Правка через ORM сбрасывает хеш: следующая синхронизация перезапишет книгу."""
+        from app.crud import book_crud
+        from app.ingest import CatalogLoader
+
+        CatalogLoader(db).load(csv_feed)
+        book = book_crud.get_by_isbn(db, "978-5-0003")
+        assert book.content_hash is not None
+        book_crud.update(db, id=book.id, price=1)
+        assert book.content_hash is None
+
+        stats = CatalogLoader(db, sync=True).load(csv_feed)
+
+        assert (stats["updated"], stats["unchanged"]) == (1, 2)
+        db.refresh(book)
+        assert book.price == 549
+
+    def test_sync_reference_fields(self, db, tmp_path):
+        """Поля авторов из фида обновляются только при изменении."""
+        from app.crud import author_crud
+        from app.ingest import CatalogLoader
+
+        def load(country):
+            path = tmp_path / f"{country}.jsonl"
+            path.write_text(json.dumps(
+                dict(FEED[0], author_country=country), ensure_ascii=False
+            ), encoding="utf-8")
+            loader = CatalogLoader(db, sync=True)
+            loader.load(str(path))
+            return loader.authors
+
+        assert load("Россия").created == 1
+        assert load("Россия").unchanged == 1
+        assert load("Российская империя").updated == 1
+        assert author_crud.get_by_name(db, "Лев Толстой").country == "Российская империя"
+
+    def test_copy_buffer_escaping(self):
+        """Формат COPY: NULL как \\N, спецсимволы экранируются."""
+        from app.ingest.loader import rows_to_copy_buffer
+
+        buffer = rows_to_copy_buffer([(1, None, "a\tb\nc\\d")])
+
+        assert buffer.read() == "1\t\\N\ta\\tb\\nc\\\\d\n"
+
+
+class TestImportKeyIndex:
+    """Тесты для фильтра Блума и индекса ключей загрузки."""
+
+    def test_bloom_filter(self):
+        """Нет ложных отрицаний; доля ложных срабатываний около целевой."""
+        from app.ingest.keyindex import KeySet, normalize_isbn
+
+        keys = [f"978-{i:09d}" for i in range(20000)]
+        absent = [f"979-{i:09d}" for i in range(20000)]
+        keyset = KeySet.from_keys(keys, normalize_isbn, error_rate=0.01, exact=False, headroom=0)
+
+        assert keyset.filter(keys) == keys
+        false_positives = len(keyset.filter(absent))
+        assert false_positives / len(absent) < 0.02
+        assert keyset.bloom.expected_fp_rate == pytest.approx(0.01, rel=0.2)
+
+        exact = KeySet.from_keys(keys, normalize_isbn)
+        assert exact.filter(absent) == []
+        exact.add(["979-000000001"])
+        assert exact.filter(absent[:3]) == ["979-000000001"]
+
+    def test_names_normalized(self):
+        """Имена сравниваются без учёта регистра и лишних пробелов."""
+        from app.ingest.keyindex import KeySet, normalize_name
+
+        keyset = KeySet.from_keys(["Лев Толстой"], normalize_name)
+
+        assert keyset.filter(["лев  ТОЛСТОЙ ", "Фёдор Достоевский"]) == ["лев  ТОЛСТОЙ "]
+
+    def test_loader_skips_definite_misses(self, db, csv_feed):
+        """С индексом загрузка даёт тот же результат, а новые ключи не ищутся в базе."""
+        from sqlalchemy import event
+        from app.crud import author_crud, book_crud
+        from app.ingest import CatalogLoader
+
+        author = author_crud.create(db, name="Лев Толстой")
+        book_crud.create(db, title="Война и мир", isbn="978-5-0001", author_id=author.id)
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            loader = CatalogLoader(db, key_index=True)
+            stats = loader.load(csv_feed)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert (stats["inserted"], stats["skipped"]) == (2, 2)
+        assert loader.authors.created == 1
+        report = loader.key_index.report()
+        assert report["isbns"]["lookups"] == 3
+        assert report["isbns"]["misses"] == 2
+        assert report["isbns"]["false_positives"] == 0
+        assert report["authors"]["misses"] == 1
+        assert report["isbns"]["memory_bytes"] > 0
+        # В базе проверяется только ISBN, который там может быть
+        assert [s for s in statements if "books.isbn IN" in s][0].count("?") == 1
+
+
+class TestParallelCatalogLoader:
+    """Тесты для ParallelCatalogLoader."""
+
+    def test_split_file(self, csv_feed):
+        """Шарды покрывают все строки данных без пересечений."""
+        from app.ingest.parallel import read_range, split_file
+
+        shards = split_file(csv_feed, 3)
+        titles = [r["title"] for start, end in shards for r in read_range(csv_feed, start, end)]
+
+        assert len(shards) == 3
+        assert titles == [r["title"] for r in FEED]
+
+    def test_parallel_load(self, tmp_path, jsonl_feed):
+        """Воркеры с собственными движками загружают фид без дублей."""
+        from sqlalchemy import create_engine, func, select
+        from app.core.database import Base
+        from app.ingest.parallel import ParallelCatalogLoader
+        from app.models import Author, Book, Genre
+
+        url = f"sqlite:///{tmp_path / 'catalog.db'}"
+        engine = create_engine(url)
+        Base.metadata.create_all(engine)
+
+        # Второй файл с тем же ISBN и теми же авторами
+        extra = tmp_path / "extra.jsonl"
+        extra.write_text(
+            json.dumps({"title": "Воскресение", "isbn": "978-5-0001",
+                        "author": "Лев Толстой", "genres": ["Роман"]}, ensure_ascii=False) + "\n"
+            + json.dumps({"title": "Бесы", "isbn": "978-5-0005",
+                          "author": "Фёдор Достоевский", "genres": ["Роман"]}, ensure_ascii=False) + "\n",
+            encoding="utf-8"
+        )
+
+        stats = ParallelCatalogLoader(url, workers=2, chunk_size=1).load([jsonl_feed, str(extra)])
+
+        with engine.connect() as conn:
+            books = conn.execute(select(func.count(Book.id))).scalar()
+            authors = conn.execute(select(func.count(Author.id))).scalar()
+            genres = conn.execute(select(func.count(Genre.id))).scalar()
+        engine.dispose()
+
+        assert stats["processed"] == 7
+        assert stats["inserted"] == 4
+        assert stats["created"] == {"authors": 2, "publishers": 2, "genres": 2}
+        assert (books, authors, genres) == (4, 2, 2)
+
+    def test_duplicate_isbns_across_shards(self, tmp_path):
+        """ISBN из нескольких шардов пишет только первый шард, даже без уникального индекса."""
+        from sqlalchemy import create_engine, select, text
+        from app.core.database import Base
+        from app.ingest.parallel import ParallelCatalogLoader, duplicate_isbns
+        from app.models import Book
+
+        assert duplicate_isbns([{"1", "2"}, {"2", "3"}, {"1", "3", "4"}]) == [set(), {"2"}, {"1", "3"}]
+
+        url = f"sqlite:///{tmp_path / 'catalog.db'}"
+        engine = create_engine(url)
+        Base.metadata.create_all(engine)
+        # Как на секционированной books в PostgreSQL: индекс по isbn не уникален
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_books_isbn"))
+            conn.execute(text("CREATE INDEX ix_books_isbn ON books (isbn)"))
+
+        path = tmp_path / "feed.jsonl"
+        path.write_text("".join(
+            json.dumps({"title": f"Издание {i}", "isbn": f"978-5-{i % 3:04d}",
+                        "author": "Лев Толстой"}, ensure_ascii=False) + "\n"
+            for i in range(6)
+        ), encoding="utf-8")
+
+        stats = ParallelCatalogLoader(url, workers=3, chunk_size=1).load([str(path)])
+
+        with engine.connect() as conn:
+            books = conn.execute(select(Book.isbn, Book.title).order_by(Book.isbn)).all()
+        engine.dispose()
+
+        assert (stats["inserted"], stats["skipped"]) == (3, 3)
+        assert books == [("978-5-0000", "Издание 0"), ("978-5-0001", "Издание 1"), ("978-5-0002", "Издание 2")]
+
+    def test_reference_fields_match_single_process(self, tmp_path):
+        """Авторы и издательства с полями фида — те же, что у CatalogLoader."""
+        from sqlalchemy import create_engine, select
+        from sqlalchemy.orm import Session
+        from app.core.database import Base
+        from app.ingest import CatalogLoader
+        from app.ingest.parallel import ParallelCatalogLoader
+        from app.models import Author, Publisher
+
+        path = tmp_path / "feed.jsonl"
+        path.write_text("".join(
+            json.dumps(dict(
+                record, author_bio=f"О {record['author']}", author_country="Россия",
+                author_birth_date="1828-09-09" if record["author"] == "Лев Толстой" else "",
+                publisher_address="Москва" if record["publisher"] == "Эксмо" else "",
+                publisher_website="https://ast.ru" if record["publisher"] == "АСТ" else ""
+            ), ensure_ascii=False) + "\n"
+            for record in FEED
+        ), encoding="utf-8")
+
+        def rows(url):
+            engine = create_engine(url)
+            with engine.connect() as conn:
+                authors = conn.execute(
+                    select(Author.name, Author.bio, Author.birth_date, Author.country, Author.content_hash)
+                    .order_by(Author.name)
+                ).all()
+                publishers = conn.execute(
+                    select(Publisher.name, Publisher.address, Publisher.website, Publisher.content_hash)
+                    .order_by(Publisher.name)
+                ).all()
+            engine.dispose()
+            return authors, publishers
+
+        single_url = f"sqlite:///{tmp_path / 'single.db'}"
+        parallel_url = f"sqlite:///{tmp_path / 'parallel.db'}"
+        for url in (single_url, parallel_url):
+            engine = create_engine(url)
+            Base.metadata.create_all(engine)
+            engine.dispose()
+
+        engine = create_engine(single_url)
+        with Session(engine) as db:
+            CatalogLoader(db, chunk_size=2).load(str(path))
+        engine.dispose()
+        ParallelCatalogLoader(parallel_url, workers=2, chunk_size=2).load([str(path)])
+
+        authors, publishers = rows(parallel_url)
+        assert (authors, publishers) == rows(single_url)
+        assert authors[0][1:4] == ("О Лев Толстой", date(1828, 9, 9), "Россия")
+        assert all(row[-1] is not None for row in authors + publishers)
@@ -0,0 +1,192 @@
+"""
+Test Migrations
+===============
+Тесты для миграций Alembic
+"""
+
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+
+@pytest.fixture
+def alembic_config(tmp_path, monkeypatch):
+    """Конфигурация Alembic, направленная во временную базу."""
+    from alembic.config import Config
+    from app.core import database
+
+    root = Path(__file__).parent.parent
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    monkeypatch.setattr(database, "DATABASE_URL", url)
+
+    config = Config(str(root / "alembic.ini"))
+    config.set_main_option("script_location", str(root / "alembic"))
+    config.attributes["url"] = url
+    return config
+
+
+class TestMigrations:
+    """Тесты для цепочки миграций."""
+
+    def test_upgrade_matches_models(self, alembic_config):
+        """После upgrade head схема совпадает с моделями."""
+        from alembic import command
+        from alembic.autogenerate import compare_metadata
+        from alembic.migration import MigrationContext
+        from app.core.database import Base
+        from app.core.migrations import include_object
+        import app.models  # noqa: F401
+
+        command.upgrade(alembic_config, "head")
+
+        engine = create_engine(alembic_config.attributes["url"])
+        with engine.connect() as conn:
+            context = MigrationContext.configure(conn, opts={"include_object": include_object})
+            diff = compare_metadata(context, Base.metadata)
+            tables = set(inspect(conn).get_table_names())
+        engine.dispose()
+
+        assert diff == []
+        assert {"authors", "publishers", "genres", "books", "book_genres"} <= tables
+
+    def test_downgrade_to_base(self, alembic_config):
+        """Откат всех миграций удаляет таблицы."""
+        from alembic import command
+
+        command.upgrade(alembic_config, "head")
+        command.downgrade(alembic_config, "base")
+
+        engine = create_engine(alembic_config.attributes["url"])
+        with engine.connect() as conn:
+            tables = set(inspect(conn).get_table_names())
+        engine.dispose()
+
+        assert tables <= {"alembic_version"}
+
+
+@pytest.fixture
+def items_engine(tmp_path):
+    """Файловая база с таблицей items на 25 строк."""
+    from sqlalchemy import text
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, kind TEXT, label TEXT)"))
+        conn.execute(
+            text("INSERT INTO items (id, kind) VALUES (:id, :kind)"),
+            [{"id": i, "kind": "odd" if i % 2 else "even"} for i in range(1, 26)]
+        )
+    yield engine
+    engine.dispose()
+
+
+def _items_table():
+    import sqlalchemy as sa
+
+    return sa.table("items", sa.column("id"), sa.column("kind"), sa.column("label"))
+
+
+def _labels(engine):
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        return dict(conn.execute(text("SELECT id, label FROM items")).all())
+
+
+class TestBatchedBackfill:
+    """Тесты для порционного заполнения."""
+
+    def test_backfill_in_batches(self, items_engine):
+        """Все подходящие строки обновлены порциями, прогресс удалён."""
+        from app.core.migrations import backfill_progress, batched_backfill
+
+        items = _items_table()
+        with items_engine.connect() as conn:
+            stats = batched_backfill(
+                conn, items, {"label": "x"}, where=items.c.kind == "odd", batch_size=10
+            )
+            leftover = conn.execute(backfill_progress.select()).all()
+
+        labels = _labels(items_engine)
+        assert stats["batches"] == 3
+        assert stats["rows"] == 13
+        assert stats["finished"] and stats["last_key"] == 25
+        assert leftover == []
+        assert all((label == "x") == (id % 2 == 1) for id, label in labels.items())
+
+    def test_resume_after_pause(self, items_engine):
+        """Прерванное заполнение продолжается с сохранённого ключа."""
+        from app.core.migrations import batched_backfill
+
+        items = _items_table()
+        with items_engine.connect() as conn:
+            first = batched_backfill(conn, items, {"label": "x"}, batch_size=10, max_batches=1)
+            assert not first["finished"]
+            assert sum(label == "x" for label in _labels(items_engine).values()) == 10
+
+            second = batched_backfill(conn, items, {"label": "x"}, batch_size=10)
+
+        assert second["resumed_from"] == 10
+        assert second["batches"] == 2
+        assert second["rows"] == 25
+        assert set(_labels(items_engine).values()) == {"x"}
+
+    def test_refuses_open_transaction(self, items_engine):
+        """Внутри незафиксированной транзакции порции не могут коммититься."""
+        from app.core.migrations import batched_backfill
+
+        with items_engine.begin() as conn:
+            with pytest.raises(RuntimeError):
+                batched_backfill(conn, _items_table(), {"label": "x"})
+
+
+class TestMigrationHelpers:
+    """Тесты для функций миграций и времени ревизий."""
+
+    def test_alembic_helpers(self, items_engine):
+        """backfill и индексы из миграции: коммит ревизии, autocommit_block, время шага."""
+        from alembic.migration import MigrationContext
+        from alembic.operations import Operations
+        from app.core.migrations import (
+            backfill,
+            create_index_concurrently,
+            drop_index_concurrently,
+            timed_step,
+        )
+
+        items = _items_table()
+        with items_engine.connect() as conn:
+            context = MigrationContext.configure(conn)
+            with Operations.context(context), context.begin_transaction():
+                with timed_step("items.label backfill"):
+                    stats = backfill(items, {"label": items.c.kind}, batch_size=7)
+                create_index_concurrently("ix_items_label", "items", ["label"])
+            indexes = {index["name"] for index in inspect(conn).get_indexes("items")}
+            with Operations.context(context), context.begin_transaction():
+                drop_index_concurrently("ix_items_label", "items")
+            remaining = {index["name"] for index in inspect(conn).get_indexes("items")}
+
+        assert stats["rows"] == 25 and stats["batches"] == 4
+        assert _labels(items_engine)[2] == "even"
+        assert "ix_items_label" in indexes
+        assert "ix_items_label" not in remaining
+
+    def test_migration_timer(self):
+        """Время ревизии — интервал от предыдущего вызова."""
+        from types import SimpleNamespace
+        from app.core.migrations import MigrationTimer
+
+        timer = MigrationTimer()
+        for source, destination in (((), ("001",)), (("001",), ("002",))):
+            timer(
+                ctx=None, heads=(), run_args={},
+                step=SimpleNamespace(
+                    source_revision_ids=source, destination_revision_ids=destination, is_upgrade=True
+                )
+            )
+
+        assert [(t["source"], t["destination"]) for t in timer.timings] == [
+            ("base", "001"), ("001", "002")
+        ]
+        assert all(t["upgrade"] and t["seconds"] >= 0 for t in timer.timings)
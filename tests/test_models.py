@@ -25,6 +25,29 @@ class TestAuthorModel:
         """Тест подсчёта книг автора."""
         assert sample_author.books_count == 0
 
+    def test_books_count_in_same_select(self, db, populated_db):
+        """books_count приходит одним SELECT с авторами, без загрузки книг."""
+        from sqlalchemy import event, inspect
+        from app.crud import author_crud
+        from app.models import Author
+
+        db.expunge_all()
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            authors = author_crud.get_multi_with_books_count(db)
+            counts = {author.name: author.books_count for author in authors}
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert counts == {"Автор 1": 2, "Автор 2": 1, "Автор без книг": 0}
+        assert len(statements) == 1
+        assert all("books" in inspect(author).unloaded for author in authors)
+        # Подзапрос годится и для сортировки
+        top = db.query(Author).order_by(Author.books_count.desc()).first()
+        assert top.name == "Автор 1"
+
 
 class TestBookModel:
     """Тесты для модели Book."""
@@ -50,6 +73,23 @@ class TestBookModel:
         """Тест пустого списка жанров."""
         assert sample_book.genre_names == []
 
+    def test_genre_names_joined(self, db, populated_db):
+        """Названия жанров собирает база, коллекция genres не загружается."""
+        from sqlalchemy import inspect
+        from app.crud import book_crud, genre_crud
+
+        book_crud.add_genre_to_book(
+            db, populated_db["books"][0].id, genre_crud.create(db, name="Классика").id
+        )
+        db.expunge_all()
+
+        books = book_crud.get_multi_with_genre_names(db)
+
+        joined = {book.title: book.genre_names_joined for book in books}
+        assert sorted(joined["Книга 1"].split(", ")) == ["Классика", "Роман"]
+        assert joined["Книга 3"] == "Детектив"
+        assert all("genres" in inspect(book).unloaded for book in books)
+
 
 class TestGenreModel:
     """Тесты для модели Genre."""
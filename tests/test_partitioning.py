@@ -0,0 +1,255 @@
+"""
+Test Books Partitioning
+=======================
+Тесты для секционирования books по publication_date
+
+Проверки на PostgreSQL выполняются, если задан TEST_POSTGRES_URL
+(пустая тестовая база: таблицы пересоздаются).
+"""
+
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, select, text
+
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+requires_postgres = pytest.mark.skipif(
+    not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL не задан"
+)
+
+
+@pytest.fixture
+def pg_engine():
+    """Движок PostgreSQL с чистой схемой каталога."""
+    from app.core.database import Base
+    import app.models  # noqa: F401
+
+    engine = create_engine(TEST_POSTGRES_URL)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS book_genres, books, book_isbns CASCADE"))
+        conn.execute(text("DROP FUNCTION IF EXISTS books_delete_genre_links()"))
+        conn.execute(text("DROP FUNCTION IF EXISTS books_unique_isbn()"))
+        Base.metadata.drop_all(conn)
+        Base.metadata.create_all(conn)
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS book_genres, books, book_isbns CASCADE"))
+        Base.metadata.drop_all(conn)
+    engine.dispose()
+
+
+def _explain(conn, stmt) -> str:
+    sql = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    return "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {sql}")))
+
+
+class TestPartitionBounds:
+    """Тесты для расчёта границ и имён секций."""
+
+    def test_yearly(self):
+        """Годовые секции."""
+        from app.core.partitioning import partition_bounds, partition_name, partition_years
+
+        assert partition_name(2024, "year") == "books_y2024"
+        assert partition_bounds(2024, "year") == (date(2024, 1, 1), date(2025, 1, 1))
+        assert partition_years(2023, 2026, "year") == [2023, 2024, 2025, 2026]
+
+    def test_decades(self):
+        """Секции по десятилетиям."""
+        from app.core.partitioning import partition_bounds, partition_name, partition_years
+
+        assert partition_name(1869, "decade") == "books_d1860"
+        assert partition_bounds(1869, "decade") == (date(1860, 1, 1), date(1870, 1, 1))
+        assert partition_years(2019, 2035, "decade") == [2010, 2020, 2030]
+
+    def test_unknown_interval(self):
+        """Неизвестный интервал отклоняется."""
+        from app.core.partitioning import partition_name
+
+        with pytest.raises(ValueError):
+            partition_name(2024, "month")
+
+    def test_noop_on_sqlite(self, db):
+        """На SQLite секционирование не применяется."""
+        from app.core.partitioning import (
+            ensure_book_partitions, is_books_partitioned, partition_books_table
+        )
+
+        conn = db.connection()
+
+        assert partition_books_table(conn) == []
+        assert ensure_book_partitions(conn) == []
+        assert not is_books_partitioned(conn)
+
+    def test_opt_in(self, monkeypatch):
+        """Миграция секционирует books, только если задан BOOKS_PARTITIONING."""
+        from app.core.partitioning import partitioning_enabled
+
+        monkeypatch.delenv("BOOKS_PARTITIONING", raising=False)
+        assert not partitioning_enabled()
+        monkeypatch.setenv("BOOKS_PARTITIONING", "0")
+        assert not partitioning_enabled()
+        monkeypatch.setenv("BOOKS_PARTITIONING", "1")
+        assert partitioning_enabled()
+
+
+@requires_postgres
+class TestPostgresPartitioning:
+    """Тесты секционирования на PostgreSQL."""
+
+    def test_partition_and_prune(self, pg_engine):
+        """Данные переносятся, выборка за период читает только нужную секцию."""
+        from app.core.partitioning import list_book_partitions, partition_books_table
+        from app.models import Author, Book
+
+        with pg_engine.begin() as conn:
+            author_id = conn.execute(Author.__table__.insert().values(
+                name="Автор", created_at=date.today(), updated_at=date.today()
+            ).returning(Author.id)).scalar()
+            for year in (1869, 2021, 2022, None):
+                conn.execute(Book.__table__.insert().values(
+                    title=f"Книга {year}", author_id=author_id,
+                    publication_date=date(year, 6, 1) if year else None,
+                    created_at=date.today(), updated_at=date.today()
+                ))
+            partition_books_table(conn, interval="year", ahead=1, today=date(2022, 3, 1))
+
+        with pg_engine.begin() as conn:
+            partitions = list_book_partitions(conn)
+            plan = _explain(conn, select(Book.id).where(
+                Book.publication_date >= date(2021, 1, 1),
+                Book.publication_date <= date(2021, 12, 31)
+            ))
+            count = conn.execute(text("SELECT count(*) FROM books")).scalar()
+
+        assert partitions == [
+            "books_default", "books_y1869", "books_y2021", "books_y2022", "books_y2023"
+        ]
+        assert count == 4
+        assert "books_y2021" in plan
+        assert "books_y2022" not in plan
+        assert "books_default" not in plan
+
+    def test_ensure_moves_rows_from_default(self, pg_engine):
+        """Новая секция забирает свои строки из books_default."""
+        from app.core.partitioning import ensure_book_partitions, partition_books_table
+        from app.models import Author, Book, Genre, book_genres
+
+        with pg_engine.begin() as conn:
+            author_id = conn.execute(Author.__table__.insert().values(
+                name="Автор", created_at=date.today(), updated_at=date.today()
+            ).returning(Author.id)).scalar()
+            genre_id = conn.execute(Genre.__table__.insert().values(
+                name="Роман", created_at=date.today(), updated_at=date.today()
+            ).returning(Genre.id)).scalar()
+            partition_books_table(conn, interval="year", ahead=0, today=date(2022, 3, 1))
+            book_id = conn.execute(Book.__table__.insert().values(
+                title="Будущая", author_id=author_id, publication_date=date(2024, 1, 1),
+                created_at=date.today(), updated_at=date.today()
+            ).returning(Book.id)).scalar()
+            conn.execute(book_genres.insert().values(book_id=book_id, genre_id=genre_id))
+
+        with pg_engine.begin() as conn:
+            created = ensure_book_partitions(conn, ahead=2, today=date(2022, 3, 1))
+            located = conn.execute(text(
+                "SELECT tableoid::regclass::text FROM books WHERE id = :id"
+            ), {"id": book_id}).scalar()
+            links = conn.execute(text("SELECT count(*) FROM book_genres")).scalar()
+
+        assert created == ["books_y2023", "books_y2024"]
+        assert located == "books_y2024"
+        # Перенос строки не удалил связь с жанром
+        assert links == 1
+
+        with pg_engine.begin() as conn:
+            conn.execute(text("DELETE FROM books WHERE id = :id"), {"id": book_id})
+            assert conn.execute(text("SELECT count(*) FROM book_genres")).scalar() == 0
+
+    def test_duplicate_isbn_rejected(self, pg_engine):
+        """Без уникального индекса повторный ISBN отклоняет триггер book_isbns."""
+        from sqlalchemy.exc import IntegrityError
+        from app.core.partitioning import partition_books_table
+        from app.models import Author, Book
+
+        def insert_book(conn, isbn, year):
+            return conn.execute(Book.__table__.insert().values(
+                title=f"Книга {isbn}", isbn=isbn, author_id=author_id,
+                publication_date=date(year, 1, 1) if year else None,
+                created_at=date.today(), updated_at=date.today()
+            ).returning(Book.id)).scalar()
+
+        with pg_engine.begin() as conn:
+            author_id = conn.execute(Author.__table__.insert().values(
+                name="Автор", created_at=date.today(), updated_at=date.today()
+            ).returning(Author.id)).scalar()
+            first = insert_book(conn, "978-5-0001", 2021)
+            partition_books_table(conn, interval="year", ahead=0, today=date(2022, 3, 1))
+
+        # Повтор в другой секции и в той же секции
+        for year in (2022, 2021, None):
+            with pytest.raises(IntegrityError):
+                with pg_engine.begin() as conn:
+                    insert_book(conn, "978-5-0001", year)
+
+        with pg_engine.begin() as conn:
+            second = insert_book(conn, "978-5-0002", None)
+            # Перенос строки в другую секцию сохраняет её ISBN
+            conn.execute(text(
+                "UPDATE books SET publication_date = '2022-05-01' WHERE id = :id"
+            ), {"id": first})
+        with pytest.raises(IntegrityError):
+            with pg_engine.begin() as conn:
+                conn.execute(text("UPDATE books SET isbn = '978-5-0001' WHERE id = :id"), {"id": second})
+
+        # Удалённый ISBN снова свободен
+        with pg_engine.begin() as conn:
+            conn.execute(text("DELETE FROM books WHERE id = :id"), {"id": first})
+            insert_book(conn, "978-5-0001", 2021)
+            owners = conn.execute(text("SELECT count(*) FROM book_isbns")).scalar()
+        assert owners == 2
+
+    def test_keeps_indexes_and_tombstones(self, pg_engine):
+        """partition и unpartition сохраняют индексы books и триггер ленты изменений."""
+        from app.core.partitioning import partition_books_table, unpartition_books_table
+        from app.models import Author, Book
+
+        def indexes(conn):
+            return dict(conn.execute(text(
+                "SELECT c.relname, i.indisunique FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE i.indrelid = 'books'::regclass AND NOT i.indisprimary"
+            )).all())
+
+        with pg_engine.begin() as conn:
+            author_id = conn.execute(Author.__table__.insert().values(
+                name="Автор", created_at=date.today(), updated_at=date.today()
+            ).returning(Author.id)).scalar()
+            before = indexes(conn)
+            partition_books_table(conn, interval="year", ahead=0, today=date(2022, 3, 1))
+            partitioned = indexes(conn)
+            book_id = conn.execute(Book.__table__.insert().values(
+                title="Книга", author_id=author_id, publication_date=date(2022, 1, 1),
+                created_at=date.today(), updated_at=date.today()
+            ).returning(Book.id)).scalar()
+            conn.execute(text("DELETE FROM books WHERE id = :id"), {"id": book_id})
+            tombstones = conn.execute(text(
+                "SELECT count(*) FROM tombstones WHERE table_name = 'books' AND row_id = :id"
+            ), {"id": book_id}).scalar()
+            unpartition_books_table(conn)
+            after = indexes(conn)
+            trigger = conn.execute(text(
+                "SELECT count(*) FROM pg_trigger "
+                "WHERE tgrelid = 'books'::regclass AND tgname = 'books_tombstone'"
+            )).scalar()
+
+        assert "ix_books_author_id_title" in before
+        assert "ix_books_author_id" not in before
+        assert set(partitioned) == set(before)
+        assert not any(partitioned.values())
+        assert after == before
+        assert after["ix_books_isbn"]
+        assert tombstones == 1
+        assert trigger == 1
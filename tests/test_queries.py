@@ -8,53 +8,6 @@ import pytest
 from datetime import date
 
 
-@pytest.fixture
-def populated_db(db):
-    """Фикстура с заполненной базой данных."""
-    from app.crud import author_crud, book_crud, genre_crud, publisher_crud
-
-    # Издательства
-    pub1 = publisher_crud.create(db, name="Издательство 1")
-    pub2 = publisher_crud.create(db, name="Издательство 2")
-
-    # Жанры
-    novel = genre_crud.create(db, name="Роман")
-    detective = genre_crud.create(db, name="Детектив")
-
-    # Авторы и книги
-    author1 = author_crud.create(db, name="Автор 1", country="Россия")
-    author2 = author_crud.create(db, name="Автор 2", country="США")
-    author3 = author_crud.create(db, name="Автор без книг", country="Россия")
-
-    # Книги для author1
-    book1 = book_crud.create(
-        db, title="Книга 1", price=500, pages=300,
-        author_id=author1.id, publisher_id=pub1.id, language="Russian"
-    )
-    book2 = book_crud.create(
-        db, title="Книга 2", price=800, pages=400,
-        author_id=author1.id, publisher_id=pub1.id, language="Russian"
-    )
-
-    # Книги для author2
-    book3 = book_crud.create(
-        db, title="Книга 3", price=1200, pages=500,
-        author_id=author2.id, publisher_id=pub2.id, language="English"
-    )
-
-    # Добавляем жанры
-    book_crud.add_genre_to_book(db, book1.id, novel.id)
-    book_crud.add_genre_to_book(db, book2.id, novel.id)
-    book_crud.add_genre_to_book(db, book3.id, detective.id)
-
-    return {
-        "authors": [author1, author2, author3],
-        "books": [book1, book2, book3],
-        "genres": [novel, detective],
-        "publishers": [pub1, pub2]
-    }
-
-
 class TestAggregateQueries:
     """Тесты для агрегатных запросов."""
 
@@ -142,6 +95,17 @@ class TestSubqueries:
         assert len(result) >= 1
         assert all(b.price > 800 for b in result)
 
+    def test_authors_with_expensive_books(self, db, populated_db):
+        """Тест EXISTS: авторы с книгой дороже порога."""
+        from app.crud import book_crud
+        from app.queries.advanced import AdvancedQueries
+
+        expensive_author = book_crud.get_by_field(db, "title", "Книга 3").author
+
+        result = AdvancedQueries.get_authors_with_expensive_books(db, price_threshold=1000)
+
+        assert [(r.name, r.max_book_price) for r in result] == [(expensive_author.name, 1200)]
+
 
 class TestCaseQueries:
     """Тесты для CASE WHEN запросов."""
@@ -216,3 +180,101 @@ class TestPaginationQueries:
         ids_page2 = {b.id for b in page2}
         assert ids_page1.isdisjoint(ids_page2)
 
+
+
+class TestTopNPerGroup:
+    """Тесты для топ-N в группах (ROW_NUMBER() OVER)."""
+
+    @pytest.fixture
+    def catalog(self, db):
+        """Случайный каталог: 300 книг, 20 авторов."""
+        from app.ingest.synthetic import seed_catalog
+
+        seed_catalog(db.get_bind(), books=300, authors=20, publishers=8, genres=6)
+
+    def test_books_per_genre_matches_loop(self, db, catalog):
+        """Совпадает с get_by_genre по каждому жанру и сортировкой в Python."""
+        from app.crud import book_crud, genre_crud
+        from app.queries.advanced import AdvancedQueries
+
+        result = AdvancedQueries.get_most_expensive_books_per_genre(db, n=3)
+
+        expected = {
+            genre.name: [
+                book.id for book in sorted(
+                    book_crud.get_by_genre(db, genre.id), key=lambda b: (-b.price, b.id)
+                )[:3]
+            ]
+            for genre in genre_crud.get_all(db)
+        }
+        assert {name: [b.id for b in books] for name, books in result.items()} == expected
+
+    def test_latest_books_per_author(self, db, catalog):
+        """По n книг на автора, от новых к старым."""
+        from app.queries.advanced import AdvancedQueries
+
+        result = AdvancedQueries.get_latest_books_per_author(db, n=2)
+
+        assert len(result) == 20
+        for author_id, books in result.items():
+            assert len(books) == 2
+            assert all(book.author_id == author_id for book in books)
+            assert books[0].created_at >= books[1].created_at
+
+    def test_top_publishers_per_language(self, db, populated_db):
+        """Оконная функция поверх GROUP BY."""
+        from app.crud import book_crud
+        from app.queries.advanced import AdvancedQueries
+
+        book_crud.create(
+            db, title="Книга 4", language="English",
+            author_id=populated_db["authors"][1].id,
+            publisher_id=populated_db["publishers"][1].id
+        )
+
+        assert AdvancedQueries.get_top_publishers_per_language(db, n=2) == {
+            "English": [{"publisher": "Издательство 2", "books": 2}],
+            "Russian": [{"publisher": "Издательство 1", "books": 2}],
+        }
+
+    def test_generic_columns(self, db, populated_db):
+        """Произвольный select колонок: группы — словари колонок."""
+        from sqlalchemy import select
+        from app.models import Book
+        from app.queries.advanced import AdvancedQueries
+
+        result = AdvancedQueries.get_top_n_per_group(
+            db, select(Book.title, Book.price), Book.author_id, Book.price.desc(), n=1
+        )
+
+        assert result == {
+            populated_db["authors"][0].id: [{"title": "Книга 2", "price": 800}],
+            populated_db["authors"][1].id: [{"title": "Книга 3", "price": 1200}],
+        }
+
+    @pytest.mark.asyncio
+    async def test_async_matches_sync(self, async_engine, async_db):
+        """Асинхронные варианты возвращают то же, что синхронные."""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.ingest.synthetic import seed_catalog
+        from app.queries.advanced import AdvancedQueries, AsyncAdvancedQueries
+
+        engine = create_engine(async_engine.url.set(drivername="sqlite"))
+        seed_catalog(engine, books=200, authors=10, publishers=5, genres=4)
+        try:
+            with sessionmaker(bind=engine)() as db:
+                for name in (
+                    "get_most_expensive_books_per_genre",
+                    "get_latest_books_per_author",
+                ):
+                    expected = getattr(AdvancedQueries, name)(db, n=2)
+                    actual = await getattr(AsyncAdvancedQueries, name)(async_db, n=2)
+                    assert {k: [b.id for b in v] for k, v in actual.items()} == {
+                        k: [b.id for b in v] for k, v in expected.items()
+                    }
+                assert await AsyncAdvancedQueries.get_top_publishers_per_language(async_db) == (
+                    AdvancedQueries.get_top_publishers_per_language(db)
+                )
+        finally:
+            engine.dispose()
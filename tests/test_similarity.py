@@ -0,0 +1,127 @@
+"""
+Test Genre Similarity
+=====================
+Тесты для матрицы книга × жанр и похожих книг
+"""
+
+import pytest
+
+
+@pytest.fixture
+def catalog(db, populated_db):
+    """
+    Каталог populated_db и ещё три книги:
+    book4 (author2, Роман + Детектив, 700), book5 (author1, Детектив, без цены),
+    book6 (author2, без жанров).
+    """
+    from app.crud import book_crud
+
+    author1, author2, _ = populated_db["authors"]
+    novel, detective = populated_db["genres"]
+    book4 = book_crud.create(db, title="Книга 4", price=700, author_id=author2.id)
+    book5 = book_crud.create(db, title="Книга 5", author_id=author1.id)
+    book6 = book_crud.create(db, title="Книга 6", price=100, author_id=author2.id)
+    book_crud.add_genre_to_book(db, book4.id, novel.id)
+    book_crud.add_genre_to_book(db, book4.id, detective.id)
+    book_crud.add_genre_to_book(db, book5.id, detective.id)
+    return populated_db["books"] + [book4, book5, book6]
+
+
+class TestGenreMatrix:
+    """Тесты для GenreMatrix."""
+
+    def test_build(self, db, catalog):
+        """Строки — книги, столбцы — жанры, по одной единице на связь."""
+        from app.queries.similarity import GenreMatrix
+
+        matrix = GenreMatrix.build(db)
+
+        assert matrix.matrix.shape == (6, 2)
+        assert matrix.matrix.nnz == 6
+        assert matrix.book_ids.tolist() == sorted(book.id for book in catalog)
+        assert matrix.similar_books(catalog[5].id) == []
+        assert matrix.similar_books(10_000) == []
+
+    def test_cooccurrence(self, db, catalog, populated_db):
+        """MᵀM: на диагонали размер жанра, вне — книги с обоими жанрами."""
+        from app.crud import genre_crud
+        from app.queries.similarity import GenreMatrix
+
+        genre_crud.create(db, name="Поэзия")
+        matrix = GenreMatrix.build(db)
+
+        assert matrix.cooccurrence().tolist() == [[3, 1, 0], [1, 3, 0], [0, 0, 0]]
+        assert matrix.top_pairs() == [{"genres": ("Роман", "Детектив"), "books": 1}]
+
+    def test_similar_books_ranking(self, db, catalog):
+        """Сходство, затем тот же автор, затем близость цены."""
+        from app.queries.similarity import GenreMatrix
+
+        book1, book2, book3, book4, book5, _ = catalog
+        matrix = GenreMatrix.build(db)
+
+        result = matrix.similar_books(book1.id)
+        assert [item["id"] for item in result] == [book2.id, book4.id]
+        assert result[0] == {
+            "id": book2.id, "score": 1.0, "shared_genres": 1,
+            "same_author": True, "price_difference": 300.0,
+        }
+        assert result[1]["score"] == pytest.approx(2 ** -0.5)
+
+        # У book4 сходство 1/√2 со всеми: book3 — тот же автор, затем по
+        # близости цены к 700 (book2 — 800, book1 — 500), book5 без цены
+        assert [item["id"] for item in matrix.similar_books(book4.id)] == [
+            book3.id, book2.id, book1.id, book5.id
+        ]
+        assert [item["id"] for item in matrix.similar_books(book5.id, k=2)] == [book3.id, book4.id]
+
+    def test_jaccard(self, db, catalog):
+        """Jaccard: |A∩B| / |A∪B|."""
+        from app.queries.similarity import GenreMatrix
+
+        book1, *_, book4, _, _ = catalog
+        result = GenreMatrix.build(db).similar_books(book4.id, metric="jaccard")
+
+        assert {item["id"]: item["score"] for item in result}[book1.id] == 0.5
+        with pytest.raises(ValueError):
+            GenreMatrix.build(db).similar_books(book4.id, metric="euclid")
+
+    def test_matches_brute_force(self):
+        """Векторное сходство совпадает с подсчётом по множествам."""
+        import random
+        import numpy as np
+        from app.queries.similarity import GenreMatrix
+
+        rnd = random.Random(7)
+        genres = {id: set(rnd.sample(range(1, 9), rnd.randint(0, 4))) for id in range(1, 60)}
+        links = np.array([(b, g) for b, gs in genres.items() for g in gs])
+        matrix = GenreMatrix(
+            book_ids=np.arange(1, 60), genre_ids=np.arange(1, 9), links=links,
+            author_ids=np.ones(59, dtype=np.int64), prices=np.zeros(59),
+            genre_names={g: str(g) for g in range(1, 9)}
+        )
+
+        for id in (1, 10, 30):
+            a = genres[id]
+            for metric in ("cosine", "jaccard"):
+                expected = [
+                    len(a & b) / ((len(a) * len(b)) ** 0.5 if metric == "cosine" else len(a | b))
+                    if a & b else 0.0
+                    for b in genres.values()
+                ]
+                assert matrix.similarity(id, metric) == pytest.approx(expected)
+
+
+class TestSimilarBooks:
+    """Тесты для BookCRUD.similar_books."""
+
+    def test_similar_books(self, db, catalog, monkeypatch):
+        """Книги в порядке сходства, с заданной матрицей и без неё."""
+        from app.crud import book_crud
+        from app.queries.similarity import GenreMatrix
+
+        book1, book2, _, book4, _, _ = catalog
+
+        assert book_crud.similar_books(db, book1.id) == [book2, book4]
+        monkeypatch.setattr(book_crud, "genre_matrix", GenreMatrix.build(db))
+        assert book_crud.similar_books(db, book1.id, k=1) == [book2]
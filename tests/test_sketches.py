@@ -0,0 +1,306 @@
+"""
+Test Statistics Sketches
+========================
+Тесты для t-digest, HyperLogLog и приближённой статистики каталога
+
+Границы ошибок здесь — те, что описаны в app.queries.sketches.
+"""
+
+import pytest
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+def _rank_error(sorted_values, estimate, q) -> float:
+    """Насколько ранг оценки отличается от q (0, если оценка — верный квантиль)."""
+    import numpy as np
+
+    low = np.searchsorted(sorted_values, estimate, side="left") / len(sorted_values)
+    high = np.searchsorted(sorted_values, estimate, side="right") / len(sorted_values)
+    return 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+
+
+class TestTDigest:
+    """Тесты для TDigest."""
+
+    @pytest.mark.parametrize("distribution", ["uniform", "lognormal", "integers"])
+    def test_rank_error(self, distribution):
+        """Ошибка по рангу < 0.5%, на хвостах < 0.2%; min и max точные."""
+        import numpy as np
+        from app.queries.sketches import TDigest
+
+        rng = np.random.default_rng(42)
+        values = {
+            "uniform": rng.uniform(100, 3000, 100_000).round(2),
+            "lognormal": rng.lognormal(6, 1, 100_000),
+            "integers": rng.integers(50, 1500, 100_000).astype(float),
+        }[distribution]
+        digest = TDigest()
+        for chunk in np.array_split(values, 100):
+            digest.add(chunk)
+        exact = np.sort(values)
+
+        assert len(digest) == len(values)
+        assert len(digest.means) <= digest.compression
+        assert digest.quantile(0) == exact[0]
+        assert digest.quantile(1) == exact[-1]
+        for q in QUANTILES:
+            bound = 0.002 if q in (0.01, 0.99) else 0.005
+            assert _rank_error(exact, digest.quantile(q), q) < bound
+
+    def test_merge(self):
+        """Объединение частей даёт ту же точность, что и целый поток."""
+        import numpy as np
+        from app.queries.sketches import TDigest
+
+        values = np.random.default_rng(7).normal(1000, 200, 60_000)
+        parts = []
+        for chunk in np.array_split(values, 3):
+            part = TDigest()
+            part.add(chunk)
+            parts.append(part)
+        merged = parts[0]
+        merged.merge(parts[1])
+        merged.merge(parts[2])
+        exact = np.sort(values)
+
+        assert len(merged) == len(values)
+        for q in QUANTILES:
+            assert _rank_error(exact, merged.quantile(q), q) < 0.005
+
+    def test_small_and_empty(self):
+        """Пустой — None; несколько значений — точные min/max, NaN пропускаются."""
+        from app.queries.sketches import TDigest
+
+        digest = TDigest()
+        assert digest.quantile(0.5) is None
+
+        digest.add([3.0, None, 1.0, 2.0])
+        assert len(digest) == 3
+        assert digest.quantile(0) == 1.0
+        assert digest.quantile(0.5) == 2.0
+        assert digest.quantile(1) == 3.0
+
+
+class TestHyperLogLog:
+    """Тесты для HyperLogLog."""
+
+    @pytest.mark.parametrize("cardinality", [1, 50, 5_000, 200_000])
+    def test_relative_error(self, cardinality):
+        """Ошибка < 3% (≈ 3.7σ при precision=14), повторы не учитываются."""
+        import numpy as np
+        from app.queries.sketches import HyperLogLog
+
+        values = np.random.default_rng(cardinality).choice(2 ** 40, cardinality, replace=False)
+        hll = HyperLogLog()
+        hll.add(values)
+        hll.add(values[: cardinality // 2])
+
+        assert hll.relative_error == pytest.approx(0.0081, abs=1e-4)
+        assert abs(hll.estimate() - cardinality) / cardinality < 0.03
+
+    def test_merge(self):
+        """Объединение — оценка объединения множеств."""
+        import numpy as np
+        from app.queries.sketches import HyperLogLog
+
+        first, second = HyperLogLog(), HyperLogLog()
+        first.add(np.arange(0, 30_000))
+        second.add(np.arange(20_000, 50_000))
+        first.merge(second)
+
+        assert abs(first.estimate() - 50_000) / 50_000 < 0.03
+        with pytest.raises(ValueError):
+            first.merge(HyperLogLog(12))
+
+
+class TestCatalogSketches:
+    """Тесты для CatalogSketches и get_library_statistics(approximate=True)."""
+
+    @pytest.fixture
+    def catalog(self, db):
+        """Случайный каталог: 5000 книг, 400 авторов."""
+        from app.ingest.synthetic import seed_catalog
+
+        seed_catalog(db.get_bind(), books=5000, authors=400)
+
+    def test_matches_exact(self, db, catalog):
+        """Приближённая статистика против точных значений."""
+        import numpy as np
+        from sqlalchemy import select
+        from app.models import Book
+        from app.queries.advanced import AdvancedQueries
+
+        exact = AdvancedQueries.get_library_statistics(db)
+        approximate = AdvancedQueries.get_library_statistics(db, approximate=True)
+        prices = np.sort(np.array(db.scalars(select(Book.price)).all()))
+        pages = np.sort(np.array(db.scalars(select(Book.pages)).all(), dtype=float))
+
+        for key in ("total_books", "avg_price", "max_price", "min_price", "total_pages"):
+            assert approximate[key] == exact[key]
+        assert abs(approximate["total_authors"] - exact["total_authors"]) / exact["total_authors"] < 0.03
+        assert _rank_error(prices, approximate["median_price"], 0.5) < 0.005
+        assert _rank_error(prices, approximate["p90_price"], 0.9) < 0.005
+        assert _rank_error(pages, approximate["median_pages"], 0.5) < 0.005
+        assert _rank_error(pages, approximate["p90_pages"], 0.9) < 0.005
+
+    def test_save_and_load(self, db, catalog):
+        """Сохранённые скетчи дают ту же статистику; approximate берёт их."""
+        from app.queries.advanced import AdvancedQueries
+        from app.queries.sketches import CatalogSketches
+
+        assert CatalogSketches.load(db) is None
+        sketches = CatalogSketches.build(db)
+        sketches.books = 1  # признак: статистика взята из сохранённых
+        sketches.save(db)
+        sketches.save(db)
+        loaded = CatalogSketches.load(db)
+
+        assert loaded.statistics() == sketches.statistics()
+        assert AdvancedQueries.get_library_statistics(db, approximate=True)["total_books"] == 1
+
+    def test_merge_parts(self, db, catalog):
+        """Скетчи частей каталога объединяются в скетч целого."""
+        import numpy as np
+        from sqlalchemy import select
+        from app.models import Book
+        from app.queries.sketches import CatalogSketches
+
+        rows = np.array(db.execute(select(Book.price, Book.pages, Book.author_id)).all(), dtype=float)
+        whole = CatalogSketches.build(db)
+        merged = CatalogSketches()
+        for part in np.array_split(rows, 4):
+            sketch = CatalogSketches()
+            sketch.add_books(part[:, 0], part[:, 1], part[:, 2])
+            merged.merge(sketch)
+
+        statistics, expected = merged.statistics(), whole.statistics()
+        assert statistics["total_books"] == expected["total_books"]
+        assert statistics["avg_price"] == expected["avg_price"]
+        assert statistics["total_authors"] == expected["total_authors"]
+        prices = np.sort(rows[:, 0])
+        assert _rank_error(prices, statistics["median_price"], 0.5) < 0.005
+
+    def test_orm_events(self, db, populated_db):
+        """Вставки, изменения и удаления через ORM; откат не учитывается."""
+        from app.crud import book_crud
+        from app.models import Book
+        from app.queries.sketches import CatalogSketches
+
+        sketches = CatalogSketches.build(db).attach(db)
+        try:
+            author = populated_db["authors"][2]
+            book1, book2, book3 = populated_db["books"]
+            book_crud.create(db, title="Новая", price=100, pages=50, author_id=author.id)
+            book_crud.update(db, id=book1.id, price=600)
+            book_crud.delete(db, id=book3.id)
+            db.add(Book(title="Черновик", price=1_000_000, author_id=author.id))
+            db.flush()
+            db.rollback()
+
+            statistics = sketches.statistics()
+            # Книги: 600 (book1), 800 (book2), 100 (новая)
+            assert statistics["total_books"] == 3
+            assert statistics["avg_price"] == 500.0
+            assert statistics["total_pages"] == 300 + 400 + 50
+            assert statistics["min_price"] == 100.0
+            assert statistics["total_authors"] == 3  # author2 без книг остался в HLL
+            assert sketches.stale == 2
+            assert sketches.needs_rebuild
+        finally:
+            sketches.detach()
+
+    def test_expired_after_commit(self, db, populated_db):
+        """Изменение и удаление книг, атрибуты которых истекли после коммита."""
+        from app.queries.sketches import CatalogSketches
+
+        book1, book2, book3 = populated_db["books"]
+        db.commit()
+        sketches = CatalogSketches.build(db).attach(db)
+        try:
+            book1.price = 600
+            db.commit()
+            db.delete(book3)
+            db.commit()
+
+            statistics = sketches.statistics()
+            # Книги: 600 (book1), 800 (book2)
+            assert statistics["total_books"] == 2
+            assert statistics["avg_price"] == 700.0
+            assert statistics["total_pages"] == 300 + 400
+            assert sketches.price_count == 2
+            assert sketches.stale == 2
+        finally:
+            sketches.detach()
+
+    def test_bulk_update(self, db, populated_db):
+        """ORM bulk UPDATE по первичному ключу и UPDATE ... WHERE; неизменные книги не считаются."""
+        from sqlalchemy import update
+        from app.models import Book
+        from app.queries.sketches import CatalogSketches
+
+        book1, book2, book3 = populated_db["books"]
+        sketches = CatalogSketches.build(db).attach(db)
+        try:
+            db.execute(update(Book), [{"id": book2.id, "price": 900}, {"id": book3.id, "title": "Другое"}])
+            db.execute(update(Book).where(Book.id == book1.id).values(pages=Book.pages + 100))
+            db.commit()
+
+            statistics = sketches.statistics()
+            # Книги: 500/400 (book1), 900/400 (book2), 1200/500 (book3)
+            assert statistics["total_books"] == 3
+            assert statistics["avg_price"] == round((500 + 900 + 1200) / 3, 2)
+            assert statistics["total_pages"] == 400 + 400 + 500
+            assert sketches.stale == 2
+        finally:
+            sketches.detach()
+
+    @pytest.mark.asyncio
+    async def test_write_behind_flush(self, async_session_factory):
+        """Сброс WriteBehindBuffer (update(Book) со списком строк) обновляет суммы."""
+        from sqlalchemy.orm import Session
+        from app.crud.async_crud import async_author_crud, async_book_crud
+        from app.crud.write_behind import WriteBehindBuffer
+        from app.queries.sketches import CatalogSketches
+
+        async with async_session_factory() as db:
+            author = await async_author_crud.create(db, name="Автор")
+            books = [
+                await async_book_crud.create(db, title=f"Книга {i}", price=100, author_id=author.id)
+                for i in range(3)
+            ]
+            sketches = await db.run_sync(CatalogSketches.build)
+
+        sketches.attach(Session)
+        try:
+            async with WriteBehindBuffer(async_book_crud, async_session_factory, flush_interval=60) as buffer:
+                await buffer.submit(books[0].id, price=400)
+                await buffer.submit(books[1].id, price=700)
+
+            assert sketches.books == 3
+            assert sketches.price_sum == 400 + 700 + 100
+            assert sketches.statistics()["max_price"] == 700.0
+            assert sketches.stale == 2
+        finally:
+            sketches.detach()
+
+    @pytest.mark.parametrize("cascades", [True, False])
+    def test_author_delete(self, db, populated_db, monkeypatch, cascades):
+        """author_crud.delete удаляет книги массовым DELETE — суммы исправляются, stale растёт."""
+        from app.crud import author_crud
+        from app.queries.sketches import CatalogSketches
+
+        monkeypatch.setattr("app.crud.author.foreign_keys_enforced", lambda connection: cascades)
+        sketches = CatalogSketches.build(db).attach(db)
+        try:
+            assert author_crud.delete(db, id=populated_db["authors"][0].id)
+
+            statistics = sketches.statistics()
+            # Осталась книга 3: 1200, 500 страниц
+            assert statistics["total_books"] == 1
+            assert statistics["avg_price"] == 1200.0
+            assert statistics["total_pages"] == 500
+            assert sketches.stale == 2
+            assert sketches.needs_rebuild
+        finally:
+            sketches.detach()
@@ -0,0 +1,118 @@
+"""
+Test Book Snapshot
+==================
+Тесты для колоночного снимка книг
+"""
+
+import numpy as np
+import pytest
+
+
+class TestBookSnapshot:
+    """Тесты для BookSnapshot."""
+
+    def test_load(self, db, populated_db):
+        """Тест загрузки снимка."""
+        from app.queries.snapshot import BookSnapshot
+
+        snapshot = BookSnapshot.load(db)
+
+        assert len(snapshot) == 3
+        assert list(snapshot.ids) == sorted(b.id for b in populated_db["books"])
+        assert sorted(snapshot.languages) == ["English", "Russian"]
+
+    def test_statistics_match_sql(self, db, populated_db):
+        """Статистика снимка совпадает с SQL-версией."""
+        from app.queries.advanced import AdvancedQueries
+        from app.queries.snapshot import BookSnapshot
+
+        snapshot = BookSnapshot.load(db)
+
+        assert snapshot.statistics() == AdvancedQueries.get_library_statistics(db)
+
+    def test_price_categories_match_sql(self, db, populated_db):
+        """Векторные категории совпадают с CASE WHEN."""
+        from app.queries.advanced import AdvancedQueries
+        from app.queries.snapshot import BookSnapshot
+
+        snapshot = BookSnapshot.load(db)
+        sql_counts = {}
+        for row in AdvancedQueries.get_books_with_price_category(db):
+            sql_counts[row["category"]] = sql_counts.get(row["category"], 0) + 1
+
+        counts = snapshot.price_category_counts()
+
+        assert {k: v for k, v in counts.items() if v} == sql_counts
+
+    def test_price_category_bounds(self, db):
+        """Цена, равная границе, попадает в следующую категорию."""
+        from app.queries.snapshot import BookSnapshot
+
+        snapshot = BookSnapshot()
+        labels = snapshot.category_labels()
+        codes = snapshot.price_categories([299.99, 300, 700, 1500, np.nan])
+
+        assert [labels[c] for c in codes] == [
+            "Бюджетная", "Средняя", "Дорогая", "Премиум", "Премиум"
+        ]
+
+    def test_reprice_simulation(self, db, populated_db):
+        """Симуляция переоценки не меняет снимок."""
+        from app.queries.snapshot import BookSnapshot
+
+        snapshot = BookSnapshot.load(db)
+        original = snapshot.price.copy()
+
+        counts = snapshot.price_category_counts(snapshot.reprice(2.0))
+
+        assert counts["Премиум"] == 2  # 1600 и 2400
+        assert np.array_equal(snapshot.price, original)
+
+    def test_aggregate_by(self, db, populated_db):
+        """Тест группировки по автору и языку."""
+        from app.queries.snapshot import BookSnapshot
+
+        author1 = populated_db["authors"][0]
+        snapshot = BookSnapshot.load(db)
+
+        by_author = snapshot.aggregate_by("author_id", "price")
+        by_language = snapshot.aggregate_by("language", "pages")
+
+        assert by_author[author1.id]["count"] == 2
+        assert by_author[author1.id]["avg"] == 650.0
+        assert by_language["English"]["sum"] == 500.0
+        with pytest.raises(ValueError):
+            snapshot.aggregate_by("title")
+
+    def test_histogram_and_percentiles(self, db, populated_db):
+        """Тест гистограммы и перцентилей."""
+        from app.queries.snapshot import BookSnapshot
+
+        snapshot = BookSnapshot.load(db)
+
+        counts, edges = snapshot.histogram("price", bins=[0, 600, 1000, 2000])
+        percentiles = snapshot.percentiles("price", q=(50,))
+
+        assert list(counts) == [1, 1, 1]
+        assert percentiles[50] == 800.0
+
+    def test_refresh_incremental(self, db, populated_db):
+        """Инкрементальное обновление подхватывает новые и изменённые книги."""
+        from app.crud import book_crud
+        from app.queries.snapshot import BookSnapshot
+
+        snapshot = BookSnapshot.load(db)
+        book1 = populated_db["books"][0]
+        author = populated_db["authors"][1]
+
+        book_crud.update(db, id=book1.id, price=100)
+        new_book = book_crud.create(
+            db, title="Новая", price=2000, author_id=author.id, language="German"
+        )
+        applied = snapshot.refresh(db)
+
+        assert applied >= 2
+        assert len(snapshot) == 4
+        assert snapshot.price[np.searchsorted(snapshot.ids, book1.id)] == 100
+        assert snapshot.ids[-1] == new_book.id
+        assert "German" in snapshot.languages
@@ -0,0 +1,148 @@
+"""
+Test Write-Behind Buffer
+========================
+Тесты для буфера отложенной записи
+"""
+
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture
+async def books(async_session_factory):
+    """Несколько книг в асинхронной тестовой базе."""
+    from app.crud.async_crud import async_author_crud, async_book_crud
+
+    async with async_session_factory() as db:
+        author = await async_author_crud.create(db, name="Автор")
+        return [
+            await async_book_crud.create(db, title=f"Книга {i}", price=100, author_id=author.id)
+            for i in range(3)
+        ]
+
+
+async def _prices(session_factory):
+    from sqlalchemy import select
+    from app.models import Book
+
+    async with session_factory() as db:
+        result = await db.execute(select(Book.id, Book.price, Book.updated_at).order_by(Book.id))
+        return {row.id: (row.price, row.updated_at) for row in result}
+
+
+class TestWriteBehindBuffer:
+    """Тесты для WriteBehindBuffer."""
+
+    @pytest.mark.asyncio
+    async def test_coalesces_updates(self, async_session_factory, books):
+        """Обновления одной строки объединяются, сброс — одним пакетом."""
+        from app.crud.async_crud import async_book_crud
+        from app.crud.write_behind import WriteBehindBuffer
+
+        before = await _prices(async_session_factory)
+        buffer = WriteBehindBuffer(async_book_crud, async_session_factory, flush_interval=60)
+
+        for price in (110, 120, 130):
+            await buffer.submit(books[0].id, price=price)
+        await buffer.submit(books[1].id, price=200, pages=50)
+
+        assert len(buffer) == 2
+        assert await buffer.flush() == 2
+
+        after = await _prices(async_session_factory)
+        assert after[books[0].id][0] == 130
+        assert after[books[1].id][0] == 200
+        assert after[books[2].id] == before[books[2].id]
+        assert after[books[0].id][1] > before[books[0].id][1]  # updated_at обновлён
+        assert buffer.stats["coalesced"] == 2
+        assert buffer.stats["flushes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_resets_content_hash(self, async_session_factory, books):
+        """Сброс обнуляет content_hash: следующая синхронизация фида перезапишет книгу."""
+        from sqlalchemy import select, update
+        from app.crud.async_crud import async_book_crud
+        from app.crud.write_behind import WriteBehindBuffer
+        from app.models import Book
+
+        async with async_session_factory() as db:
+            await db.execute(update(Book.__table__).values(content_hash="feed"))
+            await db.commit()
+
+        async with WriteBehindBuffer(async_book_crud, async_session_factory, flush_interval=60) as buffer:
+            await buffer.submit(books[0].id, price=150)
+            await buffer.submit(books[1].id, price=250, content_hash="fresh")
+
+        async with async_session_factory() as db:
+            hashes = dict((await db.execute(select(Book.id, Book.content_hash))).tuples().all())
+        assert hashes == {books[0].id: None, books[1].id: "fresh", books[2].id: "feed"}
+
+    @pytest.mark.asyncio
+    async def test_close_flushes(self, async_session_factory, books):
+        """Выход из async with записывает накопленное."""
+        from app.crud.async_crud import async_book_crud
+        from app.crud.write_behind import WriteBehindBuffer
+
+        async with WriteBehindBuffer(async_book_crud, async_session_factory, flush_interval=60) as buffer:
+            await buffer.submit(books[2].id, price=999)
+
+        assert (await _prices(async_session_factory))[books[2].id][0] == 999
+        with pytest.raises(RuntimeError):
+            await buffer.submit(books[2].id, price=1)
+
+    @pytest.mark.asyncio
+    async def test_max_batch_triggers_flush(self, async_session_factory, books):
+        """Набрав max_batch строк, буфер сбрасывается, не дожидаясь таймера."""
+        from app.crud.async_crud import async_book_crud
+        from app.crud.write_behind import WriteBehindBuffer
+
+        async with WriteBehindBuffer(
+            async_book_crud, async_session_factory, flush_interval=60, max_batch=2
+        ) as buffer:
+            await buffer.submit(books[0].id, price=1)
+            await buffer.submit(books[1].id, price=2)
+            for _ in range(50):
+                if buffer.stats["flushes"]:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert buffer.stats["flushed_rows"] == 2
+
+    @pytest.mark.asyncio
+    async def test_backpressure(self, async_session_factory, books):
+        """При заполненном буфере submit ждёт сброса."""
+        from app.crud.async_crud import async_book_crud
+        from app.crud.write_behind import WriteBehindBuffer
+
+        buffer = WriteBehindBuffer(
+            async_book_crud, async_session_factory, flush_interval=60, max_batch=2, max_pending=2
+        )
+        await buffer.submit(books[0].id, price=1)
+        await buffer.submit(books[1].id, price=2)
+
+        # Без фонового сброса третья строка не помещается
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(buffer.submit(books[2].id, price=3), timeout=0.1)
+
+        # Обновление уже буферизованной строки проходит сразу
+        await asyncio.wait_for(buffer.submit(books[0].id, price=10), timeout=0.1)
+
+        buffer.start()
+        await asyncio.wait_for(buffer.submit(books[2].id, price=3), timeout=5)
+        await buffer.close()
+
+        prices = await _prices(async_session_factory)
+        assert [prices[b.id][0] for b in books] == [10, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_rejects_unknown_fields(self, async_session_factory):
+        """Неизвестные поля отклоняются сразу."""
+        from app.crud.async_crud import async_book_crud
+        from app.crud.write_behind import WriteBehindBuffer
+
+        buffer = WriteBehindBuffer(async_book_crud, async_session_factory)
+
+        with pytest.raises(ValueError):
+            await buffer.submit(1, rating=5)